@@ -22,6 +22,7 @@
 """Handles converting of files between formats (used by translate.convert tools)"""
 
 import os.path
+import sys
 from translate.misc import optrecurse
 # don't import optparse ourselves, get the version from optrecurse
 optparse = optrecurse.optparse
@@ -366,6 +367,33 @@ class ArchiveConvertOptionParser(ConvertOptionParser):
         else:
             return super(ArchiveConvertOptionParser, self).processfile(fileprocessor, options, fullinputpath, fulloutputpath, fulltemplatepath)
 
+    def initjobworker(self, options):
+        """reopens the input and template archives in a worker process, since
+        their file positions can't be shared between processes"""
+        if self.isarchive(options.input, 'input'):
+            options.inputarchive = self.openarchive(options.input, 'input')
+        if self.usetemplates and options.template and self.isarchive(options.template, 'template'):
+            options.templatearchive = self.openarchive(options.template, 'template')
+
+    def processjob(self, options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath):
+        """run an individual conversion in a worker process. Output for an
+        archive is returned so that only the main process writes to it"""
+        if not self.isarchive(options.output, 'output'):
+            return super(ArchiveConvertOptionParser, self).processjob(options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath)
+        try:
+            inputfile = self.openinputfile(options, fullinputpath)
+            templatefile = self.opentemplatefile(options, fulltemplatepath)
+            outputfile = StringIO()
+            passthroughoptions = self.getpassthroughoptions(options)
+            if fileprocessor(inputfile, outputfile, templatefile, **passthroughoptions):
+                return True, outputfile.getvalue()
+            return False, None
+        except Exception, error:
+            if isinstance(error, KeyboardInterrupt):
+                raise
+            self.warning("Error processing: input %s, output %s, template %s" % (fullinputpath, fulloutputpath, fulltemplatepath), options, sys.exc_info())
+            return False, None
+
 def main(argv=None):
     parser = ArchiveConvertOptionParser({}, description=__doc__)
     parser.run(argv)
@@ -89,6 +89,10 @@ class tmxmultifile:
 
 
 class TmxOptionParser(convert.ArchiveConvertOptionParser):
+    def useprocesspool(self, options, inputfiles):
+        # all files are converted into one store shared through the output archive
+        return False
+
     def recursiveprocess(self, options):
         if not options.targetlanguage:
             raise ValueError("You must specify the target language")
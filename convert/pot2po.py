@@ -43,11 +43,13 @@ def convertpot(input_file, output_file, template_file, tm=None, min_similarity=7
     output_file.write(str(output_store))
     return 1
 
-def convert_stores(input_store, template_store, tm=None, min_similarity=75, fuzzymatching=True, **kwargs):
+def convert_stores(input_store, template_store, tm=None, min_similarity=75, fuzzymatching=True, jobs=1, **kwargs):
     """Actual conversion function, works on stores not files, returns
     a properly initialized pretranslated output store, with structure
     based on input_store, metadata based on template_store, migrates
-    old translations from template_store and pretranslating from tm"""
+    old translations from template_store and pretranslating from tm.
+
+    If jobs is more than 1, fuzzy matching is done in that many processes."""
 
     #prepare for merging
     output_store = type(input_store)()
@@ -67,10 +69,14 @@ def convert_stores(input_store, template_store, tm=None, min_similarity=75, fuzz
     #initialize store
     _store_pre_merge(input_store, output_store, template_store)
 
+    fuzzymatches = None
+    if matchers and jobs > 1:
+        fuzzymatches = pretranslate.match_fuzzy_units(input_store.units, template_store, matchers, jobs)
+
     # Do matching
     for input_unit in input_store.units:
         if input_unit.istranslatable():
-            input_unit = pretranslate.pretranslate_unit(input_unit, template_store, matchers, mark_reused=True)
+            input_unit = pretranslate.pretranslate_unit(input_unit, template_store, matchers, mark_reused=True, fuzzymatches=fuzzymatches)
             _unit_post_merge(input_unit, input_store, output_store, template_store)
             output_store.addunit(input_unit)
 
@@ -252,6 +258,8 @@ def main(argv=None):
     parser.add_option("--nofuzzymatching", dest="fuzzymatching", action="store_false", 
         default=True, help="Disable fuzzy matching")
     parser.passthrough.append("fuzzymatching")
+    # fuzzy matching is done in parallel within each file, see --jobs
+    parser.passthrough.append("jobs")
     parser.run(argv)
 
 
@@ -210,6 +210,16 @@ class TestOO2POCommand(test_convert.TestConvertCommand, TestOO2PO):
         self.run_command("simple.oo", "simple.pot", pot=True, multifile="onefile")
         assert os.path.isfile(self.get_testfilename("simple.pot"))
 
+    def test_jobs(self):
+        """tests converting the files of an archive in parallel"""
+        oobase = r'svx	source\%s\numpages.src	0	string	RID_SVXPAGE_NUM_OPTIONS	STR_BULLET			0	en-US	%s				20050924 09:13:58'
+        oosource = "\n".join([oobase % ("dialog%d" % i, "String %d" % i) for i in range(5)])
+        self.create_testfile("simple.oo", oosource)
+        self.run_command("simple.oo", "output", pot=True, jobs=2)
+        for i in range(5):
+            pofile = self.target_filetype(self.open_testfile(os.path.join("output", "svx", "source", "dialog%d.pot" % i)))
+            assert self.singleelement(pofile).source == "String %d" % i
+
     def test_remove_duplicates(self):
         """test that removing of duplicates works correctly (bug 171)"""
         oosource = r'''
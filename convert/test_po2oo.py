@@ -168,6 +168,22 @@ class TestPO2OOCommand(test_convert.TestConvertCommand, TestPO2OO):
         options = self.help_check(options, "-t TEMPLATE, --template=TEMPLATE")
         options = self.help_check(options, "--multifile=MULTIFILESTYLE", last=True)
 
+    def test_jobs(self):
+        """tests that converting files in parallel gives the same archive"""
+        oobase = r'svx	source\%s\numpages.src	0	string	RID_SVXPAGE_NUM_OPTIONS	STR_BULLET			0	en-US	%s				20050924 09:13:58' + '\r\n'
+        posource = '#: numpages.src#RID_SVXPAGE_NUM_OPTIONS.STR_BULLET.string.text\nmsgid "%s"\nmsgstr "%s"\n'
+        ootemplate = ""
+        for i in range(5):
+            name = "dialog%d" % i
+            ootemplate += oobase % (name, "String %d" % i)
+            self.create_testfile(os.path.join("input", "svx", "source", name + ".po"), posource % ("String %d" % i, "Gare %d" % i))
+        self.create_testfile("input.oo", ootemplate)
+        self.run_command("input", "serial.oo", template="input.oo", language="zu", keeptimestamp=True)
+        self.run_command("input", "parallel.oo", template="input.oo", language="zu", keeptimestamp=True, jobs=2)
+        serial = self.read_testfile("serial.oo")
+        assert serial.count("\tzu\tGare ") == 5
+        assert self.read_testfile("parallel.oo") == serial
+
     def merge2oo(self, oosource, posource):
         """helper that merges po translations to oo source through files"""
         outputoo = convertor.convertstore(inputpo)
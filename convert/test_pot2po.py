@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+# -*- coding: utf-8 -*-
 
 from translate.convert import pot2po
 from translate.convert import test_convert
@@ -13,7 +14,7 @@ class TestPOT2PO:
     def teardown_method(self, method):
         warnings.resetwarnings()
 
-    def convertpot(self, potsource, posource=None):
+    def convertpot(self, potsource, posource=None, **kwargs):
         """helper that converts pot source to po source without requiring files"""
         potfile = wStringIO.StringIO(potsource)
         if posource:
@@ -21,7 +22,7 @@ class TestPOT2PO:
         else:
             pofile = None
         pooutfile = wStringIO.StringIO()
-        pot2po.convertpot(potfile, pooutfile, pofile)
+        pot2po.convertpot(potfile, pooutfile, pofile, **kwargs)
         pooutfile.seek(0)
         return po.pofile(pooutfile.read())
 
@@ -100,6 +101,19 @@ msgstr[1] "%d handleidings."
         newpo = self.convertpot(potsource, posource)
         assert str(self.singleunit(newpo)) == poexpected
 
+    def test_fuzzy_matching_jobs(self):
+        """test that fuzzy matching in several processes gives the same result"""
+        potsource = ""
+        posource = ""
+        for i in range(20):
+            potsource += '#: file.cpp:%d\nmsgid "Open the %d files"\nmsgstr ""\n\n' % (i, i)
+            posource += '#: file.cpp:%d\nmsgid "Open the %d file"\nmsgstr "Maak die %d lêer oop"\n\n' % (i + 100, i, i)
+        potsource += '#: file.cpp:50\nmsgid "Something new"\nmsgstr ""\n'
+        serial = self.convertpot(potsource, posource)
+        parallel = self.convertpot(potsource, posource, jobs=2)
+        assert str(serial) == str(parallel)
+        assert len([unit for unit in parallel.units if unit.isfuzzy()]) == 20
+
     def xtest_merging_msgid_change(self):
         """tests that if the msgid changes but the location stays the same that we merge"""
         potsource = '''#: simple.label\n#: simple.accesskey\nmsgid "Its &hard coding a newline.\\n"\nmsgstr ""\n'''
@@ -233,12 +233,14 @@ class CheckerConfig(object):
 
 def cache_results(f):
 
+    name = f.__name__
+
     def cached_f(self, param1):
-        key = (f.__name__, param1)
+        key = (name, param1)
         res_cache = self.results_cache
-        if key in res_cache:
+        try:
             return res_cache[key]
-        else:
+        except KeyError:
             value = f(self, param1)
             res_cache[key] = value
             return value
@@ -265,6 +267,7 @@ class UnitChecker(object):
                 self.helperfunctions[functionname] = function
         self.defaultfilters = self.getfilters(excludefilters, limitfilters)
         self.results_cache = {}
+        self._plan = None
 
     def getfilters(self, excludefilters=None, limitfilters=None):
         """returns dictionary of available filters, including/excluding those in
@@ -291,12 +294,34 @@ class UnitChecker(object):
     def setconfig(self, config):
         """sets the accelerator list"""
         self.config = config
+        self._plan = None
         self.accfilters = [prefilters.filteraccelerators(accelmarker) for accelmarker in self.config.accelmarkers]
         self.varfilters = [prefilters.filtervariables(startmatch, endmatch, prefilters.varname)
                 for startmatch, endmatch in self.config.varmatches]
         self.removevarfilter = [prefilters.filtervariables(startmatch, endmatch,
                                                            prefilters.varnone)
                 for startmatch, endmatch in self.config.varmatches]
+        # the first characters of the markers of the filters above
+        self.accelstarts = [accelmarker[:1] for accelmarker in self.config.accelmarkers]
+        self.varstarts = [startmatch[:1] for startmatch, endmatch in self.config.varmatches]
+        self.selectfilters(None)
+
+    def selectfilters(self, chars):
+        """selects the variable and accelerator filters that can change
+        strings with the given characters, as returned by L{getchars}. The
+        filters of markers that don't occur in a unit are then skipped by all
+        the tests of the unit. All the filters are used if chars is None."""
+        if chars is None:
+            self.unitaccfilters = self.accfilters
+            self.unitvarfilters = self.varfilters
+            self.unitremovevarfilter = self.removevarfilter
+            return
+        self.unitaccfilters = [accfilter for start, accfilter in zip(self.accelstarts, self.accfilters)
+                               if not start or start in chars]
+        self.unitvarfilters = [varfilter for start, varfilter in zip(self.varstarts, self.varfilters)
+                               if not start or start in chars]
+        self.unitremovevarfilter = [varfilter for start, varfilter in zip(self.varstarts, self.removevarfilter)
+                                    if not start or start in chars]
 
     def setsuggestionstore(self, store):
         """Sets the filename that a checker should use for evaluating
@@ -307,22 +332,22 @@ class UnitChecker(object):
 
     def filtervariables(self, str1):
         """filter out variables from str1"""
-        return helpers.multifilter(str1, self.varfilters)
+        return helpers.multifilter(str1, self.unitvarfilters)
     filtervariables = cache_results(filtervariables)
 
     def removevariables(self, str1):
         """remove variables from str1"""
-        return helpers.multifilter(str1, self.removevarfilter)
+        return helpers.multifilter(str1, self.unitremovevarfilter)
     removevariables = cache_results(removevariables)
 
     def filteraccelerators(self, str1):
         """filter out accelerators from str1"""
-        return helpers.multifilter(str1, self.accfilters, None)
+        return helpers.multifilter(str1, self.unitaccfilters, None)
     filteraccelerators = cache_results(filteraccelerators)
 
     def filteraccelerators_by_list(self, str1, acceptlist=None):
         """filter out accelerators from str1"""
-        return helpers.multifilter(str1, self.accfilters, acceptlist)
+        return helpers.multifilter(str1, self.unitaccfilters, acceptlist)
 
     def filterwordswithpunctuation(self, str1):
         """replaces words with punctuation with their unpunctuated
@@ -341,44 +366,81 @@ class UnitChecker(object):
         Note that this can raise a FilterFailure as part of normal operation"""
         return test(unit)
 
-    def run_filters(self, unit):
-        """run all the tests in this suite, return failures as testname,
-        message_or_exception"""
-        self.results_cache = {}
-        failures = {}
-        ignores = self.config.lang.ignoretests[:]
+    def getchars(self, unit):
+        """returns the set of characters in the strings that the tests will
+        see for unit, or None if that is not known"""
+        return None
+
+    def getplan(self):
+        """returns the plan for running the filters: a list of (functionname,
+        filterfunction, message, isdefault, ignoredfunctionnames, triggers) in
+        the order they are run. The plan is only built again if the filters or
+        the language change.
+
+        A filter function can have a C{triggers} attribute with the characters
+        of which at least one must occur in the strings for it to fail; it is
+        skipped for units without any of them. The same characters are used to
+        select the variable and accelerator filters for the unit (see
+        L{selectfilters})."""
+        lang = self.config.lang
+        if self._plan is not None:
+            defaultfilters, planlang, ignoretests, plan = self._plan
+            if defaultfilters is self.defaultfilters and planlang is lang and ignoretests == lang.ignoretests:
+                return plan
+        plan = []
         functionnames = self.defaultfilters.keys()
         priorityfunctionnames = self.preconditions.keys()
         otherfunctionnames = filter(lambda functionname: functionname not in self.preconditions, functionnames)
         for functionname in priorityfunctionnames + otherfunctionnames:
-            if functionname in ignores:
+            if functionname in lang.ignoretests:
                 continue
             filterfunction = getattr(self, functionname, None)
             # this filterfunction may only be defined on another checker if 
             # using TeeChecker
             if filterfunction is None:
                 continue
-            filtermessage = filterfunction.__doc__
-            try:
-                filterresult = self.run_test(filterfunction, unit)
-            except FilterFailure, e:
-                filterresult = False
-                filtermessage = e.args[0]
-            except Exception, e:
-                if self.errorhandler is None:
-                    raise ValueError("error in filter %s: %r, %r, %s" % \
-                            (functionname, unit.source, unit.target, e))
-                else:
-                    filterresult = self.errorhandler(functionname, unit.source,
-                                                     unit.target, e)
-            if not filterresult:
-                # we test some preconditions that aren't actually a cause for
-                # failure
-                if functionname in self.defaultfilters:
-                    failures[functionname] = filtermessage
-                if functionname in self.preconditions:
-                    for ignoredfunctionname in self.preconditions[functionname]:
-                        ignores.append(ignoredfunctionname)
+            # we test some preconditions that aren't actually a cause for
+            # failure
+            plan.append((functionname, filterfunction, filterfunction.__doc__,
+                         functionname in self.defaultfilters,
+                         self.preconditions.get(functionname, []),
+                         getattr(filterfunction, "triggers", None)))
+        self._plan = (self.defaultfilters, lang, lang.ignoretests[:], plan)
+        return plan
+
+    def run_filters(self, unit):
+        """run all the tests in this suite, return failures as testname,
+        message_or_exception"""
+        self.results_cache = {}
+        failures = {}
+        ignores = set()
+        run_test = self.run_test
+        chars = self.getchars(unit)
+        self.selectfilters(chars)
+        try:
+            for functionname, filterfunction, filtermessage, isdefault, ignoredfunctionnames, triggers in self.getplan():
+                if functionname in ignores:
+                    continue
+                if triggers is not None and chars is not None and chars.isdisjoint(triggers):
+                    continue
+                try:
+                    filterresult = run_test(filterfunction, unit)
+                except FilterFailure, e:
+                    filterresult = False
+                    filtermessage = e.args[0]
+                except Exception, e:
+                    if self.errorhandler is None:
+                        raise ValueError("error in filter %s: %r, %r, %s" % \
+                                (functionname, unit.source, unit.target, e))
+                    else:
+                        filterresult = self.errorhandler(functionname, unit.source,
+                                                         unit.target, e)
+                if not filterresult:
+                    if isdefault:
+                        failures[functionname] = filtermessage
+                    ignores.update(ignoredfunctionnames)
+        finally:
+            self.selectfilters(None)
         self.results_cache = {}
         return failures
 
@@ -401,9 +463,9 @@ class TranslationChecker(UnitChecker):
         if self.hasplural:
             filtermessages = []
             filterresult = True
-            for pluralform in unit.target.strings:
+            for pluralform in self.pluralforms:
                 try:
-                    if not test(self.str1, unicode(pluralform)):
+                    if not test(self.str1, pluralform):
                         filterresult = False
                 except FilterFailure, e:
                     filterresult = False
@@ -417,13 +479,27 @@ class TranslationChecker(UnitChecker):
 
     def run_filters(self, unit):
         """Do some optimisation by caching some data of the unit for the benefit
-        of run_test()."""
-        self.str1 = data.normalized_unicode(unit.source) or u""
-        self.str2 = data.normalized_unicode(unit.target) or u""
+        of run_test(). The strings are plain unicode, so that the tests don't
+        use the slower methods of multistring."""
+        self.str1 = unicode(data.normalized_unicode(unit.source) or u"")
+        self.str2 = unicode(data.normalized_unicode(unit.target) or u"")
         self.hasplural = unit.hasplural()
+        if self.hasplural:
+            self.pluralforms = [unicode(pluralform) for pluralform in unit.target.strings]
         self.locations = unit.getlocations()
         return super(TranslationChecker, self).run_filters(unit)
 
+    def getchars(self, unit):
+        """returns the set of characters in the source and all the target
+        strings, as seen by run_test()"""
+        chars = set(self.str1)
+        if self.hasplural:
+            for pluralform in self.pluralforms:
+                chars.update(pluralform)
+        else:
+            chars.update(self.str2)
+        return chars
+
 
 class TeeChecker:
     """A Checker that controls multiple checkers."""
@@ -539,6 +615,8 @@ class StandardChecker(TranslationChecker):
             raise SeriousFilterFailure(u"escapes in original (%s) don't match escapes in translation (%s)" % (escapes1, escapes2))
         else:
             return True
+    escapes.triggers = u"\\"
+
 
     def newlines(self, str1, str2):
         """checks whether newlines are consistent between the two strings"""
@@ -546,6 +624,8 @@ class StandardChecker(TranslationChecker):
             raise FilterFailure(u"line endings in original don't match line endings in translation")
         else:
             return True
+    newlines.triggers = u"\n\r"
+
 
     def tabs(self, str1, str2):
         """checks whether tabs are consistent between the two strings"""
@@ -553,6 +633,8 @@ class StandardChecker(TranslationChecker):
             raise SeriousFilterFailure(u"tabs in original don't match tabs in translation")
         else:
             return True
+    tabs.triggers = u"\t"
+
 
     def singlequoting(self, str1, str2):
         """checks whether singlequoting is consistent between the two strings"""
@@ -588,7 +670,10 @@ class StandardChecker(TranslationChecker):
             return True
         str2 = self.filteraccelerators(self.filtervariables(str2))
         str2 = str2.replace(u"\u00a0", u" ")
+        chars1 = set(str1)
         for puncchar in self.config.punctuation:
+            if puncchar not in chars1:
+                continue
             plaincount1 = str1.count(puncchar)
             plaincount2 = str2.count(puncchar)
             if not plaincount1 or plaincount1 != plaincount2:
@@ -646,6 +731,8 @@ class StandardChecker(TranslationChecker):
         if (count1 or count2) and (count1 != count2):
             return 0
         return 1
+    printf.triggers = u"%"
+
 
     def accelerators(self, str1, str2):
         """checks whether accelerators are consistent between the two strings"""
@@ -737,14 +824,20 @@ class StandardChecker(TranslationChecker):
     def functions(self, str1, str2):
         """checks that function names are not translated"""
         return helpers.funcmatch(str1, str2, decoration.getfunctions, self.config.punctuation)
+    functions.triggers = u"("
+
 
     def emails(self, str1, str2):
         """checks that emails are not translated"""
         return helpers.funcmatch(str1, str2, decoration.getemails)
+    emails.triggers = u"@"
+
 
     def urls(self, str1, str2):
         """checks that URLs are not translated"""
         return helpers.funcmatch(str1, str2, decoration.geturls)
+    urls.triggers = u":."
+
 
     def numbers(self, str1, str2):
         """checks whether numbers of various forms are consistent between the
@@ -805,6 +898,8 @@ class StandardChecker(TranslationChecker):
         if messages:
             raise FilterFailure(messages)
         return True
+    brackets.triggers = u"[]{}()"
+
 
     def sentencecount(self, str1, str2):
         """checks that the number of sentences in both strings match"""
@@ -985,6 +1080,8 @@ class StandardChecker(TranslationChecker):
             if len(tags2) > 0:
                 return False
         return True
+    xmltags.triggers = u"<"
+
 
     def kdecomments(self, str1, str2):
         """checks to ensure that no KDE style comments appear in the
@@ -28,15 +28,151 @@ usage instructions and http://translate.sourceforge.net/wiki/toolkit/pofilter_te
 for full descriptions of all tests
 """
 
+from translate import __version__ as toolkitversion
 from translate.storage import factory
 from translate.storage.poheader import poheader
 from translate.filters import checks
 from translate.filters import autocorrect
 from translate.misc import optrecurse
 
+try:
+    from sqlite3 import dbapi2
+except ImportError:
+    from pysqlite2 import dbapi2
+import cPickle
 import os
+import itertools
+import sys
+import time
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
+
+# The check filter and units of the worker processes of
+# pocheckfilter.checkunits(), shared when the worker is forked
+_workerfilter = None
+_workerunits = None
+
+def _initcheckworker(checkfilter, units):
+    global _workerfilter, _workerunits
+    _workerfilter, _workerunits = checkfilter, units
+
+def _checkunit(index):
+    return _workerfilter.getfailures(_workerunits[index])
+
+class ResultCache:
+    """A persistent cache of the failures found in units, so that units that
+    haven't changed since a previous run don't need to be checked again.
+
+    Results are keyed by the checker configuration, the source and target
+    and everything else about the unit that the checks look at, including
+    the suggestions for the unit given by the suggestions function. Results
+    that weren't used for maxage seconds, like those of other configurations
+    or of units that changed since, are removed when the cache is closed."""
+
+    # changed whenever the results table changes, to start with a new cache
+    schema_version = 1
+
+    def __init__(self, filename, configkey, suggestions=None, maxage=30*24*60*60):
+        self.filename = filename
+        self.configkey = configkey
+        self.suggestions = suggestions
+        self.maxage = maxage
+        self.started = int(time.time())
+        self.con = dbapi2.connect(filename)
+        self.cur = self.con.cursor()
+        self.cur.execute("PRAGMA user_version")
+        if self.cur.fetchone()[0] != self.schema_version:
+            self.cur.execute("DROP TABLE IF EXISTS results")
+            self.cur.execute("PRAGMA user_version = %d" % self.schema_version)
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS results (
+                            key TEXT PRIMARY KEY,
+                            failures BLOB NOT NULL,
+                            seconds REAL NOT NULL,
+                            used INTEGER NOT NULL)""")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS results_used_idx ON results (used)")
+        self.con.commit()
+        # the keys of the results found in the cache
+        self.usedkeys = set()
+        # new results that haven't been written yet, by key
+        self.newresults = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+
+    def unitkey(self, unit):
+        """returns the key of the results for unit"""
+        def strings(text):
+            return getattr(text, "strings", [text])
+        alttrans = 0
+        if hasattr(unit, "getalttrans"):
+            alttrans = len(unit.getalttrans())
+        suggestions = []
+        if self.suggestions is not None:
+            suggestions = self.suggestions(unit)
+        content = (self.configkey, strings(unit.source), strings(unit.target),
+                   unit.isfuzzy(), unit.isreview(), unit.hasplural(),
+                   unit.getlocations(), alttrans, suggestions)
+        return sha1(repr(content)).hexdigest()
+
+    def get(self, unit):
+        """returns the cached failures for unit, or None"""
+        key = self.unitkey(unit)
+        if key in self.newresults:
+            self.hits += 1
+            return cPickle.loads(str(self.newresults[key][0]))
+        self.cur.execute("SELECT failures, seconds FROM results WHERE key=?", (key,))
+        row = self.cur.fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.usedkeys.add(key)
+        self.hits += 1
+        self.saved += row[1]
+        return cPickle.loads(str(row[0]))
+
+    def set(self, unit, failures, seconds):
+        """remembers the failures for unit, which took seconds to find"""
+        self.newresults[self.unitkey(unit)] = (buffer(cPickle.dumps(failures, 2)), seconds)
+
+    def reopen(self):
+        """returns a new connection to the cache for a worker process, which
+        must not use the connection of the process it was forked from"""
+        resultcache = ResultCache(self.filename, self.configkey, self.suggestions, self.maxage)
+        resultcache.started = self.started
+        return resultcache
+
+    def flush(self):
+        """writes the new results and marks the results that were used. The
+        database is only locked while writing, so that several processes can
+        share the cache"""
+        self.cur.executemany("INSERT OR REPLACE INTO results (key, failures, seconds, used) VALUES (?, ?, ?, ?)",
+                             [(key, failures, seconds, self.started) for key, (failures, seconds) in self.newresults.iteritems()])
+        self.newresults = {}
+        self.cur.executemany("UPDATE results SET used=? WHERE key=?",
+                             [(self.started, key) for key in self.usedkeys])
+        self.usedkeys = set()
+        self.con.commit()
+
+    def close(self):
+        """writes the results, and removes the ones that weren't used for
+        maxage seconds"""
+        self.flush()
+        self.cur.execute("DELETE FROM results WHERE used < ?", (self.started - self.maxage,))
+        self.con.commit()
+        self.con.close()
+
+    def report(self):
+        """returns a summary of how much the cache was used"""
+        return "%d units found in the result cache, %d checked, about %.1f seconds saved" % \
+                (self.hits, self.misses, self.saved)
 
 class pocheckfilter:
+    # files with fewer units to check are checked in this process by
+    # filterfile(), since starting the worker processes takes longer
+    minparallelunits = 100
+
     def __init__(self, options, checkerclasses=None, checkerconfig=None):
         # excludefilters={}, limitfilters=None, includefuzzy=True, includereview=True, autocorrect=False):
         """builds a checkfilter using the given checker (a list is allowed too)"""
@@ -49,6 +185,38 @@ class pocheckfilter:
                 languagecode=checkerconfig.targetlanguage
         )
         self.options = options
+        self.resultcache = None
+        if getattr(options, "resultcache", None):
+            self.resultcache = ResultCache(options.resultcache, self.getconfigkey(), self.getsuggestions)
+        # failures found by checkunits(), by unit
+        self.prechecked = {}
+
+    def getconfigkey(self):
+        """returns a string that identifies the checks that are done, for
+        use in the result cache"""
+        checkers = []
+        for checker in self.checker.checkers:
+            config = checker.config
+            checkers.append(("%s.%s" % (checker.__class__.__module__, checker.__class__.__name__),
+                             sorted(checker.defaultfilters.keys()), config.targetlanguage,
+                             config.lang.code, config.accelmarkers, config.varmatches,
+                             sorted(config.notranslatewords.keys()),
+                             sorted(config.musttranslatewords.keys()),
+                             sorted(config.validcharsmap.keys()), config.punctuation,
+                             config.endpunctuation, config.ignoretags, config.canchangetags,
+                             config.criticaltests, config.credit_sources))
+        return sha1(repr((toolkitversion.sver, checkers))).hexdigest()
+
+    def getsuggestions(self, unit):
+        """returns the suggestions for unit in the suggestion stores of the
+        checkers (see L{checks.StandardUnitChecker.hassuggestion}), for use
+        in the result cache"""
+        suggestions = []
+        for checker in self.checker.checkers:
+            suggestion_store = getattr(checker, "suggestion_store", None)
+            if suggestion_store:
+                suggestions.extend([unicode(suggestion.target) for suggestion in suggestion_store.findunits(unit.source)])
+        return suggestions
 
     def getfilterdocs(self):
         """lists the docs for filters available on checker..."""
@@ -65,7 +233,10 @@ class pocheckfilter:
             return []
         if not self.options.includereview and unit.isreview():
             return []
-        failures = self.checker.run_filters(unit)
+        if id(unit) in self.prechecked:
+            failures = self.prechecked.pop(id(unit))
+        else:
+            failures = self.getfailures(unit)
         if failures and self.options.autocorrect:
             # we can't get away with bad unquoting / requoting if we're going to change the result...
             correction = autocorrect.correct(unit.source, unit.target)
@@ -77,29 +248,108 @@ class pocheckfilter:
                 return []
         return failures
 
-    def filterfile(self, transfile):
+    def getfailures(self, unit):
+        """returns the failures of the checks on unit, from the result cache
+        where possible"""
+        if self.resultcache is None:
+            return self.checker.run_filters(unit)
+        failures = self.resultcache.get(unit)
+        if failures is None:
+            start = time.time()
+            failures = self.checker.run_filters(unit)
+            self.resultcache.set(unit, failures, time.time() - start)
+        return failures
+
+    def checkunits(self, units, jobs):
+        """finds the failures of the units that will be checked in jobs
+        worker processes, for use by filterunit()"""
+        import multiprocessing
+        tocheck = []
+        for unit in units:
+            if unit.isheader():
+                continue
+            if not self.options.includefuzzy and unit.isfuzzy():
+                continue
+            if not self.options.includereview and unit.isreview():
+                continue
+            if self.resultcache is not None:
+                failures = self.resultcache.get(unit)
+                if failures is not None:
+                    self.prechecked[id(unit)] = failures
+                    continue
+            tocheck.append(unit)
+        if len(tocheck) < self.minparallelunits:
+            return
+        # The workers don't use the result cache, we add their results to it
+        resultcache, self.resultcache = self.resultcache, None
+        start = time.time()
+        pool = multiprocessing.Pool(jobs, _initcheckworker, (self, tocheck))
+        try:
+            chunksize = max(1, min(500, len(tocheck) // (jobs * 4)))
+            results = pool.map(_checkunit, range(len(tocheck)), chunksize)
+        finally:
+            pool.close()
+            pool.join()
+            self.resultcache = resultcache
+        seconds = (time.time() - start) * jobs / len(tocheck)
+        for unit, failures in zip(tocheck, results):
+            self.prechecked[id(unit)] = failures
+            if self.resultcache is not None:
+                self.resultcache.set(unit, failures, seconds)
+
+    def filterfile(self, transfile, jobs=1):
         """Runs filters on a translation store object.
         Parameters:
             - transfile. A translation store object.
+            - jobs. The number of processes to check the units in.
         Return value:
             - A new translation store object with the results of the filter included."""
         newtransfile = type(transfile)()
         newtransfile.setsourcelanguage(transfile.sourcelanguage)
         newtransfile.settargetlanguage(transfile.targetlanguage)
+        if jobs > 1 and hasattr(os, "fork"):
+            self.checkunits(transfile.units, jobs)
         for unit in transfile.units:
-            filterresult = self.filterunit(unit)
-            if filterresult:
-                if filterresult != autocorrect:
-                    for filtername, filtermessage in filterresult.iteritems():
-                        if self.options.addnotes:
-                            unit.adderror(filtername, filtermessage)
-                        if isinstance(filtermessage, checks.SeriousFilterFailure):
-                            unit.markfuzzy()
+            if self.checkunit(unit):
                 newtransfile.addunit(unit)
+        self.prechecked = {}
         if isinstance(newtransfile, poheader):
             newtransfile.updateheader(add=True, **transfile.parseheader())
         return newtransfile
 
+    def checkunit(self, unit):
+        """runs filters on a unit, adding the failures to it as errors.
+        Returns whether the unit should be included in the results."""
+        filterresult = self.filterunit(unit)
+        if not filterresult:
+            return False
+        if filterresult != autocorrect:
+            # sorted, so that cached results are written in the same order
+            for filtername, filtermessage in sorted(filterresult.iteritems()):
+                if self.options.addnotes:
+                    unit.adderror(filtername, filtermessage)
+                if isinstance(filtermessage, checks.SeriousFilterFailure):
+                    unit.markfuzzy()
+        return True
+
+    def filterstream(self, transfile, inputfile, outputfile):
+        """Runs filters on the units of inputfile while it is parsed into
+        transfile (see L{pofile.iterparse}), writing the results to outputfile
+        as they are found. Returns whether there were any results."""
+        results = itertools.ifilter(self.checkunit, transfile.iterparse(inputfile))
+        try:
+            firstunit = results.next()
+        except StopIteration:
+            return False
+        newtransfile = type(transfile)()
+        newtransfile.setsourcelanguage(transfile.sourcelanguage)
+        newtransfile.settargetlanguage(transfile.targetlanguage)
+        if isinstance(newtransfile, poheader):
+            newtransfile.updateheader(add=True, **transfile.parseheader())
+        for output in newtransfile.iterstr(itertools.chain([firstunit], results)):
+            outputfile.write(output)
+        return True
+
 class FilterOptionParser(optrecurse.RecursiveOptionParser):
     """a specialized Option Parser for filter tools..."""
     def __init__(self, formats):
@@ -110,6 +360,43 @@ class FilterOptionParser(optrecurse.RecursiveOptionParser):
             default=False, callback_kwargs={'dest_value': True},
             callback=self.parse_noinput, help="list filters available")
 
+    def useprocesspool(self, options, inputfiles):
+        """checks several files in a pool of worker processes, see
+        L{optrecurse.RecursiveOptionParser.useprocesspool}. The units of a
+        single file are checked in parallel by L{pocheckfilter.filterfile}
+        instead, since jobs is passed through to it"""
+        if options.jobs <= 1 or len(inputfiles) <= 1 or not hasattr(os, "fork"):
+            return False
+        return options.recursiveoutput
+
+    def initjobworker(self, options):
+        """checks the units of each file in the worker process itself, with
+        its own connection to the result cache"""
+        options.jobs = 1
+        if options.checkfilter.resultcache is not None:
+            options.checkfilter.resultcache = options.checkfilter.resultcache.reopen()
+
+    def processjob(self, options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath):
+        """checks a file in a worker process, writing its results to the
+        result cache. The statistics of the result cache are returned to be
+        added to those of the main process by L{writejoboutput}"""
+        success, output = super(FilterOptionParser, self).processjob(options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath)
+        resultcache = options.checkfilter.resultcache
+        if resultcache is None:
+            return success, output
+        resultcache.flush()
+        statistics = (resultcache.hits, resultcache.misses, resultcache.saved)
+        resultcache.hits, resultcache.misses, resultcache.saved = 0, 0, 0.0
+        return success, statistics
+
+    def writejoboutput(self, options, fulloutputpath, output):
+        """adds the result cache statistics returned by L{processjob}"""
+        resultcache = options.checkfilter.resultcache
+        hits, misses, saved = output
+        resultcache.hits += hits
+        resultcache.misses += misses
+        resultcache.saved += saved
+
     def parse_noinput(self, option, opt, value, parser, *args, **kwargs):
         """this sets an option to true, but also sets input to - to prevent an error"""
         setattr(parser.values, option.dest, kwargs['dest_value'])
@@ -152,12 +439,22 @@ class FilterOptionParser(optrecurse.RecursiveOptionParser):
         if options.listfilters:
             print options.checkfilter.getfilterdocs()
         else:
-            self.recursiveprocess(options)
+            try:
+                self.recursiveprocess(options)
+            finally:
+                resultcache = options.checkfilter.resultcache
+                if resultcache is not None:
+                    resultcache.close()
+                    print >> sys.stderr, resultcache.report()
 
-def runfilter(inputfile, outputfile, templatefile, checkfilter=None):
+def runfilter(inputfile, outputfile, templatefile, checkfilter=None, stream=False, jobs=1):
     """reads in inputfile, filters using checkfilter, writes to outputfile"""
+    if stream:
+        storeclass = factory.getclass(inputfile)
+        if hasattr(storeclass, "iterstr"):
+            return int(checkfilter.filterstream(storeclass(), inputfile, outputfile))
     fromfile = factory.getobject(inputfile)
-    tofile = checkfilter.filterfile(fromfile)
+    tofile = checkfilter.filterfile(fromfile, jobs)
     if tofile.isempty():
         return 0
     outputfile.write(str(tofile))
@@ -223,7 +520,16 @@ def cmdlineparser():
     parser.add_option("", "--validcharsfile", dest="validcharsfile",
         default=None, type="string", metavar="FILE",
         help="read list of all valid characters from FILE (must be in UTF-8)")
+    parser.add_option("", "--stream", dest="stream",
+        action="store_true", default=False,
+        help="process PO files one unit at a time instead of loading them completely")
+    parser.add_option("", "--resultcache", dest="resultcache",
+        default=None, type="string", metavar="FILE",
+        help="remember the results of the checks in FILE, and reuse them for units that haven't changed")
     parser.passthrough.append('checkfilter')
+    parser.passthrough.append('stream')
+    # the units of a single file are checked in parallel, see --jobs
+    parser.passthrough.append('jobs')
     parser.description = __doc__
     return parser
 
@@ -116,6 +116,9 @@ def filterwordswithpunctuation(str1):
     """goes through a list of known words that have punctuation and removes the 
     punctuation from them"""
     assert isinstance(str1, unicode)
+    # the pattern below needs an apostrophe, so most strings can be skipped
+    if u"'" not in str1 and not [word for word in wordswithpunctuation if word in str1]:
+        return str1
     occurrences = []
     for word, replacement in wordswithpunctuation.iteritems():
         occurrences.extend([(pos, word, replacement) for pos in quote.find_all(str1, word)])
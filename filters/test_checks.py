@@ -2,6 +2,7 @@
 from translate.filters import checks
 from translate.lang import data
 from translate.storage import po
+from translate.misc.multistring import multistring
 
 def strprep(str1, str2, message=None):
     return data.normalized_unicode(str1), data.normalized_unicode(str2), data.normalized_unicode(message)
@@ -933,3 +934,60 @@ def test_gconf():
     gnomechecker.locations = ['file.schemas.in.h:24']
     assert passes(gnomechecker.gconf, 'Blah "gconf_setting"', 'Bleh "gconf_setting"')
     assert fails(gnomechecker.gconf, 'Blah "gconf_setting"', 'Bleh "gconf_steling"')
+
+def test_run_filters_plan():
+    """tests that the plan for running the filters follows the configuration,
+    and that skipping filters by their triggers doesn't change the results"""
+    stdchecker = checks.StandardChecker()
+    unit = po.pounit(u"Open %s file\\n")
+    unit.target = u"Maak lêer oop"
+    failures = stdchecker.run_filters(unit)
+    assert "printf" in failures and "escapes" in failures
+    plan = stdchecker.getplan()
+    assert stdchecker.getplan() is plan
+    stdchecker.config.lang.ignoretests.append("printf")
+    try:
+        assert "printf" not in stdchecker.run_filters(unit)
+        assert stdchecker.getplan() is not plan
+    finally:
+        stdchecker.config.lang.ignoretests.remove("printf")
+    assert "printf" in stdchecker.run_filters(unit)
+    # The results are the same when filters aren't skipped
+    unskipped = checks.StandardChecker()
+    unskipped.getchars = lambda unit: None
+    for source, target in [(u"Save (as)", u"Stoor"), (u"a@b.com", u"a@b"), (u"<b>x</b>", u"x"),
+                           (u"Tab\there", u"Oortjie"), (u"http://x.org", u"y"), (u"Open", u"Maak oop")]:
+        unit = po.pounit(source)
+        unit.target = target
+        assert stdchecker.run_filters(unit) == unskipped.run_filters(unit)
+
+def test_run_filters_markers():
+    """tests that the variable and accelerator filters are only used for units
+    with their markers, and that this doesn't change the results"""
+    kdechecker = checks.KdeChecker()
+    assert kdechecker.unitaccfilters == kdechecker.accfilters
+    kdechecker.selectfilters(set(u"Open file"))
+    assert kdechecker.unitaccfilters == [] and kdechecker.unitvarfilters == []
+    kdechecker.selectfilters(set(u"Open &file"))
+    assert kdechecker.unitaccfilters == kdechecker.accfilters and kdechecker.unitvarfilters == []
+    kdechecker.selectfilters(None)
+    # All the filters are used again after running the filters on a unit
+    unit = po.pounit(u"Open file")
+    unit.target = u"Maak lêer oop"
+    kdechecker.run_filters(unit)
+    assert kdechecker.unitaccfilters == kdechecker.accfilters
+    assert kdechecker.unitvarfilters == kdechecker.varfilters
+    unskipped = checks.KdeChecker()
+    unskipped.getchars = lambda unit: None
+    for source, target in [(u"&Open file", u"Maak lêer oop"), (u"&Open file", u"&Maak lêer oop"),
+                           (u"Open %1 files", u"Maak %2 lêers oop"), (u"%1 &files", u"%1 lêers"),
+                           (u"Don't do that", u"Moet dit nie doen nie"), (u"Open", u"Open")]:
+        unit = po.pounit(source)
+        unit.target = target
+        assert kdechecker.run_filters(unit) == unskipped.run_filters(unit)
+    # Each plural form is checked
+    unit = po.pounit(multistring([u"%1 file", u"%1 files"]))
+    unit.target = multistring([u"%1 lêer", u"%1 lêers"])
+    assert "variables" not in kdechecker.run_filters(unit)
+    unit.target = multistring([u"%1 lêer", u"lêers"])
+    assert "variables" in kdechecker.run_filters(unit)
@@ -1,6 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import shutil
+import sys
+import tempfile
+
 from translate.storage import factory
 from translate.storage import xliff
 from translate.storage.test_base import headerless_len, first_translatable
@@ -179,6 +184,11 @@ class TestPOFilter(BaseTestFilter):
     def setup_method(self, method):
         self.translationstore = self.parse_text(self.filetext)
         self.unit = first_translatable(self.translationstore)
+        self.testdir = tempfile.mkdtemp()
+        self.cachefile = os.path.join(self.testdir, "results.db")
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.testdir)
 
     def test_msgid_comments(self):
         """Tests that msgid comments don't feature anywhere."""
@@ -189,6 +199,129 @@ class TestPOFilter(BaseTestFilter):
             print first_translatable(filter_result)
         assert headerless_len(filter_result.units) == 0
 
+    def test_stream(self):
+        """checks that streaming gives the same results as loading the file"""
+        posource = '#: test.c\nmsgid "test"\nmsgstr "rest"\n\nmsgid "%d test"\nmsgstr "%s toets"\n\nmsgid "Test."\nmsgstr "Toets"\n'
+        options, args = pofilter.cmdlineparser().parse_args([self.filename])
+        checkerclasses = [checks.StandardChecker, checks.StandardUnitChecker]
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        inputfile = wStringIO.StringIO(posource)
+        inputfile.name = self.filename
+        outputfile = wStringIO.StringIO()
+        assert pofilter.runfilter(inputfile, outputfile, None, checkfilter, stream=True) == 1
+        filter_result = self.filter(self.parse_text(posource))
+        assert outputfile.getvalue() == str(filter_result)
+        assert headerless_len(filter_result.units) == 2
+
+    def test_resultcache(self):
+        """checks that cached results are reused only for unchanged units"""
+        posource = '#: test.c\nmsgid "test"\nmsgstr "rest"\n\nmsgid "%d test"\nmsgstr "%s toets"\n\nmsgid "Test."\nmsgstr "Toets"\n'
+        options, args = pofilter.cmdlineparser().parse_args([self.filename, "--resultcache", self.cachefile])
+        checkerclasses = [checks.StandardChecker, checks.StandardUnitChecker]
+        expected = str(self.filter(self.parse_text(posource)))
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        assert str(checkfilter.filterfile(self.parse_text(posource))) == expected
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (0, 3)
+        checkfilter.resultcache.close()
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        assert str(checkfilter.filterfile(self.parse_text(posource))) == expected
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (3, 0)
+        changed = self.parse_text(posource.replace("%s toets", "%d toets"))
+        assert headerless_len(checkfilter.filterfile(changed).units) == 1
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (5, 1)
+        checkfilter.resultcache.close()
+        # A different configuration doesn't use the same results
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig(targetlanguage="fr"))
+        checkfilter.filterfile(self.parse_text(posource))
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (0, 3)
+        checkfilter.resultcache.close()
+
+    def test_resultcache_suggestions(self):
+        """checks that cached results aren't reused when the suggestions for
+        a unit change"""
+        posource = 'msgid "test"\nmsgstr "rest"\n'
+        options, args = pofilter.cmdlineparser().parse_args([self.filename, "--resultcache", self.cachefile])
+        checkerclasses = [checks.StandardChecker, checks.StandardUnitChecker]
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        checkfilter.filterfile(self.parse_text(posource))
+        assert "hassuggestion" not in str(checkfilter.filterfile(self.parse_text(posource)))
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (1, 1)
+        checkfilter.checker.setsuggestionstore(self.parse_text('msgid "test"\nmsgstr "toets"\n'))
+        assert "hassuggestion" in str(checkfilter.filterfile(self.parse_text(posource)))
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (1, 2)
+        checkfilter.resultcache.close()
+
+    def test_resultcache_prune(self):
+        """checks that results that weren't used for a while are removed"""
+        posource = 'msgid "test"\nmsgstr "rest"\n\nmsgid "Test."\nmsgstr "Toets"\n'
+        options, args = pofilter.cmdlineparser().parse_args([self.filename, "--resultcache", self.cachefile])
+        checkerclasses = [checks.StandardChecker, checks.StandardUnitChecker]
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        checkfilter.filterfile(self.parse_text(posource))
+        maxage = checkfilter.resultcache.maxage
+        checkfilter.resultcache.close()
+        # pretend that the results are from a run long ago
+        con = pofilter.dbapi2.connect(self.cachefile)
+        con.execute("UPDATE results SET used = used - ?", (maxage + 1,))
+        con.commit()
+        con.close()
+        # only the results that are used again are kept
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        checkfilter.filterfile(self.parse_text(posource.replace("Toets", "Toets.")))
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (1, 1)
+        checkfilter.resultcache.close()
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        checkfilter.filterfile(self.parse_text(posource))
+        assert (checkfilter.resultcache.hits, checkfilter.resultcache.misses) == (1, 1)
+        checkfilter.resultcache.close()
+        con = pofilter.dbapi2.connect(self.cachefile)
+        assert con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 3
+        con.close()
+
+    def test_jobs(self):
+        """checks that checking units in parallel gives the same results"""
+        posource = "".join(['msgid "%%d test %d"\nmsgstr "%%s toets %d"\n\n' % (i, i) for i in range(150)])
+        posource += 'msgid "Test."\nmsgstr "Toets."\n'
+        options, args = pofilter.cmdlineparser().parse_args([self.filename])
+        checkerclasses = [checks.StandardChecker, checks.StandardUnitChecker]
+        checkfilter = pofilter.pocheckfilter(options, checkerclasses, checks.CheckerConfig())
+        filter_result = checkfilter.filterfile(self.parse_text(posource), jobs=2)
+        assert headerless_len(filter_result.units) == 150
+        assert str(filter_result) == str(self.filter(self.parse_text(posource)))
+
+    def run_pofilter(self, *argv):
+        """runs pofilter with the given command line arguments"""
+        oldargv = sys.argv
+        sys.argv = ["pofilter"] + list(argv)
+        try:
+            pofilter.main()
+        finally:
+            sys.argv = oldargv
+
+    def test_jobs_files(self):
+        """checks that the files of a directory are checked in parallel, with
+        the results of the worker processes saved in the result cache"""
+        inputdir = os.path.join(self.testdir, "input")
+        os.mkdir(inputdir)
+        for i in range(4):
+            posource = 'msgid "%%d test %d"\nmsgstr "%%s toets %d"\n\nmsgid "Test."\nmsgstr "Toets."\n' % (i, i)
+            open(os.path.join(inputdir, "test%d.po" % i), "w").write(posource)
+        parser = pofilter.cmdlineparser()
+        options, args = parser.parse_args([inputdir, "--jobs", "2"])
+        options.recursiveoutput = True
+        assert parser.useprocesspool(options, ["test0.po", "test1.po"])
+        assert not parser.useprocesspool(options, ["test0.po"])
+        self.run_pofilter(inputdir, os.path.join(self.testdir, "serial"))
+        for run in range(2):
+            outputdir = os.path.join(self.testdir, "parallel%d" % run)
+            self.run_pofilter("--jobs", "2", "--resultcache", self.cachefile, inputdir, outputdir)
+            for i in range(4):
+                expected = open(os.path.join(self.testdir, "serial", "test%d.po" % i)).read()
+                assert open(os.path.join(outputdir, "test%d.po" % i)).read() == expected
+        con = pofilter.dbapi2.connect(self.cachefile)
+        assert con.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 5
+        con.close()
+
 class TestXliffFilter(BaseTestFilter):
     """Test class for xliff-specific tests."""
     filetext = '''<?xml version="1.0" encoding="utf-8"?>
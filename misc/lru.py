@@ -18,103 +18,200 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
-from collections import deque
-from weakref import WeakValueDictionary
-import gc
-
-class LRUCachingDict(WeakValueDictionary):
+"""A bounded dictionary that discards the least recently used items"""
+
+import sys
+import threading
+from UserDict import DictMixin
+
+# The fields of the nodes of the linked list of items
+PREV, NEXT, KEY, VALUE, WEIGHT = 0, 1, 2, 3, 4
+
+def approximate_size(value):
+    """Returns the approximate number of bytes used by value, counting the
+    items of lists, tuples, sets and dictionaries (but not their items)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.iteritems():
+            size += sys.getsizeof(key) + sys.getsizeof(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += sys.getsizeof(item)
+    return size
+
+class LRUCachingDict(DictMixin, object):
     """Caching dictionary like object that discards the least recently
-    used objects when number of cached items exceeds maxsize.
+    used items when more than maxsize items are cached.
+
+    Looking up (but not testing for) an item makes it the most recently used.
+    The items are kept in a circular doubly linked list, from the least to
+    the most recently used, with a dictionary of the nodes of the list, so
+    that every operation takes constant time.
+
+    The keyword argument weigher is a function returning the weight of a
+    value (like L{approximate_size}). With maxweight, the least recently
+    used items are also discarded while the total weight exceeds maxweight.
 
-    cullsize is the fraction of items that will be discarded when
-    maxsize is reached.
+    hits, misses and evictions count the lookups that found an item, the
+    lookups that did not, and the items discarded to make space.
+
+    cullsize is accepted for compatibility only: items are discarded one at
+    a time.
     """
 
     def __init__(self, maxsize, cullsize=2, *args, **kwargs):
-        self.cullsize = max(2, cullsize)
-        self.maxsize = max(cullsize, maxsize)
-        self.queue = deque()
-        WeakValueDictionary.__init__(self, *args, **kwargs)
+        self.weigher = kwargs.pop("weigher", None)
+        self.maxweight = kwargs.pop("maxweight", None)
+        self.maxsize = max(1, maxsize)
+        self.cullsize = cullsize
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._nodes = {}
+        self._root = root = []
+        root[:] = [root, root, None, None, 0]
+        self.update(*args, **kwargs)
+
+    def _unlink(self, node):
+        node[PREV][NEXT] = node[NEXT]
+        node[NEXT][PREV] = node[PREV]
+
+    def _append(self, node):
+        """makes node the most recently used"""
+        last = self._root[PREV]
+        node[PREV] = last
+        node[NEXT] = self._root
+        last[NEXT] = self._root[PREV] = node
 
     def cull(self):
-        """free memory by deleting old items from cache"""
-        # maximum cache size exceeded, cull old items
-        #
-        # note queue is the real cache but its size is boundless
-        # since it might have duplicate references.
-        #
-        # don't bother culling if queue is smaller than weakref,
-        # this means there are too many references outside the
-        # cache, culling won't free much memory (if any).
-        while len(self) >= self.maxsize <= len(self.queue):
-            cullsize = max(int(len(self.queue) / self.cullsize), 2)
-            try:
-                for i in range(cullsize):
-                    self.queue.popleft()
-            except IndexError:
-                # queue is empty, bail out.
-                #FIXME: should we force garbage collection here too?
-                break
-
-            # call garbage collecter manually since objects
-            # with circular references take some time to get
-            # collected
-            for i in xrange(5):
-                gc.collect()
+        """discard the least recently used items until the cache is within
+        its bounds"""
+        root = self._root
+        while self._nodes and (len(self._nodes) > self.maxsize or
+                               (self.maxweight is not None and self.weight > self.maxweight)):
+            node = root[NEXT]
+            self._unlink(node)
+            del self._nodes[node[KEY]]
+            self.weight -= node[WEIGHT]
+            self.evictions += 1
 
     def __setitem__(self, key, value):
-        # check boundaries to minimiza duplicate references
-        while len(self.queue) and self.queue[0][0] == key:
-            # item at left end of queue pop it since it'll be appended
-            # to right
-            self.queue.popleft()
+        if self.weigher is not None:
+            weight = self.weigher(value)
+        else:
+            weight = 0
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = [None, None, key, value, weight]
+        else:
+            self._unlink(node)
+            self.weight -= node[WEIGHT]
+            node[VALUE] = value
+            node[WEIGHT] = weight
+        self._append(node)
+        self.weight += weight
+        self.cull()
 
-        while len(self.queue) and self.queue[-1][0] == key:
-            # item at right end of queue pop it since it'll be
-            # appended again
-            self.queue.pop()
+    def __getitem__(self, key):
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        self._unlink(node)
+        self._append(node)
+        return node[VALUE]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
-        if len(self) >= self.maxsize:
-            self.cull()
+    def __delitem__(self, key):
+        node = self._nodes.pop(key)
+        self._unlink(node)
+        self.weight -= node[WEIGHT]
 
-        self.queue.append((key, value))
-        WeakValueDictionary.__setitem__(self, key, value)
+    def pop(self, key, *default):
+        try:
+            node = self._nodes.pop(key)
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        self._unlink(node)
+        self.weight -= node[WEIGHT]
+        return node[VALUE]
 
-    def __getitem__(self, key):
-        value = WeakValueDictionary.__getitem__(self, key)
-        # check boundaries to minimiza duplicate references
-        while len(self.queue) > 0  and self.queue[0][0] == key:
-            # item at left end of queue pop it since it'll be appended
-            # to right
-            self.queue.popleft()
+    def __contains__(self, key):
+        return key in self._nodes
 
-        # only append if item is not at right end of queue
-        if not (len(self.queue) and self.queue[-1][0] == key):
-            self.queue.append((key, value))
+    has_key = __contains__
 
-        return value
+    def __len__(self):
+        return len(self._nodes)
 
-    def __delitem__(self, key):
-        # can't efficiently find item in queue to delete, check
-        # boundaries. otherwise just wait till next cache purge
-        while len(self.queue) and self.queue[0][0] == key:
-            # item at left end of queue pop it since it'll be appended
-            # to right
-            self.queue.popleft()
+    def _iterkeys(self):
+        root = self._root
+        node = root[NEXT]
+        while node is not root:
+            yield node[KEY]
+            node = node[NEXT]
+
+    def __iter__(self):
+        """iterates over the keys, from the least to the most recently used"""
+        return self._iterkeys()
 
-        while len(self.queue) and self.queue[-1][0] == key:
-            # item at right end of queue pop it since it'll be
-            # appended again
-            self.queue.pop()
+    def keys(self):
+        return list(self._iterkeys())
 
-        return WeakValueDictionary.__delitem__(self, key)
+    def items(self):
+        return [(key, self._nodes[key][VALUE]) for key in self.keys()]
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def values(self):
+        return [value for key, value in self.items()]
+
+    def itervalues(self):
+        return iter(self.values())
 
     def clear(self):
-        self.queue.clear()
-        return WeakValueDictionary.clear(self)
+        self._nodes.clear()
+        self._root[:] = [self._root, self._root, None, None, 0]
+        self.weight = 0
 
     def setdefault(self, key, default):
         if key not in self:
             self[key] = default
 
         return self[key]
+
+def _locked(method):
+    def locked_method(self, *args, **kwargs):
+        self._lock.acquire()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._lock.release()
+    locked_method.__name__ = method.__name__
+    locked_method.__doc__ = method.__doc__
+    return locked_method
+
+class LockingLRUCachingDict(LRUCachingDict):
+    """An L{LRUCachingDict} that can be shared between threads"""
+
+    def __init__(self, maxsize, cullsize=2, *args, **kwargs):
+        self._lock = threading.RLock()
+        LRUCachingDict.__init__(self, maxsize, cullsize, *args, **kwargs)
+
+    for name in ("__setitem__", "__getitem__", "__delitem__", "pop", "keys",
+                 "items", "clear", "setdefault", "update", "cull"):
+        locals()[name] = _locked(getattr(LRUCachingDict, name).im_func)
+    del name
+
+    def __iter__(self):
+        return iter(self.keys())
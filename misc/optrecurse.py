@@ -68,6 +68,22 @@ class ManHelpFormatter (optparse.HelpFormatter):
 
         return '\\fB%s\\fP' % ("\\fR, \\fP".join(opts))
 
+# The parser, options and files of a parallelprocess() run, for use in the
+# worker processes
+_jobparser = None
+_joboptions = None
+_filejobs = None
+
+def _initjobworker(parser, options, filejobs):
+    global _jobparser, _joboptions, _filejobs
+    _jobparser, _joboptions, _filejobs = parser, options, filejobs
+    parser.initjobworker(options)
+
+def _runjob(index):
+    inputpath, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath = _filejobs[index]
+    success, output = _jobparser.processjob(_joboptions, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath)
+    return index, success, output
+
 class RecursiveOptionParser(optparse.OptionParser, object):
     """A specialized Option Parser for recursing through directories."""
 
@@ -83,6 +99,7 @@ class RecursiveOptionParser(optparse.OptionParser, object):
         self.setmanpageoption()
         self.setprogressoptions()
         self.seterrorleveloptions()
+        self.setjobsoption()
         self.setformats(formats, usetemplates)
         self.setpsycooption()
         self.passthrough = []
@@ -305,6 +322,12 @@ class RecursiveOptionParser(optparse.OptionParser, object):
                 help="show errorlevel as: %s" % (", ".join(self.errorleveltypes)))
         self.define_option(errorleveloption)
 
+    def setjobsoption(self):
+        """sets the option for processing files in parallel"""
+        jobsoption = optparse.Option("-j", "--jobs", dest="jobs", default=1, type="int", metavar="JOBS",
+                help="use JOBS parallel processes (default: 1)")
+        self.define_option(jobsoption)
+
     def getformathelp(self, formats):
         """make a nice help string for describing formats..."""
         if None in formats:
@@ -474,36 +497,109 @@ class RecursiveOptionParser(optparse.OptionParser, object):
         options.recursiveoutput = self.isrecursive(options.output, 'output') and getattr(options, "allowrecursiveoutput", True)
         options.recursivetemplate = self.usetemplates and self.isrecursive(options.template, 'template') and getattr(options, "allowrecursivetemplate", True)
         self.initprogressbar(inputfiles, options)
-        for inputpath in inputfiles:
-            try:
-                templatepath = self.gettemplatename(options, inputpath)
-                # If we have a recursive template, but the template doesn't have this
-                # input file, let's drop it.
-                if options.recursivetemplate and templatepath is None and not self.allowmissingtemplate:
-                    self.warning("No template at %s. Skipping %s." % (templatepath, inputpath))
+        if self.useprocesspool(options, inputfiles):
+            self.parallelprocess(options, inputfiles)
+        else:
+            for inputpath in inputfiles:
+                filejob = self.getfilejob(options, inputpath)
+                if filejob is None:
                     continue
-                outputformat, fileprocessor = self.getoutputoptions(options, inputpath, templatepath)
-                fullinputpath = self.getfullinputpath(options, inputpath)
-                fulltemplatepath = self.getfulltemplatepath(options, templatepath)
-                outputpath = self.getoutputname(options, inputpath, outputformat)
-                fulloutputpath = self.getfulloutputpath(options, outputpath)
-                if options.recursiveoutput and outputpath:
-                    self.checkoutputsubdir(options, os.path.dirname(outputpath))
-            except Exception, error:
-                if isinstance(error, KeyboardInterrupt):
-                    raise
-                self.warning("Couldn't handle input file %s" % inputpath, options, sys.exc_info())
-                continue
-            try:
-                success = self.processfile(fileprocessor, options, fullinputpath, fulloutputpath, fulltemplatepath)
-            except Exception, error:
-                if isinstance(error, KeyboardInterrupt):
-                    raise
-                self.warning("Error processing: input %s, output %s, template %s" % (fullinputpath, fulloutputpath, fulltemplatepath), options, sys.exc_info())
-                success = False
-            self.reportprogress(inputpath, success)
+                success = self.tryprocessfile(options, *filejob)
+                self.reportprogress(inputpath, success)
         del self.progressbar
 
+    def getfilejob(self, options, inputpath):
+        """works out how to process the given input file
+
+        @return: the file processor and the full input, output and template
+        paths, or None if the file can't be handled"""
+        try:
+            templatepath = self.gettemplatename(options, inputpath)
+            # If we have a recursive template, but the template doesn't have this
+            # input file, let's drop it.
+            if options.recursivetemplate and templatepath is None and not self.allowmissingtemplate:
+                self.warning("No template at %s. Skipping %s." % (templatepath, inputpath))
+                return None
+            outputformat, fileprocessor = self.getoutputoptions(options, inputpath, templatepath)
+            fullinputpath = self.getfullinputpath(options, inputpath)
+            fulltemplatepath = self.getfulltemplatepath(options, templatepath)
+            outputpath = self.getoutputname(options, inputpath, outputformat)
+            fulloutputpath = self.getfulloutputpath(options, outputpath)
+            if options.recursiveoutput and outputpath:
+                self.checkoutputsubdir(options, os.path.dirname(outputpath))
+        except Exception, error:
+            if isinstance(error, KeyboardInterrupt):
+                raise
+            self.warning("Couldn't handle input file %s" % inputpath, options, sys.exc_info())
+            return None
+        return fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath
+
+    def tryprocessfile(self, options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath):
+        """process an individual file, reporting errors as warnings"""
+        try:
+            return self.processfile(fileprocessor, options, fullinputpath, fulloutputpath, fulltemplatepath)
+        except Exception, error:
+            if isinstance(error, KeyboardInterrupt):
+                raise
+            self.warning("Error processing: input %s, output %s, template %s" % (fullinputpath, fulloutputpath, fulltemplatepath), options, sys.exc_info())
+            return False
+
+    def useprocesspool(self, options, inputfiles):
+        """checks whether the files should be processed by a pool of worker processes
+
+        Parsers that pass the jobs option through to their file processor
+        parallelise within each file instead."""
+        if getattr(options, "jobs", 1) <= 1 or len(inputfiles) <= 1:
+            return False
+        if "jobs" in self.passthrough or not hasattr(os, "fork"):
+            return False
+        # several files written to stdout would get mixed up
+        return options.recursiveoutput
+
+    def parallelprocess(self, options, inputfiles):
+        """process the input files in options.jobs worker processes
+
+        Progress and output that needs to be written in this process (see
+        L{processjob}) are handled in the order of the input files, so that
+        archives are written in the same order as when run serially."""
+        import multiprocessing
+        filejobs = []
+        for inputpath in inputfiles:
+            filejob = self.getfilejob(options, inputpath)
+            if filejob is not None:
+                filejobs.append((inputpath,) + filejob)
+        pool = multiprocessing.Pool(options.jobs, _initjobworker, (self, options, filejobs))
+        try:
+            for index, success, output in pool.imap(_runjob, range(len(filejobs))):
+                inputpath, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath = filejobs[index]
+                if output is not None:
+                    try:
+                        self.writejoboutput(options, fulloutputpath, output)
+                    except Exception, error:
+                        self.warning("Error writing output %s" % fulloutputpath, options, sys.exc_info())
+                        success = False
+                self.reportprogress(inputpath, success)
+        finally:
+            pool.close()
+            pool.join()
+
+    def initjobworker(self, options):
+        """prepares a worker process of L{parallelprocess}"""
+        pass
+
+    def processjob(self, options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath):
+        """process an individual file in a worker process of L{parallelprocess}
+
+        @return: whether the file was processed successfully, and output that
+        must be written in the main process with L{writejoboutput} (or None)"""
+        return self.tryprocessfile(options, fileprocessor, fullinputpath, fulloutputpath, fulltemplatepath), None
+
+    def writejoboutput(self, options, fulloutputpath, output):
+        """writes output returned by L{processjob} to its destination"""
+        outputfile = self.openoutputfile(options, fulloutputpath)
+        outputfile.write(output)
+        outputfile.close()
+
     def openinputfile(self, options, fullinputpath):
         """opens the input file"""
         if fullinputpath is None:
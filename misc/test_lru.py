@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+from translate.misc import lru
+
+class TestLRUCachingDict:
+    cacheclass = lru.LRUCachingDict
+
+    def test_eviction(self):
+        """tests that the least recently used items are discarded"""
+        cache = self.cacheclass(3)
+        for number in range(3):
+            cache[number] = str(number)
+        assert cache[0] == "0"
+        cache[3] = "3"
+        assert cache.keys() == [2, 0, 3]
+        assert 1 not in cache
+        # testing for an item doesn't make it recently used
+        assert 2 in cache
+        cache[4] = "4"
+        assert cache.keys() == [0, 3, 4]
+        cache[0] = "zero"
+        cache[5] = "5"
+        assert cache.keys() == [4, 0, 5]
+        assert cache.items() == [(4, "4"), (0, "zero"), (5, "5")]
+        assert cache.evictions == 3
+
+    def test_counters(self):
+        """tests counting hits and misses"""
+        cache = self.cacheclass(10)
+        cache["a"] = 1
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.setdefault("b", 2) == 2
+        assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 0)
+
+    def test_delete(self):
+        """tests removing items"""
+        cache = self.cacheclass(10, weigher=len)
+        cache.update({"a": "xx", "b": "yyy", "c": "z"})
+        del cache["b"]
+        assert cache.pop("c") == "z"
+        assert cache.pop("c", None) is None
+        assert cache.keys() == ["a"] and cache.weight == 2
+        cache.clear()
+        assert not cache and cache.weight == 0
+        cache["d"] = "w"
+        assert cache.keys() == ["d"]
+
+    def test_weight(self):
+        """tests discarding items to stay within maxweight"""
+        cache = self.cacheclass(100, weigher=len, maxweight=10)
+        cache["a"] = "x" * 4
+        cache["b"] = "y" * 5
+        assert cache.weight == 9
+        cache["c"] = "z" * 3
+        assert cache.keys() == ["b", "c"] and cache.weight == 8
+        cache["b"] = "y"
+        assert cache.weight == 4
+        # items heavier than maxweight are not kept
+        cache["d"] = "w" * 11
+        assert "d" not in cache
+        assert lru.approximate_size([u"abc"]) > lru.approximate_size([])
+
+class TestLockingLRUCachingDict(TestLRUCachingDict):
+    cacheclass = lru.LockingLRUCachingDict
+
+    def test_threads(self):
+        """tests using the cache from several threads"""
+        cache = self.cacheclass(50)
+        def work(offset):
+            for number in range(1000):
+                key = (number * 7 + offset) % 120
+                if cache.get(key) is None:
+                    cache[key] = key
+        threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(cache) == 50
+        assert len(cache.keys()) == 50
+        for key, value in cache.items():
+            assert key == value
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import timeit
+
+from translate.misc import typecheck
+
+def add(a, b):
+    return a + b
+
+class TestTypecheck:
+    def setup_method(self, method):
+        self.enabled = typecheck.typechecking_enabled()
+
+    def teardown_method(self, method):
+        typecheck.enable_typechecking(self.enabled)
+
+    def test_checking(self):
+        """tests that the decorators check types when enabled"""
+        typecheck.enable_typechecking()
+        checked = typecheck.accepts(int, int)(add)
+        assert checked is not add
+        assert checked(1, 2) == 3
+        try:
+            checked(1, "2")
+        except typecheck.TypeCheckError:
+            pass
+        else:
+            assert False, "expected a TypeCheckError"
+        returning = typecheck.returns(str)(add)
+        assert returning("a", "b") == "ab"
+
+    def test_production(self):
+        """tests that the decorators return the function itself when checking
+        is disabled, so that calls cost nothing extra"""
+        typecheck.disable_typechecking()
+        assert typecheck.accepts(int, int)(add) is add
+        assert typecheck.returns(int)(add) is add
+        assert typecheck.yields(int)(add) is add
+        assert typecheck.accepts(int, int)(add)("a", "b") == "ab"
+
+    def test_overhead(self):
+        """tests that the call overhead of checking disappears when disabled"""
+        typecheck.enable_typechecking()
+        checked = typecheck.accepts(int, int)(add)
+        typecheck.disable_typechecking()
+        unchecked = typecheck.accepts(int, int)(add)
+        def calltime(func):
+            return min(timeit.repeat(lambda: func(1, 2), number=2000, repeat=3))
+        assert calltime(unchecked) * 5 < calltime(checked)
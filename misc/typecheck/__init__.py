@@ -1535,25 +1535,41 @@ def typecheck_yield(*signature):
         return Fake_generator(gen, signature)
     return _decorator(signature, 'type_return', 'type_yield', __check_yield)
 
-_null_decorator = lambda *args, **kwargs: lambda f: f
-typecheck = _null_decorator
-accepts = _null_decorator
-returns = _null_decorator
-yields = _null_decorator
-
-# Aliases
-def enable_typechecking():
-    global typecheck
-    global accepts
-    global returns
-    global yields
-  
-    typecheck = typecheck_args
-    accepts = typecheck_args
-    returns = typecheck_return
-    yields = typecheck_yield
-
+# Whether typecheck, accepts, returns and yields check types. This is decided
+# when a function is decorated: without checking they return the function
+# itself, so that decorated functions on hot paths cost nothing extra to call.
+# Checking is enabled with the PYTHONTYPECHECK environment variable or
+# enable_typechecking(), before the modules to check are imported.
 import os
-if "PYTHONTYPECHECK" in os.environ:
-    enable_typechecking()
+_typechecking = "PYTHONTYPECHECK" in os.environ
+
+def _return_function(func):
+    return func
+
+def _switched_decorator(checking_decorator):
+    def decorator(*args, **kwargs):
+        if _typechecking:
+            return checking_decorator(*args, **kwargs)
+        return _return_function
+    decorator.__name__ = checking_decorator.__name__
+    decorator.__doc__ = checking_decorator.__doc__
+    return decorator
+
+typecheck = _switched_decorator(typecheck_args)
+accepts = typecheck
+returns = _switched_decorator(typecheck_return)
+yields = _switched_decorator(typecheck_yield)
+
+def enable_typechecking(enable=True):
+    """Makes the decorators check types (or not) in functions decorated
+    from now on"""
+    global _typechecking
+    _typechecking = enable
+
+def disable_typechecking():
+    """Makes the decorators return functions decorated from now on as they
+    are, without any checking"""
+    enable_typechecking(False)
 
+def typechecking_enabled():
+    return _typechecking
@@ -23,9 +23,8 @@
 import logging
 import os
 
-def launch_server_wsgiref(host, port, app):
-    """use python's builtin simple_server, this is a last resort since
-    it doesn't support concurrency at all"""
+def get_request_handler():
+    """returns a wsgiref request handler class that logs using logging"""
     from wsgiref import simple_server
     class CustomRequestHandler(simple_server.WSGIRequestHandler):
         """Custom request handler, disables some inefficient defaults"""
@@ -45,12 +44,55 @@ def launch_server_wsgiref(host, port, app):
             stderror."""
             logging.info("%s - - [%s] %s",
                          self.address_string(),  self.log_date_time_string(), format % args)
-        
-    server = simple_server.make_server(host, port, app, handler_class=CustomRequestHandler)
+    return CustomRequestHandler
+
+
+def launch_server_wsgiref(host, port, app):
+    """use python's builtin simple_server, this is a last resort since
+    it doesn't support concurrency at all"""
+    from wsgiref import simple_server
+    server = simple_server.make_server(host, port, app, handler_class=get_request_handler())
     logging.info("Starting wsgiref server, listening on port %s", port)
     server.serve_forever()
 
 
+def launch_server_threadpool(host, port, app, num_threads=10):
+    """use python's builtin simple_server, handling requests in a fixed pool
+    of threads. Since the threads live as long as the server, so do any
+    per thread resources (like database connections) that they use."""
+    from wsgiref import simple_server
+    import Queue
+    import threading
+
+    class ThreadPoolWSGIServer(simple_server.WSGIServer):
+        """A WSGI server that passes requests on to a pool of threads"""
+
+        def serve_forever(self):
+            self.requests = Queue.Queue()
+            for i in range(num_threads):
+                thread = threading.Thread(target=self.process_requests)
+                thread.setDaemon(True)
+                thread.start()
+            simple_server.WSGIServer.serve_forever(self)
+
+        def process_request(self, request, client_address):
+            self.requests.put((request, client_address))
+
+        def process_requests(self):
+            while True:
+                request, client_address = self.requests.get()
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                self.close_request(request)
+
+    server = simple_server.make_server(host, port, app, server_class=ThreadPoolWSGIServer,
+                                       handler_class=get_request_handler())
+    logging.info("Starting wsgiref server with %d threads, listening on port %s", num_threads, port)
+    server.serve_forever()
+
+
 def launch_server_django(host, port, app):
     """use django's development server, only works for django apps"""
     if 'DJANGO_SETTINGS_MODULE' not in os.environ:
@@ -73,9 +115,7 @@ def launch_server_cherrypy(host, port, app):
     except KeyboardInterrupt:
         server.stop()
 
-#FIXME: implement threading http server based on BaseHTTPServer and wsgiref
-
-servers = [launch_server_cherrypy, launch_server_django, launch_server_wsgiref]
+servers = [launch_server_cherrypy, launch_server_django, launch_server_threadpool, launch_server_wsgiref]
 
 def launch_server(host, port, app):
     """use the best possible wsgi server"""
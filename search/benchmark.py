@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks translation memory matching on a synthetic memory.
+
+Usage: benchmark.py [candidates] [queries] [min_similarity]
+"""
+
+import random
+import string
+import sys
+import time
+
+from translate.search import lshtein
+from translate.search import match
+from translate.storage import po
+
+
+class CountingComparer(lshtein.LevenshteinComparer):
+    """A Levenshtein comparer that counts how often it is used"""
+    def __init__(self, max_len=200):
+        lshtein.LevenshteinComparer.__init__(self, max_len)
+        self.comparisons = 0
+
+    def similarity(self, a, b, stoppercentage=40):
+        self.comparisons += 1
+        return lshtein.LevenshteinComparer.similarity(self, a, b, stoppercentage)
+
+
+class MatchBenchmarker:
+    """class to aid in benchmarking the translation memory matcher"""
+    def __init__(self, num_candidates, words_per_string=8, vocabulary=500):
+        """builds a memory with num_candidates random strings"""
+        self.words = []
+        for i in range(vocabulary):
+            length = random.randint(2, 9)
+            self.words.append("".join([random.choice(string.ascii_lowercase) for j in range(length)]))
+        self.words_per_string = words_per_string
+        self.store = po.pofile()
+        for i in range(num_candidates):
+            unit = self.store.addsourceunit(self.random_string())
+            unit.target = self.random_string()
+
+    def random_string(self):
+        """returns a random string of words from the vocabulary"""
+        return " ".join([random.choice(self.words) for i in range(random.randint(1, self.words_per_string))])
+
+    def run(self, queries, min_similarity, ngramindex):
+        """matches queries against the memory, returning the comparisons per
+        query and the time taken"""
+        comparer = CountingComparer(70)
+        matcher = match.matcher(self.store, min_similarity=min_similarity, comparer=comparer, ngramindex=ngramindex)
+        start = time.time()
+        for query in queries:
+            matcher.matches(query)
+        return comparer.comparisons / float(len(queries)), time.time() - start
+
+if __name__ == "__main__":
+    num_candidates, num_queries, min_similarity = 5000, 50, 75
+    if len(sys.argv) > 1:
+        num_candidates = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        num_queries = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        min_similarity = int(sys.argv[3])
+    random.seed(0)
+    benchmarker = MatchBenchmarker(num_candidates)
+    # Queries are slightly altered candidates, so that there are real matches
+    queries = []
+    for i in range(num_queries):
+        source = random.choice(benchmarker.store.units).source
+        position = random.randint(0, len(source) - 1)
+        queries.append(source[:position] + "x" + source[position+1:])
+    for ngramindex in (False, True):
+        comparisons, seconds = benchmarker.run(queries, min_similarity, ngramindex)
+        print "ngramindex=%s: %.1f comparisons per query, %.3f seconds" % (ngramindex, comparisons, seconds)
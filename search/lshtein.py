@@ -30,24 +30,53 @@ import math
 
 def python_distance(a, b, stopvalue=-1):
     """Calculates the distance for use in similarity calculation. Python
-    version."""
+    version.
+
+    If stopvalue is given, only the diagonal band of the matrix that can lead
+    to a distance of at most stopvalue is calculated (Ukkonen's cut-off), and
+    calculation stops as soon as the distance is known to be bigger than
+    stopvalue. In that case some value bigger than stopvalue is returned."""
     l1 = len(a)
     l2 = len(b)
     if stopvalue == -1:
-        stopvalue = l2
-    current = range(l1+1)
-    for i in range(1, l2+1):
-        previous, current = current, [i]+[0]*l1
-        least = l2
-        for j in range(1, l1 + 1):
+        stopvalue = max(l1, l2)
+    stopvalue = int(stopvalue)
+    if abs(l1 - l2) > stopvalue:
+        return abs(l1 - l2)
+    # Common prefixes and suffixes don't influence the distance
+    while l1 and l2 and a[l1-1] == b[l2-1]:
+        l1 -= 1
+        l2 -= 1
+    start = 0
+    while start < l1 and start < l2 and a[start] == b[start]:
+        start += 1
+    a = a[start:l1]
+    b = b[start:l2]
+    l1 -= start
+    l2 -= start
+
+    # Cells further than stopvalue from the diagonal always exceed stopvalue
+    overflow = stopvalue + 1
+    current = range(min(l1, stopvalue) + 1) + [overflow] * max(l1 - stopvalue, 0)
+    for i in xrange(1, l2+1):
+        previous, current = current, [overflow]*(l1+1)
+        if i <= stopvalue:
+            current[0] = i
+        least = current[0]
+        char = b[i-1]
+        for j in xrange(max(1, i - stopvalue), min(l1, i + stopvalue) + 1):
             change = previous[j-1]
-            if a[j-1] != b[i-1]:
-                change = change + 1
+            if a[j-1] != char:
+                change += 1
             insert = previous[j] + 1
+            if insert < change:
+                change = insert
             delete = current[j-1] + 1
-            current[j] = min(insert, delete, change)
-            if least > current[j]:
-                least = current[j]
+            if delete < change:
+                change = delete
+            current[j] = change
+            if least > change:
+                least = change
         #The smallest value in the current array is the best (lowest) value
         #that can be attained in the end if the strings are identical further
         if least > stopvalue:
@@ -55,17 +84,32 @@ def python_distance(a, b, stopvalue=-1):
 
     return current[l1]
 
-def native_distance(a, b, stopvalue=0):
+def native_distance(a, b, stopvalue=-1):
     """Same as python_distance in functionality. This uses the fast C 
     version if we detected it earlier.
 
+    Newer versions of the C module can stop early when given a cut-off, older
+    versions always calculate the full distance.
+
     Note that this does not support arbitrary sequence types, but only 
     string types."""
+    if stopvalue == -1:
+        return Levenshtein.distance(a, b)
+    lengthdifference = abs(len(a) - len(b))
+    if lengthdifference > stopvalue:
+        return lengthdifference
+    if native_cutoff:
+        return Levenshtein.distance(a, b, score_cutoff=int(stopvalue))
     return Levenshtein.distance(a, b)
 
 try:
     import Levenshtein as Levenshtein
     distance = native_distance
+    try:
+        Levenshtein.distance("a", "b", score_cutoff=0)
+        native_cutoff = True
+    except TypeError:
+        native_cutoff = False
 except Exception:
     import logging
     logging.warning("Python-Levenshtein not found. Continuing with built-in (slower) fuzzy matching.")
@@ -110,7 +154,8 @@ class LevenshteinComparer:
                - Calculation is stopped as soon as a similarity of stoppercentage becomes
                  unattainable. See the use of the variable stopvalue.
                - Implementation uses memory O(min(len(a), len(b))
-               - Excecution time is O(len(a)*len(b))
+               - Excecution time is O(max(len(a), len(b)) * stopvalue), since
+                 only a band around the diagonal of the matrix is calculated
         """
         l1, l2 = len(a), len(b)
         if l1 == 0 or l2 == 0:
@@ -138,7 +183,7 @@ class LevenshteinComparer:
                 penalty += 7
 
         #The actual value in the array that would represent a giveup situation:
-        stopvalue = math.ceil((100.0 - stoppercentage)/100 * l2)
+        stopvalue = int(math.ceil((100.0 - stoppercentage)/100 * l2))
         dist = distance(a, b, stopvalue)
         if dist > stopvalue:
             return stoppercentage - 1.0
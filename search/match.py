@@ -20,7 +20,10 @@
 
 """Class to perform translation memory matching from a store of translation units"""
 
+import array
+import bisect
 import heapq
+import math
 import re
 
 from translate.search import lshtein
@@ -35,20 +38,139 @@ def sourcelen(unit):
     return len(unit.source)
 
 
+class candidatestore(object):
+    """The candidates of a translation memory, kept in parallel columns
+    instead of as units.
+
+    The candidates are sorted by the length of their source string (longest
+    first if reverse is True), candidates with equal lengths in the order they
+    were added. Positions change as candidates are inserted, so every
+    candidate also has a permanent id. Units are only built by L{getunit}
+    for the candidates that are asked for."""
+
+    def __init__(self, reverse=False):
+        self.reverse = reverse
+        self.sources = []
+        self.targets = []
+        # the length of the source (negated if reverse), the sort key
+        self.keys = array.array('l')
+        self.ids = array.array('l')
+        self.noteindexes = array.array('l')
+        self.fuzzy = array.array('b')
+        # distinct notes, and note -> index in notes
+        self.notes = []
+        self.noteindex = {}
+        # id -> (source, target) for plural candidates
+        self.origs = {}
+        self.nextid = 0
+        self.issorted = True
+
+    def __len__(self):
+        return len(self.sources)
+
+    def getkey(self, source):
+        if self.reverse:
+            return -len(source)
+        return len(source)
+
+    def add(self, source, target, notes=u"", fuzzy=False, orig=None, sort=False):
+        """Adds a candidate and returns its id.
+
+        @param orig: the original (source, target) of a plural candidate
+        @param sort: insert the candidate in its sorted position, instead
+        of adding it at the end. This only keeps the candidates sorted if
+        they were sorted already (see L{sort}).
+        """
+        candidateid = self.nextid
+        self.nextid += 1
+        key = self.getkey(source)
+        noteindex = self.noteindex.get(notes)
+        if noteindex is None:
+            noteindex = self.noteindex[notes] = len(self.notes)
+            self.notes.append(notes)
+        if orig is not None:
+            self.origs[candidateid] = orig
+        if sort and self.issorted:
+            index = bisect.bisect_right(self.keys, key)
+            self.sources.insert(index, source)
+            self.targets.insert(index, target)
+            self.keys.insert(index, key)
+            self.ids.insert(index, candidateid)
+            self.noteindexes.insert(index, noteindex)
+            self.fuzzy.insert(index, bool(fuzzy))
+        else:
+            if self.keys and key < self.keys[-1]:
+                self.issorted = False
+            self.sources.append(source)
+            self.targets.append(target)
+            self.keys.append(key)
+            self.ids.append(candidateid)
+            self.noteindexes.append(noteindex)
+            self.fuzzy.append(bool(fuzzy))
+        return candidateid
+
+    def setsource(self, index, source):
+        """Changes the source of the candidate at index, which leaves the
+        candidates unsorted until the next L{sort}"""
+        self.sources[index] = source
+        self.keys[index] = self.getkey(source)
+        self.issorted = False
+
+    def sort(self):
+        """Sorts the candidates, keeping candidates with equal lengths in
+        their current order"""
+        if self.issorted:
+            return
+        order = sorted(xrange(len(self.keys)), key=self.keys.__getitem__)
+        self.sources = [self.sources[index] for index in order]
+        self.targets = [self.targets[index] for index in order]
+        for name in ("keys", "ids", "noteindexes", "fuzzy"):
+            column = getattr(self, name)
+            setattr(self, name, array.array(column.typecode, [column[index] for index in order]))
+        self.issorted = True
+
+    def startindex(self, length):
+        """Returns the position of the first candidate with a source of at
+        least length characters, if not sorted in reverse"""
+        return bisect.bisect_left(self.keys, int(math.ceil(length)))
+
+    def getunit(self, index):
+        """Builds a simple unit for the candidate at index"""
+        unit = base.TranslationUnit(self.sources[index])
+        unit.target = self.targets[index]
+        unit.addnote(self.notes[self.noteindexes[index]])
+        unit.fuzzy = bool(self.fuzzy[index])
+        orig = self.origs.get(self.ids[index])
+        if orig is not None:
+            unit.orig_source, unit.orig_target = orig
+        return unit
+
+    def getunits(self):
+        """Builds units for all the candidates, which is expensive for a
+        large memory"""
+        return [self.getunit(index) for index in xrange(len(self))]
+    units = property(getunits)
+
+
 class matcher(object):
     """A class that will do matching and store configuration for the matching process"""
 
     sort_reverse = False
+    ngram_size = 3
+    """The length of the character n-grams used by the candidate prefilter"""
 
-    def __init__(self, store, max_candidates=10, min_similarity=75, max_length=70, comparer=None, usefuzzy=False):
+    def __init__(self, store, max_candidates=10, min_similarity=75, max_length=70, comparer=None, usefuzzy=False, ngramindex=True):
         """max_candidates is the maximum number of candidates that should be assembled,
         min_similarity is the minimum similarity that must be attained to be included in
-        the result, comparer is an optional Comparer with similarity() function"""
+        the result, comparer is an optional Comparer with similarity() function.
+        ngramindex enables the n-gram prefilter index, which is only used with
+        a Levenshtein comparer."""
         if comparer is None:
             comparer = lshtein.LevenshteinComparer(max_length)
         self.comparer = comparer
         self.setparameters(max_candidates, min_similarity, max_length)
         self.usefuzzy = usefuzzy
+        self.ngramindex = ngramindex and isinstance(comparer, lshtein.LevenshteinComparer)
         self.inittm(store)
         self.addpercentage = True
 
@@ -72,15 +194,17 @@ class matcher(object):
         speedup."""
         # reverse is deprectated - just use self.sort_reverse
         self.existingunits = {}
-        self.candidates = base.TranslationStore()
+        self.candidates = candidatestore(self.sort_reverse)
+        # length of source -> n-gram -> [(candidate id, occurrences), ...]
+        self.ngrams = {}
 
         if isinstance(stores, base.TranslationStore):
             stores = [stores]
         for store in stores:
             self.extendtm(store.units, store=store, sort=False)
-        self.candidates.units.sort(key=sourcelen, reverse=self.sort_reverse)
+        self.candidates.sort()
         # print "TM initialised with %d candidates (%d to %d characters long)" % \
-        #        (len(self.candidates.units), len(self.candidates.units[0].source), len(self.candidates.units[-1].source))
+        #        (len(self.candidates), len(self.candidates.sources[0]), len(self.candidates.sources[-1]))
 
     def extendtm(self, units, store=None, sort=True):
         """Extends the memory with extra unit(s).
@@ -90,33 +214,68 @@ class matcher(object):
         and associated with each unit.
         @param sort:  Optional parameter that can be set to False to supress
         sorting of the candidates list. This should probably only be used in
-        inittm().
+        inittm(). The new candidates are inserted in their sorted positions.
         """
         if isinstance(units, base.TranslationUnit):
             units = [units]
         candidates = filter(self.usable, units)
         for candidate in candidates:
-            simpleunit = base.TranslationUnit("")
+            orig = None
             # We need to ensure that we don't pass multistrings futher, since
             # some modules (like the native Levenshtein) can't use it.
             if isinstance(candidate.source, multistring):
                 if len(candidate.source.strings) > 1:
-                    simpleunit.orig_source = candidate.source
-                    simpleunit.orig_target = candidate.target
-                simpleunit.source = unicode(candidate.source)
-                simpleunit.target = unicode(candidate.target)
+                    orig = (candidate.source, candidate.target)
+                source = unicode(candidate.source)
+                target = unicode(candidate.target)
             else:
-                simpleunit.source = candidate.source
-                simpleunit.target = candidate.target
+                source = candidate.source
+                target = candidate.target
             # If we now only get translator comments, we don't get programmer
             # comments in TM suggestions (in Pootle, for example). If we get all
             # notes, pot2po adds all previous comments as translator comments
             # in the new po file
-            simpleunit.addnote(candidate.getnotes(origin="translator"))
-            simpleunit.fuzzy = candidate.isfuzzy()
-            self.candidates.units.append(simpleunit)
+            notes = candidate.getnotes(origin="translator")
+            candidateid = self.candidates.add(source, target, notes, candidate.isfuzzy(), orig, sort=sort)
+            if self.ngramindex:
+                self.indexcandidate(candidateid, source)
         if sort:
-            self.candidates.units.sort(key=sourcelen, reverse=self.sort_reverse)
+            self.candidates.sort()
+
+    def getngrams(self, text):
+        """Returns a dictionary of the character n-grams in the part of text
+        considered by the comparer, with the number of times each occurs."""
+        text = text[:self.comparer.MAX_LEN]
+        size = self.ngram_size
+        ngrams = {}
+        for i in xrange(len(text) - size + 1):
+            ngram = text[i:i+size]
+            ngrams[ngram] = ngrams.get(ngram, 0) + 1
+        return ngrams
+
+    def indexcandidate(self, candidateid, source):
+        """Adds the n-grams of the given candidate to the prefilter index."""
+        bucket = self.ngrams.setdefault(len(source), {})
+        for ngram, count in self.getngrams(source).iteritems():
+            bucket.setdefault(ngram, []).append((candidateid, count))
+
+    def sharedngrams(self, text, startlength, stoplength):
+        """Counts the n-grams that every indexed candidate with a source length
+        between startlength and stoplength has in common with text.
+
+        @return: a dictionary mapping candidate ids to the number of shared
+        n-grams. Candidates without any shared n-grams are not included.
+        """
+        ngrams = self.getngrams(text)
+        shared = {}
+        for length in xrange(int(math.ceil(startlength)), int(stoplength) + 1):
+            bucket = self.ngrams.get(length)
+            if not bucket:
+                continue
+            for ngram, count in ngrams.iteritems():
+                for candidateid, candidatecount in bucket.get(ngram, ()):
+                    shared[candidateid] = shared.get(candidateid, 0) + min(count, candidatecount)
+        return shared
 
     def setparameters(self, max_candidates=10, min_similarity=75, max_length=70):
         """Sets the parameters without reinitialising the tm. If a parameter
@@ -157,28 +316,42 @@ class matcher(object):
 
         # minimum source string length to be considered
         startlength = self.getstartlength(min_similarity, text)
-        startindex = 0
-        endindex = len(self.candidates.units)
-        while startindex < endindex:
-            mid = (startindex + endindex) // 2
-            if sourcelen(self.candidates.units[mid]) < startlength:
-                startindex = mid + 1
-            else:
-                endindex = mid
+        candidates = self.candidates
+        startindex = candidates.startindex(startlength)
 
         # maximum source string length to be considered
         stoplength = self.getstoplength(min_similarity, text)
         lowestscore = 0
 
-        for candidate in self.candidates.units[startindex:]:
-            cmpstring = candidate.source
-            if len(cmpstring) > stoplength:
+        # A single edit changes at most ngram_size of the n-grams of a string,
+        # so a candidate within Levenshtein distance maxdistance of the text
+        # must still share (length - ngram_size + 1 - maxdistance * ngram_size)
+        # n-grams with it. Candidates sharing fewer can never reach
+        # min_similarity and are skipped without calling the comparer.
+        if self.ngramindex:
+            shared = self.sharedngrams(text, startlength, stoplength)
+            size = self.ngram_size
+            maxlen = self.comparer.MAX_LEN
+            textlen = min(len(text), maxlen)
+
+        sources = candidates.sources
+        keys = candidates.keys
+        ids = candidates.ids
+        for index in xrange(startindex, len(sources)):
+            cmplength = keys[index]
+            if cmplength > stoplength:
                 break
+            cmpstring = sources[index]
+            if self.ngramindex:
+                length = max(textlen, min(cmplength, maxlen))
+                maxdistance = int((100 - min_similarity) * length / 100.0 + 1e-9)
+                if shared.get(ids[index], 0) < length - size + 1 - maxdistance * size:
+                    continue
             similarity = self.comparer.similarity(text, cmpstring, min_similarity)
             if similarity < min_similarity:
                 continue
             if similarity > lowestscore:
-                heapq.heapreplace(bestcandidates, (similarity, candidate))
+                heapq.heapreplace(bestcandidates, (similarity, index))
                 lowestscore = bestcandidates[0][0]
                 if lowestscore >= 100:
                     break
@@ -193,7 +366,7 @@ class matcher(object):
         bestcandidates = filter(notzero, bestcandidates)
         #Sort for use as a general list, and reverse so the best one is at index 0
         bestcandidates.sort(reverse=True)
-        return self.buildunits(bestcandidates)
+        return self.buildunits([(score, candidates.getunit(index)) for score, index in bestcandidates])
 
     def buildunits(self, candidates):
         """Builds a list of units conforming to base API, with the score in the comment"""
@@ -242,25 +415,45 @@ class terminologymatcher(matcher):
         self.addpercentage = False
         self.match_info = {}
 
+    def extendtm(self, units, store=None, sort=True):
+        """Extends the memory with extra unit(s), see L{matcher.extendtm}"""
+        matcher.extendtm(self, units, store, sort)
+        self.automaton = None
+
+    def buildautomaton(self):
+        """Builds the automaton that finds the candidate terms in a text, if
+        the comparer allows it"""
+        self.automaton = None
+        if isinstance(self.comparer, terminology.TerminologyComparer):
+            # term -> indexes of the candidates with it as source
+            self.termcandidates = {}
+            for index, source in enumerate(self.candidates.sources):
+                self.termcandidates.setdefault(source, []).append(index)
+            self.automaton = terminology.TermAutomaton(self.termcandidates)
+
     def inittm(self, store):
         """Normal initialisation, but convert all source strings to lower case"""
         matcher.inittm(self, store)
+        candidates = self.candidates
         extras = []
-        for unit in self.candidates.units:
-            source = unit.source = context_re.sub("", unit.source).lower()
+        for index, source in enumerate(candidates.sources):
+            source = context_re.sub("", source).lower()
+            candidates.setsource(index, source)
             for ignorepattern in ignorepatterns:
                 (newterm, occurrences) = re.subn(ignorepattern[0], ignorepattern[1], source)
                 if occurrences:
-                    new_unit = type(unit).buildfromunit(unit)
-                    new_unit.source = newterm
-                    # We mark it fuzzy to indicate that it isn't pristine
-                    unit.markfuzzy()
+                    new_unit = base.TranslationUnit(newterm)
+                    new_unit.target = candidates.targets[index]
+                    notes = candidates.notes[candidates.noteindexes[index]]
+                    if notes:
+                        new_unit.addnote(notes)
                     extras.append(new_unit)
-        self.candidates.units.sort(key=sourcelen, reverse=self.sort_reverse)
+        candidates.sort()
         if extras:
             # We don't sort, so that the altered forms are at the back and
             # considered last.
             self.extendtm(extras, sort=False)
+        self.buildautomaton()
 
     def getstartlength(self, min_similarity, text):
         # Let's number false matches by not working with terms of two
@@ -287,14 +480,30 @@ class terminologymatcher(matcher):
         comparer.match_info = {}
         matches = []
         known = set()
-        for cand in self.candidates.units:
-            if (cand.source, cand.target) in known:
+        if self.automaton is None:
+            self.buildautomaton()
+        if self.automaton is not None:
+            # Find all the terms at once instead of searching for each
+            found = self.automaton.find(text[:comparer.MAX_LEN])
+            indexes = []
+            for term, pos in found.iteritems():
+                comparer.match_info[term] = {'pos': pos}
+                indexes.extend(self.termcandidates[term])
+            indexes.sort()
+            similarity = lambda text, source, stoppercentage: True
+        else:
+            indexes = xrange(len(self.candidates))
+            similarity = comparer.similarity
+        sources = self.candidates.sources
+        targets = self.candidates.targets
+        for index in indexes:
+            source = sources[index]
+            if (source, targets[index]) in known:
                 continue
-            source = cand.source
-            if comparer.similarity(text, source, self.MIN_SIMILARITY):
+            if similarity(text, source, self.MIN_SIMILARITY):
                 self.match_info[source] = {'pos': comparer.match_info[source]['pos']}
-                matches.append(cand)
-                known.add((cand.source, cand.target))
+                matches.append(self.candidates.getunit(index))
+                known.add((source, targets[index]))
         return matches
 
 
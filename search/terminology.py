@@ -44,3 +44,71 @@ class TerminologyComparer:
             self.match_info[term] = { 'pos': pos }
             return 100
         return 0
+
+
+class TermAutomaton(object):
+    """An Aho-Corasick automaton that finds all the occurrences of a set of
+    terms in a text with a single pass over the text"""
+
+    def __init__(self, terms):
+        # Every state is a position in the trie of the terms. For each state we
+        # keep the transitions, the state to continue from when no transition
+        # matches, the term ending in it and the next state with a term along
+        # the chain of failure states.
+        self.transitions = [{}]
+        self.failures = [0]
+        self.terms = [None]
+        self.outputs = [0]
+        for term in terms:
+            state = 0
+            for char in term:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][char] = next_state
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.terms.append(None)
+                    self.outputs.append(0)
+                state = next_state
+            self.terms[state] = term
+
+        queue = self.transitions[0].values()
+        for state in queue:
+            for char, next_state in self.transitions[state].iteritems():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure and char not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                failure = self.transitions[failure].get(char, 0)
+                self.failures[next_state] = failure
+                if self.terms[failure] is not None:
+                    self.outputs[next_state] = failure
+                else:
+                    self.outputs[next_state] = self.outputs[failure]
+
+    def find(self, text):
+        """Returns a dictionary of the terms that occur in text, with the
+        position of the first occurrence of each (as given by C{text.find})"""
+        found = {}
+        if self.terms[0] is not None:
+            # the empty string occurs at the start of any text
+            found[self.terms[0]] = 0
+        transitions = self.transitions
+        failures = self.failures
+        terms = self.terms
+        outputs = self.outputs
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+            match = state
+            if terms[match] is None:
+                match = outputs[match]
+            while match:
+                term = terms[match]
+                if term not in found:
+                    found[term] = end + 1 - len(term)
+                match = outputs[match]
+        return found
@@ -12,6 +12,32 @@ class TestLevenshtein:
         assert lshtein.distance("words", "word") == 1
         assert lshtein.distance("word", "woord") == 1
 
+    def test_bounded_distance(self):
+        """Tests that distance calculation with a stop value is correct"""
+        for distance in (lshtein.python_distance, lshtein.distance):
+            assert distance("word", "wood", 1) == 1
+            assert distance("word", "wood", 0) > 0
+            assert distance("kitten", "sitting", 3) == 3
+            assert distance("kitten", "sitting", 2) > 2
+            assert distance("word", "word 2", 1) > 1
+            assert distance("abc", "xyz", 5) == 3
+            assert distance("", "word", 4) == 4
+
+    def test_bounded_distance_random(self):
+        """Tests the banded calculation against the full calculation"""
+        import random
+        random.seed(42)
+        for i in range(300):
+            a = "".join([random.choice("abc") for j in range(random.randint(0, 12))])
+            b = "".join([random.choice("abc") for j in range(random.randint(0, 12))])
+            full = lshtein.python_distance(a, b)
+            for stopvalue in range(0, 8):
+                bounded = lshtein.python_distance(a, b, stopvalue)
+                if full <= stopvalue:
+                    assert bounded == full
+                else:
+                    assert bounded > stopvalue
+
     def test_basic_similarity(self):
         """Tests similarity correctness with a few basic values"""
         levenshtein = lshtein.LevenshteinComparer()
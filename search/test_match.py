@@ -126,3 +126,58 @@ class TestMatch:
         assert candidates == ["preorder"]
         candidates = self.candidatestrings(matcher.matches("You can pre order"))
         assert candidates == ["pre order"]
+
+    def test_ngramindex(self):
+        """Test that the n-gram prefilter doesn't change the results"""
+        import random
+        random.seed(1234)
+        words = ["file", "open", "close", "the", "save", "document", "as", "print", "new", "window"]
+        sources = []
+        for i in range(300):
+            sources.append(" ".join([random.choice(words) for j in range(random.randint(1, 6))]))
+        csvfile = self.buildcsv(sources)
+        indexed = match.matcher(csvfile, min_similarity=60)
+        plain = match.matcher(csvfile, min_similarity=60, ngramindex=False)
+        assert indexed.ngrams and not plain.ngrams
+        def results(matcher, text):
+            # candidates with equal scores are not in a defined order
+            return sorted([(unit.getnotes(), unicode(unit.source)) for unit in matcher.matches(text)])
+        for source in sources[:50] + ["open the file", "save document as", "x"]:
+            assert results(indexed, source) == results(plain, source)
+
+    def test_terminology_automaton(self):
+        """Test that the automaton finds the same terms as searching for each"""
+        import random
+        random.seed(4321)
+        words = ["file", "files", "open", "pre-order", "down time", "category", "fil", "ile", "opened"]
+        sources = list(set([" ".join(random.sample(words, random.randint(1, 2))) for i in range(60)]))
+        csvfile = self.buildcsv(sources)
+        automaton = match.terminologymatcher(csvfile)
+        assert automaton.automaton
+        plain = match.terminologymatcher(csvfile)
+        plain.automaton = None
+        plain.buildautomaton = lambda: None
+        for i in range(30):
+            text = " ".join([random.choice(words + ["preorder", "categories"]) for j in range(6)])
+            matches = automaton.matches(text)
+            assert matches == plain.matches(text)
+            for unit in matches:
+                assert automaton.match_info[unit.source] == plain.match_info[unit.source]
+
+    def test_candidatestore(self):
+        """Test that extending the TM keeps the candidates sorted"""
+        csvfile1 = self.buildcsv(["Close application", "Do something", "Open"])
+        csvfile2 = self.buildcsv(["Open file", "Open a file", "Quit"])
+        extended = match.matcher(csvfile1)
+        extended.extendtm(csvfile2.units, store=csvfile2)
+        combined = match.matcher([csvfile1, csvfile2])
+        for matcher in (extended, combined):
+            assert matcher.candidates.issorted
+            assert list(matcher.candidates.keys) == sorted(matcher.candidates.keys)
+        candidates = extended.candidates
+        assert [len(source) for source in candidates.sources] == list(candidates.keys)
+        assert sorted(candidates.sources) == sorted(combined.candidates.sources)
+        for message in ["Open file...", "Do nothing", "Quit"]:
+            assert self.candidatestrings(extended.matches(message)) == self.candidatestrings(combined.matches(message))
+        unit = candidates.getunit(candidates.sources.index("Quit"))
+        assert unit.source == "Quit" and unit.target == "Quit"
@@ -8,3 +8,11 @@ class TestTerminology:
         termmatcher = terminology.TerminologyComparer()
         assert termmatcher.similarity("Open the file", "file") > 75
 
+
+    def test_automaton(self):
+        """Tests that the automaton finds the first position of every term"""
+        terms = ["he", "she", "his", "hers", "s", "hershey"]
+        automaton = terminology.TermAutomaton(terms)
+        for text in ["ushers", "hishershey", "", "xyz", "shehishe"]:
+            expected = dict([(term, text.find(term)) for term in terms if text.find(term) >= 0])
+            assert automaton.find(text) == expected
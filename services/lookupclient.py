@@ -20,47 +20,75 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 #
 
-"""Small example program for querying an XML-RPC lookup service"""
+"""Small example program for querying an XML-RPC lookup service
+
+If a tmserver URL and languages are given on the command line, all the lines
+read from stdin are looked up in the translation memory with a single
+request, e.g. lookupclient.py http://localhost:8080/tmserver en af"""
 
 from translate.storage import tbx
 from xml.dom import minidom
 import xmlrpclib
+import urllib2
 import sys
+try:
+    import json #available since Python 2.6
+except ImportError:
+    import simplejson as json #API compatible with the json module
+
+def tmserver_lookup_units(tmserver_url, sources, source_lang, target_lang):
+    """Returns the translation memory suggestions for each of sources as a
+    list of lists, using a single request to the tmserver at tmserver_url"""
+    url = "%s/%s/%s/units" % (tmserver_url.rstrip("/"), source_lang, target_lang)
+    request = urllib2.Request(url, json.dumps(sources), {"Content-type": "application/json"})
+    return json.loads(urllib2.urlopen(request).read())
+
+def main():
+    if len(sys.argv) > 3:
+        sources = [line.strip().decode("utf-8") for line in sys.stdin]
+        sources = [source for source in sources if source]
+        for source, candidates in zip(sources, tmserver_lookup_units(sys.argv[1], sources, sys.argv[2], sys.argv[3])):
+            print source.encode("utf-8")
+            for candidate in candidates:
+                print "%s %s | %s" % (candidate["quality"], candidate["source"].encode("utf-8"), candidate["target"].encode("utf-8"))
+        return
 
-server_url = 'http://localhost:1234/'
-server = xmlrpclib.Server(server_url)
-UnitClass = tbx.tbxunit
+    server_url = 'http://localhost:1234/'
+    server = xmlrpclib.Server(server_url)
+    UnitClass = tbx.tbxunit
 
-text = sys.stdin.readline()
-while text:
-    text = text.strip().decode("utf-8")
-    if text != "":
-        source = server.lookup(text)
-        if source:
-            print source
-            #Lets assume life is simple:
-            if "<termEntry>" in source:
-                #TBX
-                base = minidom.parseString(source)
-                unit = UnitClass.createfromxmlElement(base.documentElement, None)
-                #Do something interesting with unit
-            elif "<tu><tuv>" in source:
-                #TMX
-                base = minidom.parseString
-                unit = tmx.createfromxmlElement(base.documentElement, None)
-            target = server.translate(text)
-            print "%s -> %s".decode('utf-8') % (text, target)
-        else:
-            print " (Not found)"
-        candidates = server.matches(text)
-        #alternate example, slightly faster:
-        #candidates = server.matches(text, 5, 70)
-        if len(candidates):
-            print "Likely matches:"
-            columnwidth = min(int(len(text)*1.3)+5, 35)
-            for score, original, translation in candidates:
-                print "%s %-*s | %s".encode('utf-8') % (score, columnwidth, original, translation)
-        else:
-            print "No likely matches found"
     text = sys.stdin.readline()
+    while text:
+        text = text.strip().decode("utf-8")
+        if text != "":
+            source = server.lookup(text)
+            if source:
+                print source
+                #Lets assume life is simple:
+                if "<termEntry>" in source:
+                    #TBX
+                    base = minidom.parseString(source)
+                    unit = UnitClass.createfromxmlElement(base.documentElement, None)
+                    #Do something interesting with unit
+                elif "<tu><tuv>" in source:
+                    #TMX
+                    base = minidom.parseString
+                    unit = tmx.createfromxmlElement(base.documentElement, None)
+                target = server.translate(text)
+                print "%s -> %s".decode('utf-8') % (text, target)
+            else:
+                print " (Not found)"
+            candidates = server.matches(text)
+            #alternate example, slightly faster:
+            #candidates = server.matches(text, 5, 70)
+            if len(candidates):
+                print "Likely matches:"
+                columnwidth = min(int(len(text)*1.3)+5, 35)
+                for score, original, translation in candidates:
+                    print "%s %-*s | %s".encode('utf-8') % (score, columnwidth, original, translation)
+            else:
+                print "No likely matches found"
+        text = sys.stdin.readline()
 
+if __name__ == '__main__':
+    main()
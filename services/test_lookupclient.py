@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+from wsgiref import simple_server
+
+from translate.services import lookupclient, tmserver
+
+
+class QuietHandler(simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class TestLookupClient:
+    def setup_method(self, method):
+        self.testdir = tempfile.mkdtemp()
+        self.application = tmserver.TMServer(os.path.join(self.testdir, "tm.db"), None, prefix="/tmserver")
+        self.server = simple_server.make_server("localhost", 0, self.application.rest, handler_class=QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = "http://localhost:%d/tmserver" % self.server.server_port
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.testdir)
+
+    def test_lookup_units(self):
+        """checks that a batch of sources gets the same suggestions from the
+        server as from the database"""
+        self.application.tmdb.add_list([{"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""},
+                                        {"source": u"Close the file", "target": u"Maak die lêer toe", "context": ""}],
+                                       "en", "af")
+        sources = [u"Open the files", u"Close the files", u"Something else", u"Open the files"]
+        results = lookupclient.tmserver_lookup_units(self.url, sources, "en", "af")
+        assert results == self.application.tmdb.translate_units(sources, "en", "af")
+        assert [len(candidates) for candidates in results] == [1, 1, 0, 1]
+        assert results[1][0]["target"] == u"Maak die lêer toe"
@@ -43,16 +43,20 @@ class TMServer(object):
     """A RESTful JSON TM server."""
 
     def __init__(self, tmdbfile, tmfiles, max_candidates=3, min_similarity=75,
-            max_length=1000, prefix="", source_lang=None, target_lang=None):
+            max_length=1000, prefix="", source_lang=None, target_lang=None, cache_size=1000,
+            stream=False):
 
-        self.tmdb = tmdb.TMDB(tmdbfile, max_candidates, min_similarity, max_length)
+        self.tmdb = tmdb.TMDB(tmdbfile, max_candidates, min_similarity, max_length, cache_size)
 
         #load files into db
-        if isinstance(tmfiles, list):
-            [self.tmdb.add_store(factory.getobject(tmfile), source_lang, target_lang) \
-                    for tmfile in tmfiles]
-        elif tmfiles:
-            self.tmdb.add_store(factory.getobject(tmfiles), source_lang, target_lang)
+        if tmfiles and not isinstance(tmfiles, list):
+            tmfiles = [tmfiles]
+        for tmfile in tmfiles or []:
+            if stream:
+                # parse the file one unit at a time, see TranslationStore.iterparse
+                self.tmdb.add_units(factory.iterunits(tmfile), source_lang, target_lang)
+            else:
+                self.tmdb.add_store(factory.getobject(tmfile), source_lang, target_lang)
 
         #initialize url dispatcher
         self.rest = selector.Selector(prefix=prefix)
@@ -63,6 +67,9 @@ class TMServer(object):
                       DELETE=self.forget_unit
                       )
 
+        self.rest.add("/{slang}/{tlang}/units",
+                      POST=self.translate_units)
+
         self.rest.add("/{slang}/{tlang}/store/{sid:any}",
                       GET=self.get_store_stats,
                       PUT=self.upload_store,
@@ -83,6 +90,22 @@ class TMServer(object):
             pass
         return [response]
 
+    @selector.opliant
+    def translate_units(self, environ, start_response, slang, tlang):
+        """Returns the candidates for each of the sources in the POSTed list,
+        as a list in the same order."""
+        start_response("200 OK", [('Content-type', 'text/plain')])
+        sources = json.loads(environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'])))
+        candidates = self.tmdb.translate_units(sources, slang, tlang)
+        response = json.dumps(candidates, indent=4)
+        params = parse_qs(environ.get('QUERY_STRING', ''))
+        try:
+            callback = params.get('callback', [])[0]
+            response = "%s(%s)" % (callback, response)
+        except IndexError:
+            pass
+        return [response]
+
     @selector.opliant
     def add_unit(self, environ, start_response, uid, slang, tlang):
         start_response("200 OK", [('Content-type', 'text/plain')])
@@ -154,6 +177,8 @@ def main():
                       help="translation memory database file")
     parser.add_option("-f", "--import-translation-file", dest="tmfiles", action="append",
                       help="translation file to import into the database")
+    parser.add_option("--stream", dest="stream", action="store_true", default=False,
+                      help="import translation files one unit at a time, in bounded memory")
     parser.add_option("-t", "--import-target-lang", dest="target_lang",
                       help="target language of translation files")
     parser.add_option("-s", "--import-source-lang", dest="source_lang",
@@ -168,6 +193,8 @@ def main():
                       help="minimum similarity")
     parser.add_option("--max-length", dest="max_length", type="int", default=1000,
                       help="Maxmimum string length")
+    parser.add_option("--cache-size", dest="cache_size", type="int", default=1000,
+                      help="number of queries to remember the suggestions for (default: 1000)")
     parser.add_option("--debug", action="store_true", dest="debug", default=False,
                       help="enable debugging features")
 
@@ -191,7 +218,8 @@ def main():
 
     application = TMServer(options.tmdbfile, options.tmfiles, max_candidates=options.max_candidates,
                            min_similarity=options.min_similarity, max_length=options.max_length,
-                           prefix="/tmserver", source_lang=options.source_lang, target_lang=options.target_lang)
+                           prefix="/tmserver", source_lang=options.source_lang, target_lang=options.target_lang,
+                           cache_size=options.cache_size, stream=options.stream)
     wsgi.launch_server(options.bind, options.port, application.rest)
 
 
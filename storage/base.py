@@ -689,6 +689,14 @@ class TranslationStore(object):
         """parser to process the given source string"""
         self.units = pickle.loads(data).units
 
+    def iterparse(self, input):
+        """Parses the given file or source string, yielding the units one at a
+        time. Formats that can't be parsed incrementally parse the whole input
+        first."""
+        self.parse(input)
+        for unit in self.units:
+            yield unit
+
     def savefile(self, storefile):
         """Writes the string representation to the given file (or filename)."""
         if isinstance(storefile, basestring):
@@ -19,11 +19,14 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 from translate.storage import factory
+from translate.storage import pypo
 import os
+import resource
 import cProfile
 import pstats
 import random
 import sys
+import time
 
 class TranslateBenchmarker:
     """class to aid in benchmarking Translate Toolkit stores"""
@@ -80,11 +83,61 @@ class TranslateBenchmarker:
                 count += len(parsedfile.units)
         print "counted %d units" % count
 
+    def parse_memory(self):
+        """parses all the files in the test directory into memory in a
+        separate process, and reports the memory that this needed"""
+        pid = os.fork()
+        if pid:
+            os.waitpid(pid, 0)
+            return
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        parsedfiles = []
+        for dirpath, subdirs, filenames in os.walk(self.file_dir, topdown=False):
+            for name in filenames:
+                pofilename = os.path.join(dirpath, name)
+                parsedfiles.append(self.StoreClass(open(pofilename, 'r')))
+        count = sum([len(parsedfile.units) for parsedfile in parsedfiles])
+        used = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        print "%d units used %d kB (%d bytes per unit)" % (count, used, used * 1024 / max(count, 1))
+        os._exit(0)
+
+    def merge_memory(self, stream):
+        """merges a translation of every tenth unit into each file in the test
+        directory with pomerge in a separate process, and reports the time
+        and memory that this needed"""
+        from translate.tools import pomerge
+        pid = os.fork()
+        if pid:
+            os.waitpid(pid, 0)
+            return
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        seconds = 0
+        for dirpath, subdirs, filenames in os.walk(self.file_dir, topdown=False):
+            for name in filenames:
+                templatename = os.path.join(dirpath, name)
+                inputstore = self.StoreClass()
+                for number, unit in enumerate(self.StoreClass().iterparse(open(templatename))):
+                    if number % 10 or unit.isheader():
+                        continue
+                    inputunit = inputstore.addsourceunit(unit.source)
+                    inputunit.target = "merged " + unit.target
+                inputstore.makeindex()
+                inputfile = os.path.join(self.test_dir, "input.%s" % self.extension)
+                inputstore.savefile(inputfile)
+                start = time.time()
+                pomerge.mergestore(open(inputfile), open(os.devnull, "w"), open(templatename), stream=stream)
+                seconds += time.time() - start
+        used = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        print "merging with stream=%s took %.2f seconds and used %d kB" % (stream, seconds, used)
+        os._exit(0)
+
 if __name__ == "__main__":
     storetype = "po"
     if len(sys.argv) > 1:
         storetype = sys.argv[1]
-    if storetype in factory.classes:
+    if storetype == "compactpo":
+        storeclass = pypo.compactpofile
+    elif storetype in factory.classes:
         storeclass = factory.classes[storetype]
     else:
         print "StoreClass: '%s' is not a base class that the class factory can load" % storetype
@@ -114,5 +167,9 @@ if __name__ == "__main__":
             stats = pstats.Stats(statsfile)
             stats.sort_stats('cumulative').print_stats(20)
             print "_______________________________________________________"
+        print "parse_memory", "%d dirs, %d files, %d strings, %d/%d words" % sample_file_sizes
+        benchmarker.parse_memory()
+        for stream in (False, True):
+            benchmarker.merge_memory(stream)
         #benchmarker.clear_test_dir()
 
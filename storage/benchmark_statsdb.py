@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks recaching the statistics and checks of a file in the stats
+database after a single unit in it was edited.
+
+Usage: benchmark_statsdb.py [units]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from translate.filters import checks
+from translate.storage import po
+from translate.storage import statsdb
+
+
+def random_store(num_units):
+    """returns a PO store with num_units random units"""
+    random.seed(0)
+    words = ["word%d" % i for i in range(5000)]
+    store = po.pofile()
+    for i in range(num_units):
+        source = u" ".join([random.choice(words) for j in range(random.randint(1, 10))])
+        unit = store.addsourceunit(source)
+        if random.random() < 0.8:
+            unit.target = u" ".join([random.choice(words) for j in range(random.randint(1, 10))])
+    return store
+
+def recache_edit(store, incremental):
+    """caches the stats of the store, edits one unit and returns the time it
+    takes to get the stats and checks again"""
+    test_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(test_dir, "test.po")
+        store.savefile(filename)
+        cache = statsdb.StatsCache(os.path.join(test_dir, "stats.db"))
+        cache.incremental = incremental
+        checker = checks.StandardChecker()
+        cache.filestats(filename, checker)
+        unit = store.units[len(store.units) / 2]
+        unit.target = u"edited " + unit.target
+        store.savefile(filename)
+        start = time.time()
+        cache.filetotals(filename)
+        cache.filestats(filename, checker)
+        return time.time() - start
+    finally:
+        unit.target = unit.target[len(u"edited "):]
+        shutil.rmtree(test_dir)
+
+if __name__ == "__main__":
+    num_units = 5000
+    if len(sys.argv) > 1:
+        num_units = int(sys.argv[1])
+    store = random_store(num_units)
+    for incremental in (False, True):
+        seconds = recache_edit(store, incremental)
+        print "incremental=%s: recached %d units after one edit in %.3f seconds" % (incremental, num_units, seconds)
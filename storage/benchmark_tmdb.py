@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks importing units into a translation memory database, one by
+one and in bulk.
+
+Usage: benchmark_tmdb.py [units]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from translate.storage import tmdb
+
+
+def random_units(num_units, duplicates=0.1):
+    """returns num_units random units, with some duplicates"""
+    random.seed(0)
+    words = ["word%d" % i for i in range(5000)]
+    units = []
+    for i in range(num_units):
+        if units and random.random() < duplicates:
+            units.append(random.choice(units))
+            continue
+        source = u" ".join([random.choice(words) for j in range(random.randint(1, 10))])
+        target = u" ".join([random.choice(words) for j in range(random.randint(1, 10))])
+        units.append({"source": source, "target": target, "context": u""})
+    return units
+
+def import_units(units, bulk):
+    """imports units into a new database, returning the time it took"""
+    test_dir = tempfile.mkdtemp()
+    try:
+        db = tmdb.TMDB(os.path.join(test_dir, "tm.db"))
+        start = time.time()
+        db.add_list(units, "en", "af", bulk=bulk)
+        return time.time() - start
+    finally:
+        shutil.rmtree(test_dir)
+
+if __name__ == "__main__":
+    num_units = 20000
+    if len(sys.argv) > 1:
+        num_units = int(sys.argv[1])
+    units = random_units(num_units)
+    for bulk in (False, True):
+        seconds = import_units(units, bulk)
+        print "bulk=%s: %d units in %.2f seconds (%.0f units/second)" % (bulk, num_units, seconds, num_units / seconds)
@@ -195,6 +195,27 @@ def getobject(storefile, ignore=None, classes=classes, hiddenclasses=hiddenclass
         store.filename = storefilename
     return store
 
+def iterunits(storefilename, ignore=None, classes=classes, hiddenclasses=hiddenclasses):
+    """Factory that yields the units of the file at storefilename, parsing it
+    one unit at a time where the format allows it (see
+    L{base.TranslationStore.iterparse}).
+
+    Compressed files are decompressed while they are read. Specify ignore to
+    ignore some part at the back of the name (like .gz).
+    """
+    storeclass = getclass(storefilename, ignore, classes=classes, hiddenclasses=hiddenclasses)
+    name, ext = os.path.splitext(storefilename)
+    ext = ext[len(os.path.extsep):].lower()
+    if ext in decompressclass:
+        storefile = decompressclass[ext](storefilename)
+    else:
+        storefile = open(storefilename, "rb")
+    try:
+        for unit in storeclass().iterparse(storefile):
+            yield unit
+    finally:
+        storefile.close()
+
 def supported_files():
     """Returns data about all supported files
 
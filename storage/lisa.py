@@ -21,6 +21,7 @@
 """Parent class for LISA standards (TMX, TBX, XLIFF)"""
 
 import re
+from cStringIO import StringIO
 
 from translate.storage import base
 from translate.lang import data
@@ -350,3 +351,43 @@ class LISAfile(base.TranslationStore):
             term = self.UnitClass.createfromxmlElement(entry)
             self.addunit(term, new=False)
 
+    def iterparse(self, input):
+        """Parses the given file or xml string, yielding the units one at a
+        time.
+
+        The document is read incrementally, and every unit is removed from it
+        when the next one is read, so that arbitrarily large files can be
+        processed in bounded memory. The units are not kept in the store, but
+        the rest of the document (like the header) is."""
+        if hasattr(input, 'name'):
+            self.filename = input.name
+        elif not hasattr(self, 'filename'):
+            self.filename = ''
+        if hasattr(input, "read"):
+            input.seek(0)
+        else:
+            input = StringIO(input)
+        if etree.LXML_VERSION >= (2, 1, 0):
+            events = etree.iterparse(input, events=("start", "end"), strip_cdata=False)
+        else:
+            events = etree.iterparse(input, events=("start", "end"))
+        self.units = []
+        unittag = None
+        for event, element in events:
+            if unittag is None:
+                # the start of the root element
+                self.document = element.getroottree()
+                self._encoding = self.document.docinfo.encoding
+                self.namespace = element.nsmap.get(None, None)
+                assert element.tag == self.namespaced(self.rootNode)
+                unittag = self.namespaced(self.UnitClass.rootNode)
+            elif event == "end" and element.tag == unittag:
+                unit = self.UnitClass.createfromxmlElement(element)
+                unit.namespace = self.namespace
+                unit._store = self
+                parent = element.getparent()
+                yield unit
+                # unless the unit was moved to another document
+                if element.getparent() is parent:
+                    parent.remove(element)
+        self.initbody()
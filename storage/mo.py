@@ -39,10 +39,14 @@ faster access of the MO file.  The hash is optional for Gettext
 and is not needed for reading or writing MO files, in this implementation
 it is always on and does produce sometimes different results to Gettext
 in very small files.
+
+L{molookup} uses the hash table to look up single translations in a memory
+mapped MO file, without parsing all of it.
 """
 
 import struct
 import array
+import mmap
 import re
 
 from translate.storage import base
@@ -74,7 +78,9 @@ def hashpjw(str_param):
     HASHWORDBITS = 32
     hval = 0
     g = None
-    s = str_param
+    # Like Gettext, only hash up to the first NUL, so that the msgid_plural
+    # of plural messages is not part of the hash.
+    str_param = str_param.split("\0", 1)[0]
     for s in str_param:
         hval = hval << 4
         hval += ord(s)
@@ -85,6 +91,27 @@ def hashpjw(str_param):
     return hval
 
 
+def unpackheader(input):
+    """Returns the byte order and the values in the header of the MO data:
+    the version, number of strings, offsets of the key and value tables, and
+    the size and offset of the hash table."""
+    little, = struct.unpack("<L", input[:4])
+    big, = struct.unpack(">L", input[:4])
+    if little == MO_MAGIC_NUMBER:
+        endian = "<"
+    elif big == MO_MAGIC_NUMBER:
+        endian = ">"
+    else:
+        raise ValueError("This is not an MO file")
+    magic, version, lenkeys, startkey, \
+    startvalue, sizehash, offsethash = struct.unpack("%sLiiiiii" % endian,
+                                                     input[:(7 * 4)])
+    if version > 1:
+        raise ValueError("Unable to process MO files with versions > 1.  \
+                         This is a %d version MO file" % version)
+    return endian, version, lenkeys, startkey, startvalue, sizehash, offsethash
+
+
 def get_next_prime_number(start):
     # find the smallest prime number that is greater or equal "start"
 
@@ -94,10 +121,14 @@ def get_next_prime_number(start):
             return False
         if (num == 2) or (num == 3):
             return True
-        # check for numbers > 4
-        for divider in range(2, num / 2):
+        if num % 2 == 0:
+            return False
+        # check for odd dividers up to the square root of numbers > 4
+        divider = 3
+        while divider * divider <= num:
             if num % divider == 0:
                 return False
+            divider += 2
         return True
 
     candidate = start
@@ -193,8 +224,19 @@ class mofile(poheader.poheader, base.TranslationStore):
         keys = MESSAGES.keys()
         # the keys are sorted in the .mo file
         keys.sort()
-        offsets = []
-        ids = strs = ''
+        # The header is 7 32-bit unsigned integers
+        keystart = 7 * 4 + 16 * len(keys) + hash_size * 4
+        # and the values start after the keys
+        valuestart = keystart
+        for id in keys:
+            valuestart += len(id) + 1
+        # The string table first has the list of keys, then the list of values.
+        # Each entry has first the size of the string, then the file offset.
+        koffsets = []
+        voffsets = []
+        strs = []
+        keyoffset = keystart
+        valueoffset = valuestart
         for i, id in enumerate(keys):
             # For each string, we need size and file offset.  Each string is
             # NUL terminated; the NUL does not count into the size.
@@ -203,21 +245,11 @@ class mofile(poheader.poheader, base.TranslationStore):
             string = MESSAGES[id] # id already encoded for use as dictionary key
             if isinstance(string, unicode):
                 string = string.encode('utf-8')
-            offsets.append((len(ids), len(id), len(strs), len(string)))
-            ids = ids + id + '\0'
-            strs = strs + string + '\0'
-        output = ''
-        # The header is 7 32-bit unsigned integers
-        keystart = 7 * 4 + 16 * len(keys) + hash_size * 4
-        # and the values start after the keys
-        valuestart = keystart + len(ids)
-        koffsets = []
-        voffsets = []
-        # The string table first has the list of keys, then the list of values.
-        # Each entry has first the size of the string, then the file offset.
-        for o1, l1, o2, l2 in offsets:
-            koffsets = koffsets + [l1, o1 + keystart]
-            voffsets = voffsets + [l2, o2 + valuestart]
+            koffsets.extend((len(id), keyoffset))
+            voffsets.extend((len(string), valueoffset))
+            keyoffset += len(id) + 1
+            valueoffset += len(string) + 1
+            strs.append(string)
         offsets = koffsets + voffsets
         output = struct.pack("Iiiiiii",
                              MO_MAGIC_NUMBER,   # Magic
@@ -229,10 +261,11 @@ class mofile(poheader.poheader, base.TranslationStore):
                              7 * 4 + 2 * (len(keys) * 8)) # offset of hash table
         # additional data is not necessary for empty mo files
         if (len(keys) > 0):
-            output = output + array.array("i", offsets).tostring()
-            output = output + hash_table.tostring()
-            output = output + ids
-            output = output + strs
+            output = "".join([output,
+                              array.array("i", offsets).tostring(),
+                              hash_table.tostring(),
+                              "\0".join(keys), "\0",
+                              "\0".join(strs), "\0"])
         return output
 
     def parse(self, input):
@@ -245,27 +278,16 @@ class mofile(poheader.poheader, base.TranslationStore):
             mosrc = input.read()
             input.close()
             input = mosrc
-        little, = struct.unpack("<L", input[:4])
-        big, = struct.unpack(">L", input[:4])
-        if little == MO_MAGIC_NUMBER:
-            endian = "<"
-        elif big == MO_MAGIC_NUMBER:
-            endian = ">"
-        else:
-            raise ValueError("This is not an MO file")
-        magic, version, lenkeys, startkey, \
-        startvalue, sizehash, offsethash = struct.unpack("%sLiiiiii" % endian,
-                                                         input[:(7 * 4)])
-        if version > 1:
-            raise ValueError("Unable to process MO files with versions > 1.  \
-                             This is a %d version MO file" % version)
+        endian, version, lenkeys, startkey, \
+        startvalue, sizehash, offsethash = unpackheader(input)
+        # the lengths and offsets of all the keys and values
+        keytable = struct.unpack("%s%di" % (endian, lenkeys * 2),
+                                 input[startkey:startkey + lenkeys * 2 * 4])
+        valuetable = struct.unpack("%s%di" % (endian, lenkeys * 2),
+                                   input[startvalue:startvalue + lenkeys * 2 * 4])
         for i in range(lenkeys):
-            nextkey = startkey + (i * 2 * 4)
-            nextvalue = startvalue + (i * 2 * 4)
-            klength, koffset = struct.unpack("%sii" % endian,
-                                             input[nextkey:nextkey + (2 * 4)])
-            vlength, voffset = struct.unpack("%sii" % endian,
-                                             input[nextvalue:nextvalue + (2 * 4)])
+            klength, koffset = keytable[i * 2:i * 2 + 2]
+            vlength, voffset = valuetable[i * 2:i * 2 + 2]
             source = input[koffset:koffset + klength]
             context = None
             if "\x04" in source:
@@ -284,3 +306,82 @@ class mofile(poheader.poheader, base.TranslationStore):
             if context is not None:
                 newunit.msgctxt.append(context)
             self.addunit(newunit)
+
+
+class molookup(object):
+    """Looks up translations in a .mo file as Gettext does, through the hash
+    table of the file (or a binary search in files without one). The file is
+    memory mapped and only the strings that are looked up are read, so this
+    is much faster than parsing a large file with L{mofile} for a few
+    lookups."""
+
+    def __init__(self, filename):
+        mofile = open(filename, "rb")
+        try:
+            self._data = mmap.mmap(mofile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            mofile.close()
+        self._endian, version, self._lenkeys, self._startkey, \
+        self._startvalue, self._sizehash, self._offsethash = unpackheader(self._data)
+        self._encoding = "UTF-8"
+        header = self._lookup("")
+        if header is not None:
+            charset = re.search("charset=([^\\s]+)", self._getstring(self._startvalue, header))
+            if charset:
+                self._encoding = po.encodingToUse(charset.group(1))
+
+    def __len__(self):
+        return self._lenkeys
+
+    def _getstring(self, table, index):
+        length, offset = struct.unpack_from("%sII" % self._endian, self._data, table + index * 8)
+        return self._data[offset:offset + length]
+
+    def _lookup(self, key):
+        """Returns the index of the string key, without its msgid_plural."""
+        if self._sizehash > 2:
+            hval = hashpjw(key)
+            index = hval % self._sizehash
+            increment = 1 + (hval % (self._sizehash - 2))
+            for i in xrange(self._sizehash):
+                entry, = struct.unpack_from("%sI" % self._endian, self._data, self._offsethash + index * 4)
+                if entry == 0:
+                    return None
+                if self._getstring(self._startkey, entry - 1).split("\0", 1)[0] == key:
+                    return entry - 1
+                index = (index + increment) % self._sizehash
+            return None
+        # the keys are sorted
+        low, high = 0, self._lenkeys
+        while low < high:
+            middle = (low + high) / 2
+            middlekey = self._getstring(self._startkey, middle).split("\0", 1)[0]
+            if middlekey == key:
+                return middle
+            if middlekey < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def gettarget(self, source, context=None):
+        """Returns the translation of source, as a multistring for plural
+        messages, or None if it is not in the file."""
+        if isinstance(source, multistring):
+            source = source.strings[0]
+        if isinstance(source, unicode):
+            source = source.encode(self._encoding)
+        if context:
+            if isinstance(context, unicode):
+                context = context.encode(self._encoding)
+            source = context + "\x04" + source
+        index = self._lookup(source)
+        if index is None:
+            return None
+        targets = self._getstring(self._startvalue, index).split("\0")
+        if len(targets) > 1:
+            return multistring([target.decode(self._encoding) for target in targets])
+        return targets[0].decode(self._encoding)
+
+    def close(self):
+        self._data.close()
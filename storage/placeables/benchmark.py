@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of translate.
+#
+# translate is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# translate is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks parsing the strings of translation files into placeables, with
+the general parsers applied one after the other and with the tokenizer.
+
+Usage: benchmark.py file.po [file.po ...]
+"""
+
+import sys
+import time
+
+from translate.storage import factory
+from translate.storage.placeables import general, parse, StringElem
+
+
+def read_strings(filenames):
+    """returns the source and target strings of the units in the files"""
+    strings = []
+    for filename in filenames:
+        for unit in factory.getobject(filename).units:
+            if unit.isheader():
+                continue
+            strings.extend([unicode(string) for string in unit.source.strings])
+            if unit.target:
+                strings.extend([unicode(string) for string in unit.target.strings])
+    return strings
+
+def parse_one_by_one(strings):
+    """parses the strings with the parsers applied one after the other"""
+    return [parse(StringElem(string), general.parsers) for string in strings]
+
+def parse_tokenized(strings):
+    """parses the strings with the tokenizer"""
+    tokenizer = general.get_tokenizer(general.parsers)
+    return [tokenizer.parse(string) for string in strings]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print __doc__
+        sys.exit(1)
+    strings = read_strings(sys.argv[1:])
+    results = []
+    for parser in (parse_one_by_one, parse_tokenized):
+        start = time.time()
+        results.append(parser(strings))
+        seconds = time.time() - start
+        print "%s: %d strings in %.2f seconds (%.0f strings/second)" % (parser.__name__, len(strings), seconds, len(strings) / seconds)
+    if results[0] != results[1]:
+        print "the parsed trees differ"
@@ -25,7 +25,7 @@ fit into any other sub-category.
 
 import re
 
-__all__ = ['AltAttrPlaceable', 'XMLEntityPlaceable', 'XMLTagPlaceable', 'parsers', 'to_general_placeables']
+__all__ = ['AltAttrPlaceable', 'PlaceableTokenizer', 'XMLEntityPlaceable', 'XMLTagPlaceable', 'parsers', 'to_general_placeables']
 
 from translate.storage.placeables.base import G, Ph, StringElem
 
@@ -47,6 +47,8 @@ def regex_parse(cls, pstr):
     if oldend != len(pstr) and matches:
         matches.append(StringElem(pstr[oldend:]))
     return matches or None
+# The result depends only on the string, so parse() may cache it.
+regex_parse.cacheable = True
 
 
 class AltAttrPlaceable(G):
@@ -350,3 +352,83 @@ parsers = [
     PunctuationPlaceable.parse,
     NumberPlaceable.parse,
 ]
+
+
+class PlaceableTokenizer(object):
+    """Parses strings with a list of L{regex_parse} placeable parsers.
+
+    The tree returned by L{parse} is the same as the one that
+    L{translate.storage.placeables.parse} builds with the same parsers, but it
+    is built in one pass over the matches in the string, without building and
+    pruning intermediate trees for every parser."""
+
+    def __init__(self, classes):
+        """@param classes: The placeable classes (using L{regex_parse}) in the
+            order in which they should be parsed."""
+        self.classes = list(classes)
+        self.regexes = [cls.regex for cls in self.classes]
+
+    def _first_match(self, pstr, start):
+        """Returns the index of the first class from C{start} with a regular
+            expression that matches in C{pstr}, or C{None}."""
+        for index in range(start, len(self.regexes)):
+            regex = self.regexes[index]
+            if regex is not None and regex.search(pstr):
+                return index
+        return None
+
+    def _tokenize(self, pstr, start):
+        """Returns the parsed sub-elements of C{pstr} using the classes from
+            C{start}, or C{None} if none of them match."""
+        index = self._first_match(pstr, start)
+        if index is None:
+            return None
+        cls = self.classes[index]
+        elems = []
+        oldend = 0
+        for match in self.regexes[index].finditer(pstr):
+            begin, end = match.start(), match.end()
+            if oldend != begin:
+                elems.append(self._text(pstr[oldend:begin], index + 1))
+            placeable = cls([pstr[begin:end]])
+            if placeable.istranslatable and begin != end:
+                sub = self._tokenize(pstr[begin:end], index + 1)
+                if sub is not None:
+                    placeable.sub = sub
+            elems.append(placeable)
+            oldend = end
+        if oldend != len(pstr):
+            elems.append(self._text(pstr[oldend:], index + 1))
+        return elems
+
+    def _text(self, pstr, start):
+        """Returns the element for the text between placeables."""
+        sub = self._tokenize(pstr, start)
+        if sub is None:
+            return StringElem(pstr)
+        if len(sub) == 1:
+            return sub[0]
+        elem = StringElem()
+        elem.sub = sub
+        return elem
+
+    def parse(self, pstr):
+        """Parses the given string into a L{StringElem} tree."""
+        tree = StringElem(pstr)
+        if pstr:
+            sub = self._tokenize(pstr, 0)
+            if sub is not None:
+                tree.sub = sub
+        return tree
+
+def get_tokenizer(parse_funcs):
+    """Returns a L{PlaceableTokenizer} for the given parsing functions, or
+        C{None} if they are not all placeable parsers using L{regex_parse}."""
+    classes = []
+    for parse_func in parse_funcs:
+        if getattr(parse_func, 'im_func', None) is not regex_parse:
+            return None
+        classes.append(parse_func.im_self)
+    if len(set(classes)) != len(classes):
+        return None
+    return PlaceableTokenizer(classes)
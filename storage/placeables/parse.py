@@ -23,7 +23,13 @@ Contains the C{parse} function that parses normal strings into StringElem-
 based "rich" string element trees.
 """
 
-from translate.storage.placeables import base, StringElem
+from translate.misc.lru import LockingLRUCachingDict
+from translate.storage.placeables import base, general, StringElem
+
+parse_cache = LockingLRUCachingDict(5000)
+"""The trees of recently parsed strings, keyed by the string and the parsing
+functions used. Only strings parsed with functions that have a true
+C{cacheable} attribute are cached."""
 
 def parse(tree, parse_funcs):
     """Parse placeables from the given string or sub-tree by using the
@@ -43,14 +49,25 @@ def parse(tree, parse_funcs):
         @type  parse_funcs: A list of parsing functions. It must take exactly
             one argument (a C{unicode} string to parse) and return a list of
             C{StringElem}s which, together, form the original string. If nothing
-            could be parsed, it should return C{None}."""
+            could be parsed, it should return C{None}.
+
+        Strings parsed only with functions that depend on nothing but the
+        string (marked with a true C{cacheable} attribute, like the parsers in
+        L{general}) are cached in L{parse_cache}, and a copy of the cached tree
+        is returned. Strings parsed only with the regular expression based
+        parsers in L{general} are parsed with a
+        L{general.PlaceableTokenizer}."""
     if isinstance(tree, unicode):
-        tree = StringElem(tree)
+        if parse_funcs and [func for func in parse_funcs if getattr(func, "cacheable", False)] == list(parse_funcs):
+            key = (unicode(tree), tuple(parse_funcs))
+            cached = parse_cache.get(key)
+            if cached is None:
+                cached = parse_cache[key] = _parse_string(key[0], parse_funcs)
+            return cached.copy()
+        return _parse_string(tree, parse_funcs)
     if not parse_funcs:
         return tree
 
-    parse_func = parse_funcs[0]
-
     for leaf in tree.flatten():
         #FIXME: we might rather want to test for editability, but for now this
         # works better
@@ -61,25 +78,45 @@ def parse(tree, parse_funcs):
         if not unileaf:
             continue
 
-        subleaves = parse_func(unileaf)
-        if subleaves is not None:
-            if len(subleaves) == 1 and type(leaf) is type(subleaves[0]) and leaf == subleaves[0]:
-                pass
-            elif isinstance(leaf, unicode):
-                parent = tree.get_parent_elem(leaf)
-                if parent is not None:
-                    if len(parent.sub) == 1:
-                        parent.sub = subleaves
-                        leaf = parent
-                    else:
-                        leafindex = parent.sub.index(leaf)
-                        parent.sub[leafindex] = StringElem(subleaves)
-                        leaf = parent.sub[leafindex]
-            else:
-                leaf.sub = subleaves
+        # A parsing function that finds nothing leaves the leaf unchanged for
+        # the next one, so go straight to the first one that finds something
+        # instead of recursing once for every function.
+        for index, parse_func in enumerate(parse_funcs):
+            subleaves = parse_func(unileaf)
+            if subleaves is not None:
+                break
+        else:
+            leaf.prune()
+            continue
+
+        parsedleaf = leaf
+        if len(subleaves) == 1 and type(leaf) is type(subleaves[0]) and leaf == subleaves[0]:
+            pass
+        elif isinstance(leaf, unicode):
+            parent = tree.get_parent_elem(leaf)
+            if parent is not None:
+                if len(parent.sub) == 1:
+                    parent.sub = subleaves
+                    leaf = parent
+                else:
+                    leafindex = parent.sub.index(leaf)
+                    parent.sub[leafindex] = StringElem(subleaves)
+                    leaf = parent.sub[leafindex]
+        else:
+            leaf.sub = subleaves
 
-        parse(leaf, parse_funcs[1:])
+        parse(leaf, parse_funcs[index+1:])
 
         if isinstance(leaf, StringElem):
             leaf.prune()
+        # prune as often as the skipped levels of recursion would have
+        for i in range(index):
+            parsedleaf.prune()
     return tree
+
+def _parse_string(string, parse_funcs):
+    """Parses the given string, with a tokenizer if possible."""
+    tokenizer = general.get_tokenizer(parse_funcs)
+    if tokenizer is not None:
+        return tokenizer.parse(string)
+    return parse(StringElem(string), parse_funcs)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from translate.storage.placeables import general
+from translate.storage.placeables import general, parse, StringElem
 
 def test_placeable_numbers():
     """Check the correct functioning of number placeables"""
@@ -97,5 +97,29 @@ def test_placeable_formatting():
     #numbered variables
     assert fp.parse(u'There were %1$d cows')[1] == fp([u'%1$d'])
 
+def test_parse_cache():
+    """Check that cached parses give equal, independent trees"""
+    string = u'Open <b>%s</b> at http://example.com/ &amp; press OK'
+    first = parse(string, general.parsers)
+    second = parse(string, general.parsers)
+    assert first == second
+    assert first is not second
+    assert isinstance(second.sub[1], general.XMLTagPlaceable)
+    # changing a returned tree may not change the cached one
+    second.sub[1].sub[0] = u'<i>'
+    assert parse(string, general.parsers) == first
+    # a different set of parsers is parsed separately
+    assert parse(string, [general.XMLTagPlaceable.parse]) != first
+
+def test_tokenizer():
+    """Check that the tokenizer builds the same trees as parsing with one
+    parser after the other"""
+    tokenizer = general.get_tokenizer(general.parsers)
+    for string in [u'', u'Plain text', u'%s', u'Open the FILE KBabel now',
+                   u'a\nb <b>x</b> 25 y', u'abc alt="x &amp; y" z',
+                   u'Ģët <a href="http://www.example.com" alt="Ģët &brand;!">&brandLong;</a>']:
+        assert tokenizer.parse(string) == parse(StringElem(string), general.parsers)
+    assert general.get_tokenizer([general.XMLTagPlaceable.parse, len]) is None
+
 
 # TODO: PythonFormattingPlaceable, JavaMessageFormatPlaceable, UrlPlaceable, XMLTagPlaceable
@@ -316,9 +316,15 @@ def parse_header(parse_state, store):
     decode_header(first_unit, parse_state.decode)
     return first_unit
 
-def parse_units(parse_state, store):
+def iter_units(parse_state, store):
+    """Yields the units one at a time, starting with the first unit (usually
+    the header) which determines the encoding of the rest."""
     unit = parse_header(parse_state, store)
     while unit:
-        store.addunit(unit)
+        yield unit
         unit = parse_unit(parse_state)
+
+def parse_units(parse_state, store):
+    for unit in iter_units(parse_state, store):
+        store.addunit(unit)
     return parse_state.eof
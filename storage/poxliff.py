@@ -391,3 +391,7 @@ class PoXliffFile(xliff.xlifffile, poheader.poheader):
             else:
                 self.addunit(term, new=False)
 
+    def iterparse(self, input):
+        """Plural units are built from several elements, so the whole file is
+        parsed first (see L{base.TranslationStore.iterparse})."""
+        return base.TranslationStore.iterparse(self, input)
@@ -389,11 +389,11 @@ class pounit(pocommon.pounit):
 
             #Split if directed to do so:
             if split:
-                splitlist1 = []
+                splitlist1 = set()
                 splitlist2 = []
                 prefix = "#"
                 for item in list1:
-                    splitlist1.extend(item.split()[1:])
+                    splitlist1.update(item.split()[1:])
                     prefix = item.split()[0]
                 for item in list2:
                     splitlist2.extend(item.split()[1:])
@@ -402,12 +402,14 @@ class pounit(pocommon.pounit):
             else:
                 #Normal merge, but conform to list1 newline style
                 if list1 != list2:
+                    items1 = set(list1)
                     for item in list2:
                         if lineend:
                             item = item.rstrip() + lineend
                         # avoid duplicate comment lines (this might cause some problems)
-                        if item not in list1 or len(item) < 5:
+                        if item not in items1 or len(item) < 5:
                             list1.append(item)
+                            items1.add(item)
         if not isinstance(otherpo, pounit):
             super(pounit, self).merge(otherpo, overwrite, comments)
             return
@@ -715,6 +717,197 @@ class pounit(pocommon.pounit):
         return id
 
 
+def _simplequote(text):
+    """Returns the quoted lines for text that L{quoteforpo} would put on a
+    single line without any escapes (most strings), otherwise None."""
+    if 0 < len(text) <= 71 and not [char for char in '"\\\n\r\t' if char in text]:
+        return [u'"%s"' % text]
+    return None
+
+def _lazylist(slot):
+    """A property for a list attribute of L{compactpounit} that is only
+    created once it is used. Unused lists are dropped again by
+    L{compactpounit._compact}."""
+    def getlist(self):
+        value = getattr(self, slot)
+        if value is None:
+            value = []
+            setattr(self, slot, value)
+        return value
+    def setlist(self, value):
+        setattr(self, slot, value)
+    return property(getlist, setlist)
+
+def _lazyquoted(slot, textslot):
+    """A property for msgid or msgstr of L{compactpounit}. These might only be
+    kept as the unescaped text, in which case the quoted lines are recreated
+    once they are used."""
+    def getlines(self):
+        value = getattr(self, slot)
+        if value is None:
+            text = getattr(self, textslot) or u""
+            value = _simplequote(text) or quoteforpo(text)
+            setattr(self, slot, value)
+            setattr(self, textslot, None)
+        return value
+    def setlines(self, value):
+        setattr(self, slot, value)
+        setattr(self, textslot, None)
+    return property(getlines, setlines)
+
+class compactpounit(pounit):
+    """A pounit that needs a lot less memory, for large stores.
+
+    There is no instance dictionary, lists that are usually empty (plurals,
+    previous and obsolete messages) are only created when they are used, and
+    msgid and msgstr are kept as unescaped text wherever L{quoteforpo} will
+    recreate the same lines (which is the case for almost all of them).
+
+    The attributes behave exactly like those of L{pounit}: accessing them
+    recreates the lists where necessary, and L{_compact} drops them again."""
+
+    _lazy_lists = ["_prev_msgctxt", "_prev_msgid", "_prev_msgid_plural",
+                   "_msgid_pluralcomments", "_msgid_plural",
+                   "_obsoletemsgctxt", "_obsoletemsgid",
+                   "_obsoletemsgidcomments", "_obsoletemsgid_pluralcomments",
+                   "_obsoletemsgid_plural", "_obsoletemsgstr"]
+    __slots__ = _lazy_lists + ["_msgid", "_msgid_text", "_msgstr", "_msgstr_text",
+                 "_encoding", "obsolete", "notes", "_store", "_target",
+                 "_rich_source", "_rich_target", "_state_n",
+                 "othercomments", "automaticcomments", "sourcecomments",
+                 "typecomments", "msgidcomments", "msgctxt"]
+
+    prev_msgctxt = _lazylist("_prev_msgctxt")
+    prev_msgid = _lazylist("_prev_msgid")
+    prev_msgid_plural = _lazylist("_prev_msgid_plural")
+    msgid_pluralcomments = _lazylist("_msgid_pluralcomments")
+    msgid_plural = _lazylist("_msgid_plural")
+    obsoletemsgctxt = _lazylist("_obsoletemsgctxt")
+    obsoletemsgid = _lazylist("_obsoletemsgid")
+    obsoletemsgidcomments = _lazylist("_obsoletemsgidcomments")
+    obsoletemsgid_pluralcomments = _lazylist("_obsoletemsgid_pluralcomments")
+    obsoletemsgid_plural = _lazylist("_obsoletemsgid_plural")
+    obsoletemsgstr = _lazylist("_obsoletemsgstr")
+    msgid = _lazyquoted("_msgid", "_msgid_text")
+    msgstr = _lazyquoted("_msgstr", "_msgstr_text")
+
+    def __init__(self, source=None, encoding="UTF-8"):
+        for slot in self._lazy_lists:
+            setattr(self, slot, None)
+        self._msgid = self._msgid_text = None
+        self._msgstr = self._msgstr_text = None
+        pounit.__init__(self, source, encoding)
+        self._compact()
+
+    def _compact(self):
+        """Drops empty lists, and keeps msgid and msgstr as unescaped text
+        where the quoted lines can be recreated from it."""
+        for slot in self._lazy_lists:
+            if getattr(self, slot) == []:
+                setattr(self, slot, None)
+        for slot, textslot in (("_msgid", "_msgid_text"), ("_msgstr", "_msgstr_text")):
+            lines = getattr(self, slot)
+            # Lines that are not decoded yet (in the header while parsing)
+            # are kept as they are
+            if not isinstance(lines, list) or [line for line in lines if isinstance(line, str)]:
+                continue
+            if len(lines) == 1 and _simplequote(lines[0][1:-1]) == lines:
+                text = lines[0][1:-1]
+            else:
+                text = unquotefrompo(lines)
+                if quoteforpo(text) != lines:
+                    continue
+            setattr(self, slot, None)
+            setattr(self, textslot, text)
+
+    def _unquoted(self, slot, textslot):
+        """Returns the unescaped text of msgid or msgstr without recreating
+        the quoted lines."""
+        lines = getattr(self, slot)
+        if lines is None:
+            return getattr(self, textslot) or u""
+        return unquotefrompo(lines)
+
+    def _isnull(self, slot, textslot):
+        """Checks whether msgid or msgstr is empty, like L{is_null}"""
+        lines = getattr(self, slot)
+        if lines is None:
+            return not getattr(self, textslot)
+        return is_null(lines)
+
+    def getsource(self):
+        """Returns the unescaped msgid"""
+        if self.hasplural():
+            return pounit.getsource(self)
+        return multistring(self._unquoted("_msgid", "_msgid_text"), self._encoding)
+    source = property(getsource, pounit.setsource)
+
+    def gettarget(self):
+        """Returns the unescaped msgstr"""
+        if isinstance(self._msgstr, dict):
+            return pounit.gettarget(self)
+        return multistring(self._unquoted("_msgstr", "_msgstr_text"), self._encoding)
+    target = property(gettarget, pounit.settarget)
+
+    def hasplural(self):
+        """returns whether this pounit contains plural strings..."""
+        return bool(self._msgid_plural)
+
+    def isheader(self):
+        return (self._isnull("_msgid", "_msgid_text")
+                and not self._isnull("_msgstr", "_msgstr_text")
+                and self.msgidcomments == []
+                and is_null(self.msgctxt))
+
+    def markfuzzy(self, present=True):
+        if present:
+            self.set_state_n(self.STATE[self.S_FUZZY][0])
+        elif self._isnull("_msgstr", "_msgstr_text"):
+            self.set_state_n(self.STATE[self.S_UNTRANSLATED][0])
+        else:
+            self.set_state_n(self.STATE[self.S_TRANSLATED][0])
+
+    def infer_state(self):
+        pounit.infer_state(self)
+        # The parser is done with this unit
+        self._compact()
+
+    def _getoutput(self):
+        """return this po element as a string"""
+        texts = self._msgid_text, self._msgstr_text
+        output = pounit._getoutput(self)
+        # Drop the lines that were recreated for the output again
+        if texts[0] is not None:
+            self._msgid, self._msgid_text = None, texts[0]
+        if texts[1] is not None:
+            self._msgstr, self._msgstr_text = None, texts[1]
+        for slot in self._lazy_lists:
+            if getattr(self, slot) == []:
+                setattr(self, slot, None)
+        return output
+
+    def __getstate__(self):
+        state = dict(getattr(self, "__dict__", {}))
+        for slot in self.__slots__:
+            state[slot] = getattr(self, slot, None)
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.iteritems():
+            setattr(self, key, value)
+
+    def __deepcopy__(self, memo={}):
+        new_unit = self.__class__()
+        shallow = set(self.__shallow__)
+        for key, value in self.__getstate__().iteritems():
+            if key in shallow:
+                setattr(new_unit, key, value)
+            else:
+                setattr(new_unit, key, copy.deepcopy(value))
+        memo[id(self)] = self
+        return new_unit
+
+
 class pofile(pocommon.pofile):
     """A .po file containing various units"""
     UnitClass = pounit
@@ -730,10 +923,38 @@ class pofile(pocommon.pofile):
                 input = cStringIO.StringIO(input)
             # clear units to get rid of automatically generated headers before parsing
             self.units = []
-            poparser.parse_units(poparser.ParseState(input, pounit), self)
+            poparser.parse_units(poparser.ParseState(input, self.UnitClass), self)
         except Exception, e:
             raise base.ParseError(e)
 
+    def iterparse(self, input):
+        """Parses the given file or file source string, yielding the units one
+        at a time.
+
+        The units are not kept in the store, so that arbitrarily large files
+        can be processed in constant memory. Only the header is kept (in
+        C{self.units}), so that it is available while iterating."""
+        if hasattr(input, 'name'):
+            self.filename = input.name
+        elif not getattr(self, 'filename', ''):
+            self.filename = ''
+        if isinstance(input, str):
+            input = cStringIO.StringIO(input)
+        self.units = []
+        units = poparser.iter_units(poparser.ParseState(input, self.UnitClass), self)
+        while True:
+            try:
+                unit = units.next()
+            except StopIteration:
+                return
+            except Exception, e:
+                raise base.ParseError(e)
+            if not self.units and unit.isheader():
+                self.addunit(unit)
+            else:
+                unit._store = self
+            yield unit
+
     def removeduplicates(self, duplicatestyle="merge"):
         """Make sure each msgid is unique ; merge comments etc from duplicates into original"""
         # TODO: can we handle consecutive calls to removeduplicates()? What
@@ -782,6 +1003,26 @@ class pofile(pocommon.pofile):
             return output.encode(getattr(self, "_encoding", "UTF-8"))
         return output
 
+    def iterstr(self, units):
+        """Converts this store followed by the given extra units to strings,
+        one unit at a time. The result is the same as L{__str__} for a store
+        containing all of these units, but the extra units are never kept in
+        memory (they can be a generator)."""
+        encoding = getattr(self, "_encoding", "UTF-8")
+        def encode(output):
+            if isinstance(output, unicode):
+                return output.encode(encoding)
+            return output
+        pending = u"".join([unit._getoutput() + u"\n" for unit in self.units])
+        for unit in units:
+            if pending:
+                yield encode(pending)
+            pending = unit._getoutput() + u"\n"
+        #After the last pounit we will have \n\n and we only want to end in \n:
+        pending = pending.rstrip()
+        if pending:
+            yield encode(pending + u"\n")
+
     def _getoutput(self):
         """convert the units back to lines"""
         lines = []
@@ -822,3 +1063,8 @@ class pofile(pocommon.pofile):
         for unit in self.units:
             if not (unit.isheader() or unit.isobsolete()):
                 yield unit
+
+class compactpofile(pofile):
+    """A .po file that keeps its units in a compact form (see
+    L{compactpounit}), for large files such as compendia"""
+    UnitClass = compactpounit
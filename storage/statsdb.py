@@ -42,6 +42,11 @@ import re
 import sys
 import stat
 import thread
+import threading
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
 
 kdepluralre = re.compile("^_n: ")
 brtagre = re.compile("<br\s*?/?>")
@@ -50,6 +55,10 @@ numberre = re.compile("\\D\\.\\D")
 
 state_strings = {0: "untranslated", 1: "translated", 2: "fuzzy"}
 
+SCHEMA_VERSION = 2
+"""The version of the database layout, kept in the user_version of the
+database to know which migrations it still needs"""
+
 def wordcount(string):
     # TODO: po class should understand KDE style plurals
     string = kdepluralre.sub("", string)
@@ -93,17 +102,17 @@ class Record(UserDict):
         return tuple(self[key] for key in self.record_keys)
 
     def __add__(self, other):
-        result = Record(self.record_keys)
-        for key in self.keys():
+        result = Record(self.record_keys, compute_derived_values=self._compute_derived_values)
+        for key in self.record_keys:
             result[key] = self[key] + other[key]
-        self._compute_derived_values(self)
+        result._compute_derived_values(result)
         return result
 
     def __sub__(self, other):
-        result = Record(self.record_keys)
-        for key in self.keys():
+        result = Record(self.record_keys, compute_derived_values=self._compute_derived_values)
+        for key in self.record_keys:
             result[key] = self[key] - other[key]
-        self._compute_derived_values(self)
+        result._compute_derived_values(result)
         return result
 
     def as_string_for_db(self):
@@ -113,22 +122,30 @@ def transaction(f):
     """Modifies f to commit database changes if it executes without exceptions.
     Otherwise it rolls back the database.
 
+    Changes are made in a transaction started by StatsCache._startwrite(),
+    which is committed when the outermost decorated method returns.
+
     ALL publicly accessible methods in StatsCache MUST be decorated with this
     decorator.
     """
 
     def decorated_f(self, *args, **kwargs):
+        self._depth += 1
         try:
-            result = f(self, *args, **kwargs)
-            self.con.commit()
-            return result
-        except:
-            # If ANY exception is raised, we're left in an
-            # uncertain state and we MUST roll back any changes to avoid getting
-            # stuck in an inconsistent state.
-            if self.con:
-                self.con.rollback()
-            raise
+            try:
+                result = f(self, *args, **kwargs)
+            except:
+                # If ANY exception is raised, we're left in an
+                # uncertain state and we MUST roll back any changes to avoid getting
+                # stuck in an inconsistent state.
+                if self.con and self._writing:
+                    self._endwrite("ROLLBACK;")
+                raise
+        finally:
+            self._depth -= 1
+        if self._depth == 0 and self._writing:
+            self._endwrite("COMMIT;")
+        return result
     return decorated_f
 
 UNTRANSLATED, TRANSLATED, FUZZY = 0, 1, 2
@@ -140,6 +157,28 @@ def statefordb(unit):
         return FUZZY
     return UNTRANSLATED
 
+def unithash(unit):
+    """Returns a hash of everything about the unit that its statistics and
+    checks depend on, to find the units that changed in a file."""
+    def strings(text):
+        if isinstance(text, multistring):
+            return text.strings
+        return [text]
+    content = (unit.getid(), strings(unit.source), strings(unit.target),
+               statefordb(unit), unit.isfuzzy(), unit.isreview(),
+               unit.getlocations())
+    return sha1(repr(content)).hexdigest()
+
+def parentdirs(path):
+    """Returns the directories that contain path, from its own directory up to
+    the root."""
+    dirnames = []
+    dirname = os.path.dirname(path)
+    while dirname not in dirnames:
+        dirnames.append(dirname)
+        dirname = os.path.dirname(dirname)
+    return dirnames
+
 class FileTotals(object):
     keys = ['translatedsourcewords',
             'fuzzysourcewords',
@@ -165,6 +204,20 @@ class FileTotals(object):
                 untranslated            INTEGER NOT NULL,
                 translatedtargetwords   INTEGER NOT NULL);""")
 
+        # The totals of all the files in each directory and its
+        # subdirectories, kept up to date with the totals of the files
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS dirtotals(
+                path                    VARCHAR PRIMARY KEY,
+                files                   INTEGER NOT NULL DEFAULT 0,
+                translatedsourcewords   INTEGER NOT NULL DEFAULT 0,
+                fuzzysourcewords        INTEGER NOT NULL DEFAULT 0,
+                untranslatedsourcewords INTEGER NOT NULL DEFAULT 0,
+                translated              INTEGER NOT NULL DEFAULT 0,
+                fuzzy                   INTEGER NOT NULL DEFAULT 0,
+                untranslated            INTEGER NOT NULL DEFAULT 0,
+                translatedtargetwords   INTEGER NOT NULL DEFAULT 0);""")
+
     def new_record(cls, state_for_db=None, sourcewords=None, targetwords=None):
         record = Record(cls.keys, compute_derived_values = cls._compute_derived_values)
         if state_for_db is not None:
@@ -192,25 +245,67 @@ class FileTotals(object):
         record["review"]           = 0
     _compute_derived_values = classmethod(_compute_derived_values)
 
-    def __getitem__(self, fileid):
+    def _getrow(self, fileid):
         result = self.cur.execute("""
             SELECT %(keys)s
             FROM   filetotals
             WHERE  fileid=?;""" % {'keys': self.db_keys()}, (fileid,))
-        return Record(FileTotals.keys, result.fetchone(), self._compute_derived_values)
+        return result.fetchone()
+
+    def __getitem__(self, fileid):
+        return Record(FileTotals.keys, self._getrow(fileid), self._compute_derived_values)
 
     def __setitem__(self, fileid, record):
+        oldrow = self._getrow(fileid)
+        oldrecord = Record(FileTotals.keys, oldrow, self._compute_derived_values)
+        self._adddirtotals(fileid, record - oldrecord, int(oldrow is None))
         self.cur.execute("""
             INSERT OR REPLACE into filetotals
             VALUES (%(fileid)d, %(vals)s);
         """ % {'fileid': fileid, 'vals': record.as_string_for_db()})
 
     def __delitem__(self, fileid):
+        oldrow = self._getrow(fileid)
+        if oldrow is not None:
+            oldrecord = Record(FileTotals.keys, oldrow, self._compute_derived_values)
+            self._adddirtotals(fileid, self.new_record() - oldrecord, -1)
         self.cur.execute("""
             DELETE FROM filetotals
             WHERE fileid=?;
         """,  (fileid,))
 
+    def _adddirtotals(self, fileid, record, files):
+        """Adds record, the change in the totals of a file, and files, the
+        change in the number of files, to the directories of the file."""
+        self.cur.execute("""SELECT path FROM files WHERE fileid=?;""", (fileid,))
+        filerow = self.cur.fetchone()
+        if filerow is None:
+            return
+        dirnames = [(dirname,) for dirname in parentdirs(filerow[0])]
+        self.cur.executemany("""INSERT OR IGNORE INTO dirtotals (path)
+            VALUES (?);""", dirnames)
+        self.cur.executemany("""
+            UPDATE dirtotals SET files=files + ?, %(updates)s
+            WHERE path=?;""" % {'updates': ", ".join(["%s=%s + ?" % (key, key) for key in self.keys])},
+            [(files,) + record.to_tuple() + dirname for dirname in dirnames])
+        if files < 0:
+            self.cur.execute("""DELETE FROM dirtotals WHERE files=0;""")
+
+    def rebuild_dirtotals(self):
+        """Calculates the totals of all directories from the totals of the
+        files again."""
+        self.cur.execute("""DELETE FROM dirtotals;""")
+        self.cur.execute("""SELECT fileid FROM filetotals;""")
+        for (fileid,) in self.cur.fetchall():
+            self._adddirtotals(fileid, self[fileid], 1)
+
+    def dirtotals(self, dirname):
+        result = self.cur.execute("""
+            SELECT %(keys)s
+            FROM   dirtotals
+            WHERE  path=?;""" % {'keys': self.db_keys()}, (dirname,))
+        return Record(FileTotals.keys, result.fetchone(), self._compute_derived_values)
+
 def emptyfiletotals():
     """Returns a dictionary with all statistics initalised to 0."""
     return FileTotals.new_record()
@@ -246,38 +341,37 @@ class StatsCache(object):
     """An object instantiated as a singleton for each statsfile that provides
     access to the database cache from a pool of StatsCache objects."""
     _caches = {}
+    _writelocks = {}
     defaultfile = None
+    incremental = True
+    """Whether only the units that changed are recached when a file changes"""
+    journal_mode = "WAL"
+    """The journal mode of the database. In WAL mode readers don't wait for
+    the writer, but the database can't be on a network filesystem."""
+    timeout = 60.0
+    """How many seconds to wait for other processes writing to the database"""
     con = None
     """This cache's connection"""
     cur = None
     """The current cursor"""
+    _depth = 0
+    _writing = False
 
     def __new__(cls, statsfile=None):
-        current_thread = thread.get_ident()
+        # Connections can't be shared with processes forked from this one
+        current_thread = (os.getpid(), thread.get_ident())
         def make_database(statsfile):
             def connect(cache):
-                cache.con = dbapi2.connect(statsfile)
+                # We start the transactions ourselves, see _startwrite()
+                cache.con = dbapi2.connect(statsfile, timeout=cls.timeout, isolation_level=None)
                 cache.cur = cache.con.cursor()
+                if cls.journal_mode:
+                    cache.cur.execute("""PRAGMA journal_mode=%s;""" % cls.journal_mode)
+                    cache.cur.execute("""PRAGMA synchronous=NORMAL;""")
 
-            def clear_old_data(cache):
-                try:
-                    cache.cur.execute("""SELECT toolkitbuild FROM files""")
-                    val = cache.cur.fetchone()
-                    # If the database is empty, we have no idea whether its layout
-                    # is correct, so we might as well delete it.
-                    if val is None or val[0] < toolkitversion.build:
-                        cache.con.close()
-                        del cache
-                        os.unlink(statsfile)
-                        return True
-                    return False
-                except dbapi2.OperationalError:
-                    return False
-            
             cache = cls._caches.setdefault(current_thread, {})[statsfile] = object.__new__(cls)
+            cache.statsfile = statsfile
             connect(cache)
-            if clear_old_data(cache):
-                connect(cache)
             cache.create()
             return cache
 
@@ -301,9 +395,39 @@ class StatsCache(object):
         # No existing cache. Let's build a new one and keep a copy
         return make_database(statsfile)
 
+    def _startwrite(self):
+        """Starts the transaction for the changes of the current method.
+
+        The threads of this process queue for a lock, and other processes wait
+        for the database, so that only one connection writes at a time. Data
+        read before this might have changed by the time it returns."""
+        if self._writing:
+            return
+        lock = self._writelocks.setdefault((os.getpid(), self.statsfile), threading.Lock())
+        lock.acquire()
+        try:
+            self.con.execute("""BEGIN IMMEDIATE;""")
+        except:
+            lock.release()
+            raise
+        self._writing = True
+
+    def _endwrite(self, statement):
+        """Commits or rolls back the transaction started by _startwrite()."""
+        self._writing = False
+        try:
+            self.con.execute(statement)
+        finally:
+            self._writelocks[(os.getpid(), self.statsfile)].release()
+
     @transaction
     def create(self):
-        """Create all tables and indexes."""
+        """Create all tables and indexes, and migrate the tables of databases
+        made by older versions."""
+        self._startwrite()
+        self.cur.execute("""PRAGMA user_version;""")
+        version = self.cur.fetchone()[0]
+
         self.file_totals = FileTotals(self.cur)
 
         self.cur.execute("""CREATE TABLE IF NOT EXISTS files(
@@ -325,7 +449,17 @@ class StatsCache(object):
             target VARCHAR,
             state INTEGER,
             sourcewords INTEGER,
-            targetwords INTEGER);""")
+            targetwords INTEGER,
+            hash VARCHAR);""")
+
+        if version < 1:
+            # Databases from before units were hashed for incremental updates
+            self.cur.execute("""PRAGMA table_info(units);""")
+            if "hash" not in [column[1] for column in self.cur.fetchall()]:
+                self.cur.execute("""ALTER TABLE units ADD COLUMN hash VARCHAR;""")
+        if version < 2:
+            # Databases from before the directory totals were kept
+            self.file_totals.rebuild_dirtotals()
 
         self.cur.execute("""CREATE INDEX IF NOT EXISTS fileidindex
             ON units(fileid);""")
@@ -348,6 +482,30 @@ class StatsCache(object):
         self.cur.execute("""CREATE INDEX IF NOT EXISTS uniterrorindex
             ON uniterrors(fileid, configid);""")
 
+        # Units that changed since the checks were run on their file with a
+        # checker configuration
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS uncheckedunits(
+            fileid INTEGER NOT NULL,
+            configid INTEGER NOT NULL,
+            unitindex INTEGER NOT NULL);""")
+
+        self.cur.execute("""CREATE INDEX IF NOT EXISTS uncheckedunitindex
+            ON uncheckedunits(fileid, configid);""")
+
+        if version < SCHEMA_VERSION:
+            self.cur.execute("""PRAGMA user_version=%d;""" % SCHEMA_VERSION)
+
+    def _getfilerow(self, realpath):
+        self.cur.execute("""SELECT fileid, st_mtime, st_size, toolkitbuild FROM files
+                WHERE path=?;""", (realpath,))
+        return self.cur.fetchone()
+
+    def _iscached(self, filerow, mod_info):
+        """Returns whether the cached data of the file is up to date. Files
+        cached by another build of the toolkit are cached again."""
+        return filerow is not None and (filerow[1], filerow[2]) == mod_info \
+                and filerow[3] == toolkitversion.build
+
     @transaction
     def _getfileid(self, filename, check_mod_info=True, store=None):
         """return fileid representing the given file in the statscache.
@@ -363,19 +521,18 @@ class StatsCache(object):
         if isinstance(filename, str):
             filename = unicode(filename, sys.getfilesystemencoding())
         realpath = os.path.realpath(filename)
-        self.cur.execute("""SELECT fileid, st_mtime, st_size FROM files
-                WHERE path=?;""", (realpath,))
-        filerow = self.cur.fetchone()
+        filerow = self._getfilerow(realpath)
         mod_info = get_mod_info(realpath)
         if filerow:
             fileid = filerow[0]
             if not check_mod_info:
                 # Update the mod_info of the file
+                self._startwrite()
                 self.cur.execute("""UPDATE files
                         SET st_mtime=?, st_size=?
                         WHERE fileid=?;""", (mod_info[0], mod_info[1], fileid))
                 return fileid
-            if (filerow[1], filerow[2]) == mod_info:
+            if self._iscached(filerow, mod_info):
                 return fileid
 
         # file wasn't in db at all, lets recache it
@@ -384,6 +541,8 @@ class StatsCache(object):
         else:
             store = store or factory.getobject(realpath)
 
+        if filerow and filerow[3] == toolkitversion.build and self.incremental:
+            return self._updatestore(store, realpath, mod_info)
         return self._cachestore(store, realpath, mod_info)
     
     def _getstoredcheckerconfig(self, checker):
@@ -397,35 +556,128 @@ class StatsCache(object):
         else:
             return configrow[0]
 
-    @transaction
-    def _cacheunitstats(self, units, fileid, unitindex=None, file_totals_record=FileTotals.new_record()):
-        """Cache the statistics for the supplied unit(s)."""
+    def _unitvalues(self, units, unitindex=None):
+        """Calculates the statistics of the supplied unit(s), returning the
+        values for the units table (without the fileid) and their totals."""
         unitvalues = []
+        file_totals_record = FileTotals.new_record()
         for index, unit in enumerate(units):
             if unit.istranslatable():
                 sourcewords, targetwords = wordsinunit(unit)
                 if unitindex:
                     index = unitindex
                 # what about plurals in .source and .target?
-                unitvalues.append((unit.getid(), fileid, index, \
+                unitvalues.append((unit.getid(), index, \
                                 unit.source, unit.target, \
                                 sourcewords, targetwords, \
-                                statefordb(unit)))
+                                statefordb(unit), unithash(unit)))
                 file_totals_record = file_totals_record + FileTotals.new_record(statefordb(unit), sourcewords, targetwords)
+        return unitvalues, file_totals_record
+
+    def _storeunitstats(self, fileid, unitvalues, file_totals_record):
         # XXX: executemany is non-standard
         self.cur.executemany("""INSERT INTO units
-            (unitid, fileid, unitindex, source, target, sourcewords, targetwords, state)
-            values (?, ?, ?, ?, ?, ?, ?, ?);""",
-            unitvalues)
+            (unitid, fileid, unitindex, source, target, sourcewords, targetwords, state, hash)
+            values (?, ?, ?, ?, ?, ?, ?, ?, ?);""",
+            [values[:1] + (fileid,) + values[1:] for values in unitvalues])
         self.file_totals[fileid] = file_totals_record
+
+    @transaction
+    def _cacheunitstats(self, units, fileid, unitindex=None, file_totals_record=FileTotals.new_record()):
+        """Cache the statistics for the supplied unit(s)."""
+        unitvalues, units_totals_record = self._unitvalues(units, unitindex)
+        self._startwrite()
+        self._storeunitstats(fileid, unitvalues, file_totals_record + units_totals_record)
         if unitindex:
             return state_strings[statefordb(units[0])]
         return ""
 
+    @transaction
+    def _updatestore(self, store, realpath, mod_info):
+        """Updates the cached statistics of a file that changed, only
+        recalculating them for the units that changed. The checks of those
+        units are run again the next time the errors are needed."""
+        unithashes = [(index, unit, unithash(unit)) for index, unit in enumerate(store.units)
+                      if unit.istranslatable()]
+        self._startwrite()
+        filerow = self._getfilerow(realpath)
+        if self._iscached(filerow, mod_info):
+            # another process cached it in the meantime
+            return filerow[0]
+        if filerow is None or filerow[3] != toolkitversion.build:
+            return self._cachestore(store, realpath, mod_info)
+        fileid = filerow[0]
+        self.cur.execute("""SELECT id, unitindex, hash, state, sourcewords, targetwords
+            FROM units WHERE fileid=?;""", (fileid,))
+        oldunits = {}
+        for row in self.cur.fetchall():
+            if row[2] is None:
+                # cached before units were hashed
+                return self._cachestore(store, realpath, mod_info)
+            oldunits.setdefault(row[2], []).append(row)
+
+        moved = []
+        added = []
+        for index, unit, hash in unithashes:
+            rows = oldunits.get(hash)
+            if rows:
+                row = rows.pop(0)
+                if row[1] != index:
+                    moved.append((row[0], row[1], index))
+            else:
+                added.append((index, unit))
+        removed = [row for rows in oldunits.itervalues() for row in rows]
+
+        file_totals_record = self.file_totals[fileid]
+        for row in removed:
+            file_totals_record = file_totals_record - FileTotals.new_record(*row[3:])
+            self.cur.execute("""DELETE FROM units WHERE id=?;""", (row[0],))
+            self.cur.execute("""DELETE FROM uniterrors WHERE
+                fileid=? AND unitindex=?;""", (fileid, row[1]))
+            self.cur.execute("""DELETE FROM uncheckedunits WHERE
+                fileid=? AND unitindex=?;""", (fileid, row[1]))
+        # Move the errors and the units that still need to be checked through
+        # negative indexes (below the -1 of the "noerror" entries), so that
+        # they don't mix with those of units that still need to move.
+        for rowid, oldindex, newindex in moved:
+            self.cur.execute("""UPDATE units SET unitindex=? WHERE id=?;""", (newindex, rowid))
+            for table in ("uniterrors", "uncheckedunits"):
+                self.cur.execute("""UPDATE %s SET unitindex=? WHERE
+                    fileid=? AND unitindex=?;""" % table, (-2 - newindex, fileid, oldindex))
+        for table in ("uniterrors", "uncheckedunits"):
+            self.cur.execute("""UPDATE %s SET unitindex=-2 - unitindex WHERE
+                fileid=? AND unitindex < -1;""" % table, (fileid,))
+        for index, unit in added:
+            self.cur.execute("""DELETE FROM uniterrors WHERE
+                fileid=? AND unitindex=?;""", (fileid, index))
+            self._cacheunitstats([unit], fileid, index, file_totals_record)
+            file_totals_record = self.file_totals[fileid]
+        self.file_totals[fileid] = file_totals_record
+
+        self.cur.execute("""SELECT DISTINCT configid FROM uniterrors WHERE fileid=?;""", (fileid,))
+        configids = [row[0] for row in self.cur.fetchall()]
+        self.cur.executemany("""INSERT INTO uncheckedunits
+            (fileid, configid, unitindex) values (?, ?, ?);""",
+            [(fileid, configid, index) for configid in configids for index, unit in added])
+        self.cur.execute("""UPDATE files
+                SET st_mtime=?, st_size=?
+                WHERE fileid=?;""", (mod_info[0], mod_info[1], fileid))
+        return fileid
+
     @transaction
     def _cachestore(self, store, realpath, mod_info):
         """Calculates and caches the statistics of the given store
         unconditionally."""
+        unitvalues, file_totals_record = self._unitvalues(store.units)
+        self._startwrite()
+        filerow = self._getfilerow(realpath)
+        if self._iscached(filerow, mod_info):
+            # another process cached it in the meantime
+            return filerow[0]
+        if filerow is not None:
+            del self.file_totals[filerow[0]]
+        self.cur.execute("""DELETE FROM uncheckedunits WHERE fileid IN
+            (SELECT fileid FROM files WHERE path=?);""", (realpath,))
         self.cur.execute("""DELETE FROM files WHERE
             path=?;""", (realpath,))
         self.cur.execute("""INSERT INTO files
@@ -434,17 +686,51 @@ class StatsCache(object):
         fileid = self.cur.lastrowid
         self.cur.execute("""DELETE FROM units WHERE
             fileid=?""", (fileid,))
-        self._cacheunitstats(store.units, fileid)
+        self._storeunitstats(fileid, unitvalues, file_totals_record)
         return fileid
 
+    def _getdirname(self, dirname):
+        if isinstance(dirname, str):
+            dirname = unicode(dirname, sys.getfilesystemencoding())
+        return os.path.realpath(dirname)
+
+    @transaction
+    def dirtotals(self, dirname):
+        """Retrieves the statistical information of all the cached files in
+        the given directory and its subdirectories, without checking whether
+        they changed.
+
+        The files can be cached with filetotals() first, and files that
+        were removed can be forgotten with removemissingfiles()."""
+        return self.file_totals.dirtotals(self._getdirname(dirname))
+
+    @transaction
+    def removemissingfiles(self, dirname):
+        """Removes the cached files in the given directory and its
+        subdirectories that don't exist anymore."""
+        dirname = os.path.join(self._getdirname(dirname), "")
+        # all paths starting with dirname, using the index on the paths
+        self.cur.execute("""SELECT fileid, path FROM files WHERE
+            path >= ? AND path < ?;""", (dirname, dirname[:-1] + unichr(ord(dirname[-1]) + 1)))
+        for fileid, path in self.cur.fetchall():
+            if os.path.exists(path):
+                continue
+            self._startwrite()
+            del self.file_totals[fileid]
+            for table in ("uncheckedunits", "uniterrors", "units", "files"):
+                self.cur.execute("""DELETE FROM %s WHERE fileid=?;""" % table, (fileid,))
+
     def filetotals(self, filename, store=None):
         """Retrieves the statistics for the given file if possible, otherwise
         delegates to cachestore()."""
         return self.file_totals[self._getfileid(filename, store=store)]
 
     @transaction
-    def _cacheunitschecks(self, units, fileid, configid, checker, unitindex=None):
-        """Helper method for cachestorechecks() and recacheunit()"""
+    def _cacheunitschecks(self, units, fileid, configid, checker, unitindex=None, deleteerrors=False):
+        """Helper method for cachestorechecks() and recacheunit()
+
+        The errors of the file are only deleted after the checks ran, to keep
+        other connections waiting for as short as possible."""
         # We always want to store one dummy error to know that we have actually
         # run the checks on this file with the current checker configuration
         dummy = (-1, fileid, configid, "noerror", "")
@@ -468,6 +754,14 @@ class StatsCache(object):
             unitvalues.remove(dummy)
             errornames.append("total")
 
+        self._startwrite()
+        if deleteerrors:
+            # Let's purge all previous failures because they will probably just
+            # fill up the database without much use.
+            self.cur.execute("""DELETE FROM uniterrors WHERE
+                fileid=?;""", (fileid,))
+            self.cur.execute("""DELETE FROM uncheckedunits WHERE
+                fileid=?;""", (fileid,))
         # XXX: executemany is non-standard
         self.cur.executemany("""INSERT INTO uniterrors
             (unitindex, fileid, configid, name, message)
@@ -479,13 +773,32 @@ class StatsCache(object):
     def _cachestorechecks(self, fileid, store, checker, configid):
         """Calculates and caches the error statistics of the given store
         unconditionally."""
-        # Let's purge all previous failures because they will probably just
-        # fill up the database without much use.
-        self.cur.execute("""DELETE FROM uniterrors WHERE
-            fileid=?;""", (fileid,))
-        self._cacheunitschecks(store.units, fileid, configid, checker)
+        self._cacheunitschecks(store.units, fileid, configid, checker, deleteerrors=True)
         return fileid
 
+    @transaction
+    def _cacheuncheckedunits(self, fileid, store, checker, configid, unitindexes):
+        """Runs the checks on the units that changed since the rest of the
+        file was checked."""
+        unitvalues = []
+        for index in unitindexes:
+            failures = checker.run_filters(store.units[index])
+            for checkname, checkmessage in failures.iteritems():
+                unitvalues.append((index, fileid, configid, checkname, checkmessage))
+        checker.setsuggestionstore(None)
+        self._startwrite()
+        # another process might have checked some of them in the meantime
+        self.cur.execute("""SELECT unitindex FROM uncheckedunits WHERE
+            fileid=? AND configid=?;""", (fileid, configid))
+        unchecked = set([row[0] for row in self.cur.fetchall()])
+        unitvalues = [values for values in unitvalues if values[0] in unchecked]
+        self.cur.executemany("""INSERT INTO uniterrors
+            (unitindex, fileid, configid, name, message)
+            values (?, ?, ?, ?, ?);""",
+            unitvalues)
+        self.cur.execute("""DELETE FROM uncheckedunits WHERE
+            fileid=? AND configid=?;""", (fileid, configid))
+
     def get_unit_stats(self, fileid, unitid):
         values = self.cur.execute("""
             SELECT   state, sourcewords, targetwords
@@ -514,6 +827,7 @@ class StatsCache(object):
         fileid = self._getfileid(filename, check_mod_info=False)
         configid = self._get_config_id(fileid, checker)
         unitid = unit.getid()
+        self._startwrite()
         # get the unit index
         totals_without_unit = self.file_totals[fileid] - \
                                    FileTotals.new_record(*self.get_unit_stats(fileid, unitid))
@@ -523,7 +837,13 @@ class StatsCache(object):
         self.cur.execute("""DELETE FROM units WHERE
             fileid=? AND unitid=?;""", (fileid, unitid))
         state = [self._cacheunitstats([unit], fileid, unitindex, totals_without_unit)]
-        # remove the current errors
+        # remove the current errors, the unit needs to be checked again with
+        # the other checker configurations too
+        self.cur.execute("""SELECT DISTINCT configid FROM uniterrors WHERE
+            fileid=? AND configid!=?;""", (fileid, configid))
+        self.cur.executemany("""INSERT INTO uncheckedunits
+            (fileid, configid, unitindex) values (?, ?, ?);""",
+            [(fileid, row[0], unitindex) for row in self.cur.fetchall()])
         self.cur.execute("""DELETE FROM uniterrors WHERE
             fileid=? AND unitindex=?;""", (fileid, unitindex))
         if os.path.exists(suggestion_filename(filename)):
@@ -540,8 +860,11 @@ class StatsCache(object):
                 ORDER BY unitindex;""", (fileid, configid))
             return self.cur.fetchone(), self.cur
 
+        self.cur.execute("""SELECT unitindex FROM uncheckedunits WHERE
+            fileid=? AND configid=?;""", (fileid, configid))
+        unitindexes = [row[0] for row in self.cur.fetchall()]
         first, cur = geterrors()
-        if first is not None:
+        if first is not None and not unitindexes:
             return first, cur
 
         # This could happen if we haven't done the checks before, or the
@@ -553,7 +876,10 @@ class StatsCache(object):
 
         if os.path.exists(suggestion_filename(filename)):
             checker.setsuggestionstore(factory.getobject(suggestion_filename(filename), ignore=suggestion_extension()))
-        self._cachestorechecks(fileid, store, checker, configid)
+        if first is not None:
+            self._cacheuncheckedunits(fileid, store, checker, configid, unitindexes)
+        else:
+            self._cachestorechecks(fileid, store, checker, configid)
         return geterrors()
 
     def _geterrors(self, filename, fileid, configid, checker, store):
@@ -565,6 +891,11 @@ class StatsCache(object):
 
     @transaction
     def _get_config_id(self, fileid, checker):
+        configid = self._getstoredcheckerconfig(checker)
+        if configid:
+            return configid
+        self._startwrite()
+        # another process might have stored it in the meantime
         configid = self._getstoredcheckerconfig(checker)
         if configid:
             return configid
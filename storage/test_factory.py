@@ -117,6 +117,26 @@ class BaseTestFactory:
         store = factory.getobject(filename)
         assert isinstance(store, self.expected_instance)
 
+    def test_iterunits(self):
+        """Test that iterunits yields the units of plain and compressed
+        files, of the right class."""
+        filenames = [os.path.join(self.testdir, self.filename)]
+        open(filenames[0], "wb").write(self.file_content)
+        filenames.append(filenames[0] + '.gz')
+        gzfile = GzipFile(filenames[-1], mode="wb")
+        gzfile.write(self.file_content)
+        gzfile.close()
+        if BZ2File:
+            filenames.append(filenames[0] + '.bz2')
+            bz2file = BZ2File(filenames[-1], mode="wb")
+            bz2file.write(self.file_content)
+            bz2file.close()
+        for filename in filenames:
+            units = list(factory.iterunits(filename))
+            store = factory.getobject(filename)
+            assert units
+            assert [(type(unit), unit.source) for unit in units] == [(type(unit), unit.source) for unit in store.units]
+
     def test_directory(self):
         """Test that a directory is correctly detected."""
         object = factory.getobject(self.testdir)
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+# -*- coding: utf-8 -*-
 
 import StringIO
 import subprocess
@@ -156,3 +157,34 @@ class TestMOFile(test_base.TestTranslationStore):
             finally:
                 mo_msgfmt_f.close()
                 mo_pocompile_f.close()
+
+    def test_lookup(self):
+        """Test that molookup finds the translations through the hash table."""
+        store = self.StoreClass()
+        header = store.addsourceunit(u"")
+        header.target = u"Content-Type: text/plain; charset=UTF-8\n"
+        for i in range(100):
+            store.addsourceunit(u"message %d" % i).target = u"boodskap %d" % i
+        unit = store.addsourceunit(u"convert")
+        unit.target = u"omskakel"
+        unit.msgctxt.append("verb")
+        unit = store.addsourceunit(mo.multistring([u"tree", u"trees"]))
+        unit.target = mo.multistring([u"boom", u"bome"])
+        store.addsourceunit(u"škola").target = u"škool"
+        store.savefile(self.filename)
+        lookup = mo.molookup(self.filename)
+        try:
+            assert len(lookup) == 104
+            for i in range(100):
+                assert lookup.gettarget(u"message %d" % i) == u"boodskap %d" % i
+            assert lookup.gettarget(u"convert", u"verb") == u"omskakel"
+            assert lookup.gettarget(u"convert") is None
+            assert lookup.gettarget(u"tree").strings == [u"boom", u"bome"]
+            assert lookup.gettarget(u"škola") == u"škool"
+            assert lookup.gettarget(u"missing") is None
+        finally:
+            lookup.close()
+
+    def test_next_prime_number(self):
+        primes = [mo.get_next_prime_number(n) for n in (0, 3, 4, 8, 24, 25, 120, 1000)]
+        assert primes == [2, 3, 5, 11, 29, 29, 127, 1009]
@@ -266,3 +266,56 @@ msgstr[1] "toetse"
         assert pofile.units[4].prev_source == multistring([u"tast", u"tasts"])
 
         assert str(pofile) == posource
+
+    def test_iterparse(self):
+        """checks that iterparse yields the same units as parsing"""
+        posource = '''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+
+#: test.c
+msgid "test"
+msgstr "rest"
+
+#, fuzzy
+msgid "tëst"
+msgid_plural "tësts"
+msgstr[0] "rëst"
+msgstr[1] "rësts"
+
+#~ msgid "old"
+#~ msgstr "oud"
+'''
+        pofile = self.poparse(posource)
+        streamfile = self.StoreClass()
+        units = list(streamfile.iterparse(posource))
+        assert [str(unit) for unit in units] == [str(unit) for unit in pofile.units]
+        # Only the header is kept in the store
+        assert len(streamfile.units) == 1
+        assert streamfile.units[0].isheader()
+        assert streamfile.parseheader() == pofile.parseheader()
+        assert "".join(streamfile.iterstr(units[1:])) == str(pofile)
+        assert "".join(streamfile.iterstr(iter([]))) == str(streamfile)
+
+class TestCompactPOUnit(TestPYPOUnit):
+    UnitClass = pypo.compactpounit
+
+class TestCompactPOFile(TestPYPOFile):
+    StoreClass = pypo.compactpofile
+
+    def test_compact(self):
+        """checks that units don't keep what they can recreate"""
+        posource = 'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n' \
+                   '#: test.c\nmsgid "test"\nmsgstr "rest"\n\nmsgid ""\n"Wrapped "\n"differently"\nmsgstr ""\n'
+        pofile = self.poparse(posource)
+        unit = pofile.units[1]
+        assert unit.__dict__ == {}
+        assert unit._msgid is None and unit._msgid_text == u"test"
+        assert unit._msgid_plural is None and unit._obsoletemsgid is None
+        assert unit.source == u"test" and unit.target == u"rest"
+        assert str(pofile) == posource
+        assert unit._msgid is None
+        assert unit.msgid == [u'"test"']
+        assert unit._msgid == [u'"test"']
+        # Lines that can't be recreated are kept
+        assert pofile.units[2]._msgid == [u'""', u'"Wrapped "', u'"differently"']
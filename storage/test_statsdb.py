@@ -5,6 +5,7 @@ import os
 import os.path
 
 import py.test
+import multiprocessing
 
 from translate.storage import statsdb, factory
 from translate.misc import wStringIO
@@ -76,10 +77,17 @@ msgid ", please confirm login"
 msgstr ""
 """
 
+def cached_filestats((statsfile, filename)):
+    """returns the statistics of the file from a cache in another process"""
+    cache = statsdb.StatsCache(statsfile)
+    return dict(cache.filetotals(filename)), cache.filestats(filename, checks.StandardChecker())
+
 def rm_rf(path):
-    for dirpath, _, filenames in os.walk(path):
+    for dirpath, dirnames, filenames in os.walk(path, topdown=False):
         for filename in filenames:
             os.remove(os.path.join(dirpath, filename))
+        for dirname in dirnames:
+            os.rmdir(os.path.join(dirpath, dirname))
     os.removedirs(path)
 
 class TestStatsDb:
@@ -148,3 +156,131 @@ class TestStatsDb:
         f1, cache1 = self.setup_file_and_db(jtoolkit_extract)
         f2, cache2 = self.setup_file_and_db(fr_terminology_extract)
         assert cache1 == cache2
+
+    def test_incremental_update(self):
+        """checks that recaching only the changed units of a file gives the
+        same statistics and errors as caching it from scratch"""
+        checker = checks.StandardChecker()
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        cache.filechecks(f.filename, checker)
+        cache.filestats(f.filename, checker)
+        # edit a unit, remove one and insert a new one that moves the rest
+        changed = jtoolkit_extract.replace('msgstr "Meld aan vir %s"', 'msgstr "Meld aan vir"')
+        changed = changed.replace('#: web/server.py:92\n', '#: web/server.py:91\nmsgid "Exit %d"\nmsgstr "Verlaat"\n\n#: web/server.py:92\n')
+        changed = changed.replace('#: web/server.py:105\nmsgid ", please confirm login"\nmsgstr ""\n', '')
+        open(f.filename, "w").write(changed)
+        incremental = (cache.filetotals(f.filename), cache.filestats(f.filename, checker),
+                       cache.filechecks(f.filename, checker), cache.unitstats(f.filename))
+        fresh_cache = statsdb.StatsCache(os.path.join(self.path, "fresh.db"))
+        fresh = (fresh_cache.filetotals(f.filename), fresh_cache.filestats(f.filename, checker),
+                 fresh_cache.filechecks(f.filename, checker), fresh_cache.unitstats(f.filename))
+        assert incremental == fresh
+        assert incremental[2] == {'check-printf': [1, 3], 'check-endpunc': [4]}
+
+        # a unit translated with one checker configuration is still checked
+        # again with another one after other units change
+        otherchecker = checks.StandardChecker(checks.CheckerConfig(targetlanguage="af"))
+        cache.filechecks(f.filename, otherchecker)
+        translated = changed.replace('msgid "Exit application"\nmsgstr "Verlaat toepassing"\n',
+                                     'msgid "Exit application"\nmsgstr "Verlaat toepassing."\n')
+        open(f.filename, "w").write(translated)
+        store = factory.getobject(f.filename)
+        cache.recacheunit(f.filename, checker, store.units[5])
+        open(f.filename, "w").write(translated.replace('msgstr "Verlaat"', 'msgstr "Verlaat %d"'))
+        fresh_cache = statsdb.StatsCache(os.path.join(self.path, "fresh2.db"))
+        assert cache.filechecks(f.filename, otherchecker) == fresh_cache.filechecks(f.filename, otherchecker)
+        assert 5 in cache.filechecks(f.filename, otherchecker)['check-endpunc']
+
+    def test_concurrent_processes(self):
+        """checks that several processes can cache the same files at once"""
+        statsfile = os.path.join(self.path, "stats.db")
+        filenames = []
+        for i in range(4):
+            filename = os.path.join(self.path, "test%d.po" % i)
+            open(filename, "w").write(jtoolkit_extract)
+            filenames.append(filename)
+        pool = multiprocessing.Pool(4)
+        try:
+            results = pool.map(cached_filestats, [(statsfile, filename) for filename in filenames] * 4)
+        finally:
+            pool.close()
+            pool.join()
+        assert results == [cached_filestats((statsfile, filenames[0]))] * 16
+        cache = statsdb.StatsCache(statsfile)
+        cache.cur.execute("""SELECT COUNT(*) FROM files;""")
+        assert cache.cur.fetchone()[0] == 4
+        cache.cur.execute("""SELECT COUNT(*) FROM units;""")
+        assert cache.cur.fetchone()[0] == 4 * 6
+        cache.cur.execute("""PRAGMA journal_mode;""")
+        assert cache.cur.fetchone()[0] == "wal"
+
+    def test_migration(self):
+        """checks that a database of an older layout and toolkit build is
+        migrated instead of deleted"""
+        statsfile = os.path.join(self.path, "stats.db")
+        con = statsdb.dbapi2.connect(statsfile)
+        con.execute("""CREATE TABLE files(
+            fileid INTEGER PRIMARY KEY AUTOINCREMENT,
+            path VARCHAR NOT NULL UNIQUE,
+            st_mtime INTEGER NOT NULL,
+            st_size INTEGER NOT NULL,
+            toolkitbuild INTEGER NOT NULL);""")
+        con.execute("""CREATE TABLE units(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            unitid VARCHAR NOT NULL,
+            fileid INTEGER NOT NULL,
+            unitindex INTEGER NOT NULL,
+            source VARCHAR NOT NULL,
+            target VARCHAR,
+            state INTEGER,
+            sourcewords INTEGER,
+            targetwords INTEGER);""")
+        con.execute("""CREATE TABLE checkerconfigs(
+            configid INTEGER PRIMARY KEY AUTOINCREMENT,
+            config VARCHAR);""")
+        con.execute("""INSERT INTO checkerconfigs VALUES (NULL, "{}");""")
+        con.commit()
+        con.close()
+        f, cache = self.setup_file_and_db(jtoolkit_extract)
+        cache.cur.execute("""PRAGMA user_version;""")
+        assert cache.cur.fetchone()[0] == statsdb.SCHEMA_VERSION
+        cache.cur.execute("""SELECT config FROM checkerconfigs;""")
+        assert cache.cur.fetchall() == [("{}",)]
+        assert cache.filestats(f.filename, checks.UnitChecker())['translated'] == [2, 3, 5]
+        # files cached by another build of the toolkit are cached again
+        cache.cur.execute("""UPDATE files SET toolkitbuild=1;""")
+        assert cache.filestats(f.filename, checks.UnitChecker())['translated'] == [2, 3, 5]
+        cache.cur.execute("""SELECT toolkitbuild FROM files;""")
+        assert cache.cur.fetchall() == [(statsdb.toolkitversion.build,)]
+
+    def test_dirtotals(self):
+        """checks that the directory totals follow the totals of the files in
+        the directories"""
+        cache = statsdb.StatsCache(os.path.join(self.path, "stats.db"))
+        dirname = os.path.join(self.path, "af")
+        subdirname = os.path.join(dirname, "sub")
+        os.makedirs(subdirname)
+        filenames = [os.path.join(dirname, "a.po"), os.path.join(subdirname, "b.po"),
+                     os.path.join(subdirname, "c.po")]
+        for filename, contents in zip(filenames, [jtoolkit_extract, jtoolkit_extract, fr_terminology_extract]):
+            open(filename, "w").write(contents)
+        def totals(*filenames):
+            return reduce(lambda x, y: x + y, [cache.filetotals(filename) for filename in filenames])
+        alltotals = totals(*filenames)
+        assert cache.dirtotals(dirname) == alltotals
+        assert cache.dirtotals(subdirname) == totals(*filenames[1:])
+        assert cache.dirtotals(self.path) == alltotals
+        assert cache.dirtotals(self.path)['total'] == 14
+
+        open(filenames[1], "w").write(jtoolkit_extract.replace('#: web/server.py:105\nmsgid ", please confirm login"\nmsgstr ""\n', ''))
+        alltotals = totals(*filenames)
+        assert cache.dirtotals(dirname) == alltotals
+        assert cache.dirtotals(subdirname) == totals(*filenames[1:])
+        assert cache.dirtotals(self.path)['total'] == 13
+
+        os.remove(filenames[2])
+        cache.removemissingfiles(dirname)
+        assert cache.dirtotals(subdirname) == cache.filetotals(filenames[1])
+        assert cache.dirtotals(self.path) == totals(*filenames[:2])
+        cache.cur.execute("""SELECT path, files FROM dirtotals WHERE path=?;""", (dirname,))
+        assert cache.cur.fetchall() == [(dirname, 2)]
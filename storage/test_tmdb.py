@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+
+from translate.storage import tmdb, tmx
+
+
+class TestTMDB:
+    def setup_method(self, method):
+        self.testdir = tempfile.mkdtemp()
+        self.tmdb = tmdb.TMDB(os.path.join(self.testdir, "%s.db" % method.__name__))
+
+    def teardown_method(self, method):
+        if self.tmdb.index:
+            self.tmdb.index.close()
+        shutil.rmtree(self.testdir)
+
+    def translate(self, source):
+        """returns the suggestions for source, ordered independently of the
+        way they were found"""
+        results = self.tmdb.translate_unit(source, "en", "af")
+        return sorted([(-result["quality"], result["source"], result["target"]) for result in results])
+
+    def test_candidate_index(self):
+        """checks that the candidate index finds the same suggestions as
+        scanning the whole database"""
+        random.seed(5)
+        words = ["".join([random.choice("abcdefgh") for i in range(random.randint(2, 7))]) for j in range(50)]
+        def sentence():
+            return u" ".join([random.choice(words) for i in range(random.randint(1, 6))])
+        units = [{"source": sentence(), "target": sentence(), "context": ""} for i in range(400)]
+        self.tmdb.add_list(units, "en", "af")
+        queries = [unit["source"] for unit in units[:60]]
+        queries += [query[:len(query)//2] + u"x" + query[len(query)//2+1:] for query in queries]
+        queries += [sentence() for i in range(30)]
+        expected = [self.translate(query) for query in queries]
+        assert [results for results in expected if results]
+        self.tmdb.build_index()
+        assert self.tmdb.index.num_sources == len(self.tmdb.cursor.execute("SELECT sid FROM sources").fetchall())
+        assert [self.translate(query) for query in queries] == expected
+
+    def test_candidate_index_new_units(self):
+        """checks that units added after building the index are found"""
+        self.tmdb.add_dict({"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""}, "en", "af")
+        self.tmdb.build_index()
+        self.tmdb.add_dict({"source": u"Close the file", "target": u"Maak die lêer toe", "context": ""}, "en", "af")
+        assert [result[1] for result in self.translate(u"Close the files")] == [u"Close the file"]
+        # A new instance uses the index that was written
+        self.tmdb = tmdb.TMDB(self.tmdb.db_file)
+        assert self.tmdb.index.num_sources == 1
+        assert [result[1] for result in self.translate(u"Open the files")] == [u"Open the file"]
+
+    def test_candidate_index_other_db(self):
+        """checks that the index of another database is ignored"""
+        self.tmdb.add_dict({"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""}, "en", "af")
+        self.tmdb.build_index()
+        otherdb = tmdb.TMDB(os.path.join(self.testdir, "other.db"))
+        otherdb.add_dict({"source": u"Close the file", "target": u"Maak die lêer toe", "context": ""}, "en", "af")
+        shutil.copy(self.tmdb.index_file, otherdb.index_file)
+        otherdb.load_index()
+        assert otherdb.index is None
+        assert [result[1] for result in self.translate(u"Open the files")] == [u"Open the file"]
+        self.tmdb = otherdb
+        assert [result[1] for result in self.translate(u"Close the files")] == [u"Close the file"]
+
+    def test_translate_units(self):
+        """checks that a batch of sources gets the same suggestions as the
+        sources one by one"""
+        random.seed(7)
+        words = ["".join([random.choice("abcdefgh") for i in range(random.randint(2, 7))]) for j in range(50)]
+        def sentence():
+            return u" ".join([random.choice(words) for i in range(random.randint(1, 6))])
+        units = [{"source": sentence(), "target": sentence(), "context": ""} for i in range(300)]
+        self.tmdb.add_list(units, "en", "af")
+        queries = [unit["source"] for unit in units[:40]] + [sentence() for i in range(20)]
+        queries.append(queries[0])
+        expected = [self.translate(query) for query in queries]
+        def translate_units():
+            results = self.tmdb.translate_units(queries, "en", "af")
+            return [sorted([(-result["quality"], result["source"], result["target"]) for result in suggestions])
+                    for suggestions in results]
+        assert translate_units() == expected
+        self.tmdb.build_index()
+        self.tmdb.add_list(units[:10], "en", "fr")
+        self.tmdb.add_dict({"source": queries[1] + u"x", "target": u"Nuut", "context": ""}, "en", "af")
+        expected = [self.translate(query) for query in queries]
+        assert translate_units() == expected
+
+    def test_translate_units_lengths(self):
+        """checks a batch of sources with very different lengths, which are
+        looked up in disjoint length ranges"""
+        random.seed(11)
+        words = ["".join([random.choice("abcdefgh") for i in range(random.randint(2, 7))]) for j in range(50)]
+        def sentence(count):
+            return u" ".join([random.choice(words) for i in range(count)])
+        units = [{"source": sentence(count), "target": sentence(2), "context": ""}
+                 for count in [1, 2, 20, 21, 60, 61] * 20]
+        self.tmdb.add_list(units, "en", "af")
+        queries = [units[i]["source"] for i in range(0, 120, 7)] + [u"Open", sentence(60)]
+        expected = [self.translate(query) for query in queries]
+        def translate_units():
+            results = self.tmdb.translate_units(queries, "en", "af")
+            return [sorted([(-result["quality"], result["source"], result["target"]) for result in suggestions])
+                    for suggestions in results]
+        assert translate_units() == expected
+        self.tmdb.build_index()
+        self.tmdb.add_dict({"source": queries[2] + u"x", "target": u"Nuut", "context": ""}, "en", "af")
+        expected = [self.translate(query) for query in queries]
+        assert translate_units() == expected
+        assert tmdb.merge_ranges([(50, 80), (1, 3), (2, 5), (6, 9), (60, 70)]) == [(1, 9), (50, 80)]
+
+    def contents(self, db):
+        """returns the sources and targets in db, without ids and times"""
+        db.cursor.execute("""SELECT s.text, s.context, s.lang, s.length, t.text, t.lang
+            FROM sources s JOIN targets t ON s.sid = t.sid""")
+        return sorted(db.cursor.fetchall())
+
+    def test_bulk_add(self):
+        """checks that bulk mode imports the same as adding units one by one"""
+        units = [{"source": u"File", "target": u"Lêer", "context": u""},
+                 {"source": u"File", "target": u"Lêer", "context": u""},
+                 {"source": u"File", "target": u"Lêertjie", "context": u""},
+                 {"source": u"File", "target": u"Lêer", "context": u"menu"},
+                 {"source": u"Edit", "target": u"Wysig", "context": u""},
+                 {"source": u"Edit", "target": u"Redigeer", "context": u"", "target_lang": "fr"}]
+        self.tmdb.add_dict({"source": u"Edit", "target": u"Wysig", "context": u""}, "en", "af")
+        self.tmdb.add_list(units[:5], "en", "af")
+        self.tmdb.add_dict(units[5], "en", "fr")
+        expected = self.contents(self.tmdb)
+        bulkdb = tmdb.TMDB(os.path.join(self.testdir, "bulk.db"))
+        bulkdb.add_dict({"source": u"Edit", "target": u"Wysig", "context": u""}, "en", "af")
+        assert bulkdb.add_list(units[:3], "en", "af", bulk=True) == 3
+        assert bulkdb.add_list(iter(units[3:]), "en", "af", bulk=True) == 3
+        assert self.contents(bulkdb) == expected
+        if bulkdb.fulltext:
+            bulkdb.cursor.execute("SELECT COUNT(*) FROM fulltext")
+            assert bulkdb.cursor.fetchone()[0] == 3
+            # new units still reach the fulltext index
+            bulkdb.add_dict({"source": u"View", "target": u"Bekyk", "context": u""}, "en", "af")
+            bulkdb.cursor.execute("SELECT COUNT(*) FROM fulltext")
+            assert bulkdb.cursor.fetchone()[0] == 4
+
+    def test_add_units(self):
+        """checks that units streamed from a file are imported like the
+        store"""
+        tmxfile = tmx.tmxfile()
+        tmxfile.addtranslation(u"File", "en", u"Lêer", "af")
+        tmxfile.addtranslation(u"Edit", "en", u"Wysig", "af")
+        tmxfile.addtranslation(u"Untranslated", "en", u"", "af")
+        assert self.tmdb.add_store(tmxfile, "en", "af") == 2
+        for bulk in (False, True):
+            streamdb = tmdb.TMDB(os.path.join(self.testdir, "stream%s.db" % bulk))
+            units = tmx.tmxfile().iterparse(str(tmxfile))
+            assert streamdb.add_units(units, "en", "af", bulk=bulk) == 2
+            assert self.contents(streamdb) == self.contents(self.tmdb)
+
+    def test_cache(self):
+        """checks that cached suggestions are forgotten when units are added"""
+        self.tmdb = tmdb.TMDB(self.tmdb.db_file, cache_size=10)
+        self.tmdb.add_dict({"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""}, "en", "af")
+        assert len(self.translate(u"Open the files")) == 1
+        assert self.tmdb.cache
+        # the results can be changed without changing the cache
+        self.tmdb.translate_unit(u"Open the files", "en", "af")[0]["target"] = u"Verander"
+        assert self.translate(u"Open the files")[0][2] == u"Maak die lêer oop"
+        self.tmdb.add_dict({"source": u"Open the files", "target": u"Maak die lêers oop", "context": ""}, "en", "af")
+        assert len(self.translate(u"Open the files")) == 2
+        self.tmdb.add_list([{"source": u"Open all the files", "target": u"Maak al die lêers oop", "context": ""}], "en", "af", bulk=True)
+        assert len(self.translate(u"Open the files")) == 3
+
+    def test_cache_concurrent_lookup(self):
+        """checks that a lookup from another thread while units are being
+        added doesn't keep the old suggestions in the cache"""
+        self.tmdb = tmdb.TMDB(self.tmdb.db_file, cache_size=10)
+        self.tmdb.add_dict({"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""}, "en", "af")
+        def lookup():
+            thread = threading.Thread(target=self.translate, args=(u"Open the files",))
+            thread.start()
+            thread.join()
+        def units(source, target):
+            yield {"source": source, "target": target, "context": ""}
+            # the new unit isn't committed yet, so this caches the old suggestions
+            lookup()
+        assert [result[1] for result in self.translate(u"Open the files")] == [u"Open the file"]
+        self.tmdb.add_list(units(u"Open the files", u"Maak die lêers oop"), "en", "af")
+        assert self.translate(u"Open the files")[0][1:] == (u"Open the files", u"Maak die lêers oop")
+        self.tmdb.add_list(units(u"Open these files", u"Maak hierdie lêers oop"), "en", "af", bulk=True)
+        assert u"Open these files" in [result[1] for result in self.translate(u"Open the files")]
+
+    def test_cache_stale_results(self):
+        """checks that suggestions found before units were added are not
+        cached after the cache was cleared"""
+        self.tmdb = tmdb.TMDB(self.tmdb.db_file, cache_size=10)
+        self.tmdb.add_dict({"source": u"Open the file", "target": u"Maak die lêer oop", "context": ""}, "en", "af")
+        def adding(method, source, target):
+            """returns method, adding a unit after finding the suggestions
+            (like another thread would)"""
+            def translate(*args):
+                results = method(*args)
+                self.tmdb.add_dict({"source": source, "target": target, "context": ""}, "en", "af")
+                return results
+            return translate
+        self.tmdb._translate_unit = adding(self.tmdb._translate_unit, u"Open the files", u"Maak die lêers oop")
+        assert len(self.translate(u"Open the files")) == 1
+        del self.tmdb._translate_unit
+        assert len(self.translate(u"Open the files")) == 2
+        self.tmdb._translate_units = adding(self.tmdb._translate_units, u"Open these files!", u"Maak hierdie lêers oop!")
+        assert [len(results) for results in self.tmdb.translate_units([u"Open these files"], "en", "af")] == [2]
+        del self.tmdb._translate_units
+        assert [len(results) for results in self.tmdb.translate_units([u"Open these files"], "en", "af")] == [3]
@@ -74,3 +74,26 @@ class TestTMXfile(test_base.TestTranslationStore):
         assert xmltext.index('Five &lt; ten')
         assert xmltext.find('Five < ten') == -1
 
+    def test_iterparse(self):
+        """checks that iterparse yields the same units as parsing"""
+        tmxfile = tmx.tmxfile()
+        tmxfile.addtranslation("First line\nSecond line", "en", "Eerste lyn\nTweede lyn", "af")
+        tmxfile.addtranslation("Mail & News", "en", "Nuus & pos", "af")
+        tmxsource = str(tmxfile)
+        streamfile = tmx.tmxfile()
+        units = [(unit.source, unit.target) for unit in streamfile.iterparse(wStringIO.StringIO(tmxsource))]
+        assert units == [(unit.source, unit.target) for unit in self.tmxparse(tmxsource).units]
+        assert streamfile.units == []
+        # the units were removed from the document once they were used
+        assert streamfile.document.findall("//tu") == []
+        assert streamfile.document.getroot().find("header").get("srclang") == "en"
+
+    def test_iterstr(self):
+        """checks that iterstr writes the same document as str()"""
+        tmxfile = tmx.tmxfile()
+        tmxfile.addtranslation("Mail & News", "en", "Nuus & pos", "af")
+        tmxfile.addtranslation("First line\nSecond line", "en", "Eerste lyn\nTweede lyn", "af")
+        streamfile = tmx.tmxfile()
+        assert "".join(streamfile.iterstr(iter(tmxfile.units))) == str(tmxfile)
+        streamfile.addtranslation("Mail & News", "en", "Nuus & pos", "af")
+        assert "".join(streamfile.iterstr(tmxfile.units[1:])) == str(tmxfile)
@@ -65,6 +65,18 @@ class TestXLIFFfile(test_base.TestTranslationStore):
         </file>
 </xliff>'''
 
+    def test_iterparse(self):
+        """checks that iterparse yields the same units as parsing, in their
+        files"""
+        xlfsource = self.skeleton % '''<trans-unit id="1"><source>One</source><target>Een</target></trans-unit>
+<group><trans-unit id="2"><source>Two</source></trans-unit></group>'''
+        xlifffile = xliff.xlifffile.parsestring(xlfsource)
+        streamfile = xliff.xlifffile()
+        units = [(unit.getid(), unit.source, unit.target) for unit in streamfile.iterparse(xlfsource)]
+        assert units == [(unit.getid(), unit.source, unit.target) for unit in xlifffile.units]
+        assert units[1][0] == "doc.txt" + xliff.ID_SEPARATOR + "2"
+        assert streamfile.getfilenames() == ["doc.txt"]
+
     def test_basic(self):
         xlifffile = xliff.xlifffile()
         assert xlifffile.units == []
@@ -20,11 +20,18 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 """Module to provide a translation memory database."""
+import array
+import bisect
 import math
+import mmap
+import os
+import struct
+import sys
 import time
 import logging
 import re
 import threading
+import zlib
 
 try:
     from sqlite3 import dbapi2
@@ -33,6 +40,7 @@ except ImportError:
 
 from translate.search.lshtein import LevenshteinComparer
 from translate.lang import data
+from translate.misc.lru import LockingLRUCachingDict
 
 
 STRIP_REGEXP = re.compile("\W", re.UNICODE)
@@ -45,9 +53,156 @@ class LanguageError(Exception):
         return str(self.value)
 
 
+def ngram_buckets(text, ngram_size, num_buckets):
+    """returns the set of hash buckets of the n-grams in text"""
+    buckets = set()
+    mask = num_buckets - 1
+    for i in xrange(len(text) - ngram_size + 1):
+        buckets.add(zlib.crc32(text[i:i+ngram_size].encode("utf-8")) & mask)
+    return buckets
+
+
+class CandidateIndex(object):
+    """A precomputed index of the source strings in a TMDB, to find the
+    candidates for fuzzy matching without reading the whole database.
+
+    The index is a file with n-gram postings for all sources up to a certain
+    sid (sources added later are not in the index, and have to be checked
+    separately). It is memory-mapped, so it is never read into memory
+    completely. The number and total length of the indexed sources are kept
+    to check that the index belongs to the database (see L{TMDB.load_index}).
+
+    The sources are numbered in order of their length. Each posting list
+    holds the numbers of the sources containing an n-gram (or rather an
+    n-gram hash bucket), so the part of a posting list in a length range can
+    be found with a binary search. A source within Levenshtein distance d of
+    a query string can miss at most ngram_size * d of the query's n-grams,
+    so sources that share fewer n-grams than that can't be matches."""
+
+    MAGIC = "TMIX"
+    VERSION = 2
+    _header = struct.Struct("<4sIIIIIQ")
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self._header.size:
+            self.close()
+            raise ValueError("%s is not a translation memory index" % filename)
+        magic, version, self.ngram_size, self.num_buckets, self.num_sources, self.max_sid, self.total_length = \
+                self._header.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError("%s is not a translation memory index" % filename)
+        self._sids = self._header.size
+        self._lengths = self._sids + 4 * self.num_sources
+        self._offsets = self._lengths + 4 * self.num_sources
+        self._postings = self._offsets + 4 * (self.num_buckets + 1)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def write(cls, filename, sources, max_sid, num_buckets=65536, ngram_size=3):
+        """Writes an index for the given sources, which are (sid, text,
+        length) tuples ordered by length. num_buckets must be a power of 2."""
+        sids = array.array("I")
+        lengths = array.array("I")
+        total_length = 0
+        postings = [array.array("I") for bucket in xrange(num_buckets)]
+        for number, (sid, text, length) in enumerate(sources):
+            sids.append(sid)
+            lengths.append(length)
+            total_length += length
+            for bucket in ngram_buckets(text, ngram_size, num_buckets):
+                postings[bucket].append(number)
+        offsets = array.array("I", [0])
+        for posting in postings:
+            offsets.append(offsets[-1] + len(posting))
+        tempname = filename + ".tmp"
+        indexfile = open(tempname, "wb")
+        try:
+            indexfile.write(cls._header.pack(cls.MAGIC, cls.VERSION, ngram_size, num_buckets, len(sids),
+                                             max_sid, total_length))
+            for values in [sids, lengths, offsets] + postings:
+                if sys.byteorder == "big":
+                    values.byteswap()
+                values.tofile(indexfile)
+        finally:
+            indexfile.close()
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(tempname, filename)
+    write = classmethod(write)
+
+    def _get(self, start, position):
+        return struct.unpack_from("<I", self._map, start + 4 * position)[0]
+
+    def _bisect(self, start, low, high, value):
+        """returns the first position in [low, high) of the sorted array at
+        start that holds a value of at least value"""
+        while low < high:
+            middle = (low + high) // 2
+            if self._get(start, middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def candidates(self, text, minlen, maxlen, min_similarity, max_length):
+        """Returns the sids of the indexed sources with a length between
+        minlen and maxlen that could have a similarity of at least
+        min_similarity with text (see L{LevenshteinComparer.similarity})."""
+        minlen, maxlen = int(minlen), int(maxlen)
+        first = self._bisect(self._lengths, 0, self.num_sources, minlen)
+        stop = self._bisect(self._lengths, first, self.num_sources, maxlen + 1)
+        if first >= stop:
+            return []
+        # The comparer only considers the first max_length characters
+        text = text[:max_length]
+        buckets = ngram_buckets(text, self.ngram_size, self.num_buckets)
+
+        def required(length):
+            """the number of buckets that a source of the given length must share"""
+            length = min(max(len(text), length), max_length)
+            maxdistance = int((100 - min_similarity) * length / 100.0 + 1e-9)
+            return len(buckets) - maxdistance * self.ngram_size
+
+        # Sources that are long enough to miss all the buckets are all
+        # candidates
+        unfilteredlength = minlen
+        while unfilteredlength <= maxlen and required(unfilteredlength) > 0:
+            unfilteredlength += 1
+        unfiltered = self._bisect(self._lengths, first, stop, unfilteredlength)
+        numbers = range(unfiltered, stop)
+        if unfiltered > first:
+            # Every candidate must share at least one of the buckets that
+            # remain after skipping the (skip) biggest ones
+            skip = required(self._get(self._lengths, unfiltered - 1)) - 1
+            sizes = []
+            for bucket in buckets:
+                size = self._get(self._offsets, bucket + 1) - self._get(self._offsets, bucket)
+                sizes.append((size, bucket))
+            sizes.sort()
+            shared = {}
+            for size, bucket in sizes[:len(sizes) - skip]:
+                low = self._get(self._offsets, bucket)
+                high = low + size
+                low = self._bisect(self._postings, low, high, first)
+                high = self._bisect(self._postings, low, high, unfiltered)
+                if low < high:
+                    for number in struct.unpack_from("<%dI" % (high - low), self._map, self._postings + 4 * low):
+                        shared[number] = shared.get(number, 0) + 1
+            for number, count in shared.iteritems():
+                if count >= required(self._get(self._lengths, number)) - skip:
+                    numbers.append(number)
+        return [self._get(self._sids, number) for number in numbers]
+
+
 class TMDB(object):
     _tm_dbs = {}
-    def __init__(self, db_file, max_candidates=3, min_similarity=75, max_length=1000):
+    def __init__(self, db_file, max_candidates=3, min_similarity=75, max_length=1000, cache_size=0):
 
         self.max_candidates = max_candidates
         self.min_similarity = min_similarity
@@ -66,7 +221,19 @@ class TMDB(object):
 
         self.comparer = LevenshteinComparer(self.max_length)
 
-        self.preload_db()
+        # suggestions for recent queries, see translate_unit()
+        self.cache = None
+        if cache_size:
+            self.cache = LockingLRUCachingDict(cache_size)
+        # incremented whenever the cache is cleared, so that suggestions that
+        # were found before then are not cached afterwards
+        self.cache_generation = 0
+        self._cache_lock = threading.Lock()
+
+        self.index = None
+        self.load_index()
+        if not self.index:
+            self.preload_db()
 
     def _get_connection(self, index):
         current_thread = threading.currentThread()
@@ -186,6 +353,51 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
         logging.debug("tmdb has %d records" % numrows)
         return numrows
 
+    def _get_index_file(self):
+        return self.db_file + ".idx"
+    index_file = property(_get_index_file)
+
+    def load_index(self):
+        """uses the candidate index written by L{build_index}, if there is one
+
+        An index that doesn't match the sources in the database, like that
+        of a database that was replaced, is ignored."""
+        if self.index:
+            self.index.close()
+            self.index = None
+        if self.db_file == ":memory:" or not os.path.exists(self.index_file):
+            return
+        try:
+            index = CandidateIndex(self.index_file)
+        except (IOError, ValueError, EnvironmentError), e:
+            logging.warning("failed to load candidate index %s: %s" % (self.index_file, e))
+            return
+        self.cursor.execute("SELECT COUNT(*), TOTAL(length) FROM sources WHERE sid <= ?", (index.max_sid,))
+        num_sources, total_length = self.cursor.fetchone()
+        if (num_sources, int(total_length)) != (index.num_sources, index.total_length):
+            logging.warning("ignoring candidate index %s, which doesn't match the database" % self.index_file)
+            index.close()
+            return
+        self.index = index
+        logging.debug("using candidate index for %d sources" % self.index.num_sources)
+
+    def build_index(self):
+        """writes a candidate index for all the sources in the database (see
+        L{CandidateIndex}), and starts using it"""
+        if self.db_file == ":memory:":
+            return
+        self.cursor.execute("SELECT COUNT(*), MAX(sid) FROM sources")
+        num_sources, max_sid = self.cursor.fetchone()
+        # about as many buckets as sources, within reason
+        num_buckets = 1024
+        while num_buckets < num_sources and num_buckets < 2**20:
+            num_buckets *= 2
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT sid, text, length FROM sources ORDER BY length, sid")
+        CandidateIndex.write(self.index_file, cursor, max_sid or 0, num_buckets)
+        cursor.close()
+        self.load_index()
+
     def add_unit(self, unit, source_lang=None, target_lang=None, commit=True):
         """inserts unit in the database"""
         #TODO: is that really the best way to handle unspecified
@@ -207,6 +419,20 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
                     }
         self.add_dict(unitdict, source_lang, target_lang, commit)
 
+    def clear_cache(self):
+        """forgets the cached suggestions, since they might have changed
+
+        This should be called after committing new units, otherwise a lookup
+        from another connection can cache the old suggestions again before
+        the new units are visible to it."""
+        if self.cache is not None:
+            self._cache_lock.acquire()
+            try:
+                self.cache_generation += 1
+                self.cache.clear()
+            finally:
+                self._cache_lock.release()
+
     def add_dict(self, unit, source_lang, target_lang, commit=True):
         """inserts units represented as dictionaries in database"""
         source_lang = data.normalize_code(source_lang)
@@ -245,33 +471,110 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
             if commit:
                 self.connection.rollback()
             raise
+        self.clear_cache()
 
-    def add_store(self, store, source_lang, target_lang, commit=True):
-        """insert all units in store in database"""
+    def add_store(self, store, source_lang, target_lang, commit=True, bulk=False):
+        """insert all units in store in database
+
+        See L{add_list} for the bulk import mode."""
+        return self.add_units(store.units, source_lang, target_lang, commit, bulk)
+
+    def add_units(self, units, source_lang, target_lang, commit=True, bulk=False):
+        """insert all translated units in database
+
+        Units can be any iterable, like the units yielded by
+        L{TranslationStore.iterparse}, and are only used one at a time.
+        See L{add_list} for the bulk import mode."""
+        if bulk:
+            units = (unit2dict(unit, source_lang, target_lang) for unit in units
+                     if unit.istranslatable() and unit.istranslated())
+            return self.add_list(units, source_lang, target_lang, commit, bulk=True)
         count = 0
-        for unit in store.units:
+        for unit in units:
             if unit.istranslatable() and unit.istranslated():
                 self.add_unit(unit, source_lang, target_lang, commit=False)
                 count += 1
         if commit:
             self.connection.commit()
+            self.clear_cache()
         return count
 
-    def add_list(self, units, source_lang, target_lang, commit=True):
+    def add_list(self, units, source_lang, target_lang, commit=True, bulk=False):
         """insert all units in list into the database, units are
-        represented as dictionaries"""
+        represented as dictionaries
+
+        In bulk mode, units (which can be any iterable) are inserted in
+        batches with a few statements per batch instead of several per
+        unit, and the fulltext index is only updated at the end. Units can
+        specify their own languages with "source_lang" and "target_lang".
+        Bulk mode always commits, since changing the fulltext triggers
+        commits anyway."""
+        if bulk:
+            return self._add_list_bulk(units, source_lang, target_lang)
         count = 0
         for unit in units:
             self.add_dict(unit, source_lang, target_lang, commit=False)
             count += 1
         if commit:
             self.connection.commit()
+            self.clear_cache()
+        return count
+
+    def _add_list_bulk(self, units, source_lang, target_lang, batch_size=10000):
+        if self.fulltext:
+            # the fulltext index is brought up to date by init_fulltext()
+            self.cursor.execute("DROP TRIGGER IF EXISTS sources_insert_trig")
+        self.cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS staged_units (
+            source VARCHAR NOT NULL, context VARCHAR, source_lang VARCHAR NOT NULL,
+            target VARCHAR NOT NULL, target_lang VARCHAR NOT NULL)""")
+        count = 0
+        try:
+            try:
+                batch = []
+                for unit in units:
+                    batch.append(unit)
+                    if len(batch) == batch_size:
+                        count += self._add_batch(batch, source_lang, target_lang)
+                        batch = []
+                count += self._add_batch(batch, source_lang, target_lang)
+                self.connection.commit()
+            except:
+                self.connection.rollback()
+                raise
+        finally:
+            if self.fulltext:
+                self.init_fulltext()
+            self.clear_cache()
         return count
+
+    def _add_batch(self, units, source_lang, target_lang):
+        """inserts a batch of units in bulk mode, without committing"""
+        sources = {}
+        targets = {}
+        for unit in units:
+            unit_source_lang = data.normalize_code(unit.get("source_lang") or source_lang)
+            unit_target_lang = data.normalize_code(unit.get("target_lang") or target_lang)
+            if not unit_source_lang:
+                raise LanguageError("undefined source language")
+            if not unit_target_lang:
+                raise LanguageError("undefined target language")
+            source = unicode(unit["source"])
+            sources[(source, unit["context"], unit_source_lang)] = len(source)
+            targets[(source, unit["context"], unit_source_lang, unicode(unit["target"]), unit_target_lang)] = True
+        self.cursor.executemany("INSERT OR IGNORE INTO sources (text, context, lang, length) VALUES (?, ?, ?, ?)",
+                                [key + (length,) for key, length in sources.iteritems()])
+        self.cursor.execute("DELETE FROM staged_units")
+        self.cursor.executemany("INSERT INTO staged_units (source, context, source_lang, target, target_lang) VALUES (?, ?, ?, ?, ?)",
+                                targets.iterkeys())
+        #FIXME: get time info from translation store
+        self.cursor.execute("""INSERT OR IGNORE INTO targets (sid, text, lang, time)
+            SELECT s.sid, u.target, u.target_lang, ? FROM staged_units u JOIN sources s
+            ON s.text = u.source AND s.context IS u.context AND s.lang = u.source_lang""",
+                            (int(time.time()),))
+        return len(units)
     
-    def translate_unit(self, unit_source, source_langs, target_langs):
-        """return TM suggestions for unit_source"""
-        if isinstance(unit_source, str):
-            unit_source = unicode(unit_source, "utf-8")
+    def _normalize_langs(self, source_langs, target_langs):
+        """returns the language codes in the form used for querying"""
         if isinstance(source_langs, list):
             source_langs = [data.normalize_code(lang) for lang in source_langs]
             source_langs = ','.join(source_langs)
@@ -282,31 +585,104 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
             target_langs = ','.join(target_langs)
         else:
             target_langs = data.normalize_code(target_langs)
-        
+        return source_langs, target_langs
+
+    def _get_cached(self, key):
+        """returns the cached suggestions for key, or None"""
+        return self.cache.get(key)
+
+    def _set_cached(self, key, results, generation):
+        """remembers the suggestions for key, unless the cache was cleared
+        since generation (when they might be out of date), and returns them"""
+        self._cache_lock.acquire()
+        try:
+            if generation == self.cache_generation:
+                self.cache[key] = results
+        finally:
+            self._cache_lock.release()
+        return results
+
+    def translate_unit(self, unit_source, source_langs, target_langs):
+        """return TM suggestions for unit_source"""
+        if isinstance(unit_source, str):
+            unit_source = unicode(unit_source, "utf-8")
+        source_langs, target_langs = self._normalize_langs(source_langs, target_langs)
+
+        if self.cache is not None:
+            key = (unit_source, source_langs, target_langs)
+            results = self._get_cached(key)
+            if results is None:
+                generation = self.cache_generation
+                results = self._set_cached(key, self._translate_unit(unit_source, source_langs, target_langs),
+                                           generation)
+            return [result.copy() for result in results]
+        return self._translate_unit(unit_source, source_langs, target_langs)
+
+    def translate_units(self, unit_sources, source_langs, target_langs):
+        """return TM suggestions for each of unit_sources, as a list of lists
+        in the same order
+
+        The candidates for all the sources are fetched from the database
+        together, which is much faster than calling L{translate_unit} for
+        each source."""
+        unit_sources = [isinstance(source, str) and unicode(source, "utf-8") or source
+                        for source in unit_sources]
+        source_langs, target_langs = self._normalize_langs(source_langs, target_langs)
+
+        suggestions = {}
+        pending = []
+        seen = set()
+        generation = self.cache_generation
+        for unit_source in unit_sources:
+            if unit_source in seen:
+                continue
+            seen.add(unit_source)
+            if self.cache is not None:
+                results = self._get_cached((unit_source, source_langs, target_langs))
+                if results is not None:
+                    suggestions[unit_source] = results
+                    continue
+            pending.append(unit_source)
+        if pending:
+            for unit_source, results in self._translate_units(pending, source_langs, target_langs).iteritems():
+                if self.cache is not None:
+                    results = self._set_cached((unit_source, source_langs, target_langs), results, generation)
+                suggestions[unit_source] = results
+        return [[result.copy() for result in suggestions[unit_source]] for unit_source in unit_sources]
+
+    def _translate_unit(self, unit_source, source_langs, target_langs):
+        """return TM suggestions for unit_source, with normalised languages"""
         minlen = min_levenshtein_length(len(unit_source), self.min_similarity)
         maxlen = max_levenshtein_length(len(unit_source), self.min_similarity, self.max_length)
 
-        # split source into words, remove punctuation and special
-        # chars, keep words that are at least 3 chars long
-        unit_words = STRIP_REGEXP.sub(' ', unit_source).split()
-        unit_words = filter(lambda word: len(word) > 2, unit_words)
+        unit_words = self._words(unit_source)
 
-        if self.fulltext and len(unit_words) > 3:
+        if self.index:
+            logging.debug("candidate index matching")
+            rows = self._index_rows(unit_source, source_langs, target_langs, minlen, maxlen)
+        elif self.fulltext and len(unit_words) > 3:
             logging.debug("fulltext matching")
             query = """SELECT s.text, t.text, s.context, s.lang, t.lang FROM sources s JOIN targets t ON s.sid = t.sid JOIN fulltext f ON s.sid = f.docid
                        WHERE s.lang IN (?) AND t.lang IN (?) AND s.length BETWEEN ? AND ?
                        AND fulltext MATCH ?"""
             search_str = " OR ".join(unit_words)
             self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen, search_str))
+            rows = self.cursor
         else:
             logging.debug("nonfulltext matching")
             query = """SELECT s.text, t.text, s.context, s.lang, t.lang FROM sources s JOIN targets t ON s.sid = t.sid
             WHERE s.lang IN (?) AND t.lang IN (?) 
             AND s.length >= ? AND s.length <= ?"""
             self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen))
+            rows = self.cursor
 
+        return self._score(unit_source, rows)
+
+    def _score(self, unit_source, rows):
+        """returns the best of the candidates in rows as suggestions for
+        unit_source"""
         results = []
-        for row in self.cursor:
+        for row in rows:
             result = {}
             result['source'] = row[0]
             result['target'] = row[1]
@@ -319,6 +695,109 @@ DROP TRIGGER IF EXISTS sources_delete_trig;
         logging.debug("results: %s", unicode(results))
         return results
 
+    def _translate_units(self, unit_sources, source_langs, target_langs):
+        """returns a dictionary with the TM suggestions for each of
+        unit_sources, with normalised languages"""
+        suggestions = {}
+        ranges = {}
+        for unit_source in unit_sources:
+            if not self.index and self.fulltext and len(self._words(unit_source)) > 3:
+                # the full text search is specific to each source
+                suggestions[unit_source] = self._translate_unit(unit_source, source_langs, target_langs)
+                continue
+            ranges[unit_source] = (min_levenshtein_length(len(unit_source), self.min_similarity),
+                                   max_levenshtein_length(len(unit_source), self.min_similarity, self.max_length))
+        if not ranges:
+            return suggestions
+
+        # fetch the candidates of all the sources at once, with one query
+        # for each of the disjoint length ranges they cover
+        if self.index:
+            candidates = {}
+            for unit_source, (source_minlen, source_maxlen) in ranges.iteritems():
+                candidates[unit_source] = sorted(self.index.candidates(unit_source, source_minlen, source_maxlen,
+                                                                       self.min_similarity, self.max_length))
+            sids = set()
+            for source_sids in candidates.itervalues():
+                sids.update(source_sids)
+            rows_by_sid = {}
+            for row in self._sid_rows(sorted(sids), source_langs, target_langs):
+                rows_by_sid.setdefault(row[5], []).append(row)
+            max_sid = self.index.max_sid
+        else:
+            max_sid = 0
+        rows_by_length = {}
+        query = """SELECT s.text, t.text, s.context, s.lang, t.lang, s.sid, s.length FROM sources s JOIN targets t ON s.sid = t.sid
+        WHERE s.lang IN (?) AND t.lang IN (?)
+        AND s.length >= ? AND s.length <= ? AND s.sid > ?"""
+        for minlen, maxlen in merge_ranges(ranges.values()):
+            self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen, max_sid))
+            for row in self.cursor.fetchall():
+                rows_by_length.setdefault(row[6], []).append(row)
+        lengths = sorted(rows_by_length)
+
+        for unit_source, (source_minlen, source_maxlen) in ranges.iteritems():
+            source_rows = []
+            if self.index:
+                for sid in candidates[unit_source]:
+                    source_rows.extend(rows_by_sid.get(sid, []))
+            for length in lengths[bisect.bisect_left(lengths, source_minlen):bisect.bisect_right(lengths, source_maxlen)]:
+                source_rows.extend(rows_by_length[length])
+            suggestions[unit_source] = self._score(unit_source, source_rows)
+        return suggestions
+
+    def _words(self, unit_source):
+        """returns the words used for full text searching unit_source"""
+        # split source into words, remove punctuation and special
+        # chars, keep words that are at least 3 chars long
+        unit_words = STRIP_REGEXP.sub(' ', unit_source).split()
+        return filter(lambda word: len(word) > 2, unit_words)
+
+    def _sid_rows(self, sids, source_langs, target_langs):
+        """returns the rows for the sources with the given sids"""
+        rows = []
+        # SQLite doesn't accept too many parameters at once
+        for start in range(0, len(sids), 500):
+            chunk = sids[start:start+500]
+            query = """SELECT s.text, t.text, s.context, s.lang, t.lang, s.sid, s.length FROM sources s JOIN targets t ON s.sid = t.sid
+            WHERE s.lang IN (?) AND t.lang IN (?) AND s.sid IN (%s)""" % ",".join(["?"] * len(chunk))
+            self.cursor.execute(query, [source_langs, target_langs] + chunk)
+            rows.extend(self.cursor.fetchall())
+        return rows
+
+    def _index_rows(self, unit_source, source_langs, target_langs, minlen, maxlen):
+        """returns the rows for the candidates from the candidate index, and
+        for the sources added since the index was built"""
+        sids = self.index.candidates(unit_source, minlen, maxlen, self.min_similarity, self.max_length)
+        rows = self._sid_rows(sids, source_langs, target_langs)
+        query = """SELECT s.text, t.text, s.context, s.lang, t.lang FROM sources s JOIN targets t ON s.sid = t.sid
+        WHERE s.lang IN (?) AND t.lang IN (?)
+        AND s.length >= ? AND s.length <= ? AND s.sid > ?"""
+        self.cursor.execute(query, (source_langs, target_langs, minlen, maxlen, self.index.max_sid))
+        rows.extend(self.cursor.fetchall())
+        return rows
+
+
+def unit2dict(unit, source_lang=None, target_lang=None):
+    """returns the dictionary for unit as used by L{TMDB.add_list}, with the
+    languages of the unit where it specifies them"""
+    return {"source": unit.source,
+            "target": unit.target,
+            "context": unit.getcontext(),
+            "source_lang": unit.getsourcelanguage() or source_lang,
+            "target_lang": unit.gettargetlanguage() or target_lang,
+            }
+
+def merge_ranges(ranges):
+    """returns the inclusive (low, high) ranges merged into a sorted list of
+    disjoint ranges"""
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
 
 def min_levenshtein_length(length, min_similarity):
     return math.ceil(max(length * (min_similarity/100.0), 2))
@@ -20,6 +20,8 @@
 
 """module for parsing TMX translation memeory files"""
 
+import copy
+
 from translate.storage import lisa
 from lxml import etree
 
@@ -135,6 +137,38 @@ class tmxfile(lisa.LISAfile):
         #headernode.set("creationdate", "YYYYMMDDTHHMMSSZ"
         #headernode.set("creationid", "CodeSyntax"
 
+    def iterstr(self, units):
+        """Converts this store followed by the given extra units to strings,
+        one unit at a time. The result is the same as L{__str__} for a store
+        containing all of these units (apart from the whitespace around units
+        read from indented files), but the extra units are never kept in
+        memory (they can be a generator, like L{iterparse})."""
+        # Serialise the document around a placeholder for the extra units
+        marker = etree.SubElement(self.body, "translate-toolkit-units")
+        try:
+            head, tail = str(self).split(etree.tostring(marker), 1)
+        finally:
+            self.body.remove(marker)
+        indent = head[len(head.rstrip(" ")):]
+        if indent and tail.startswith("\n"):
+            head = head[:-len(indent)]
+            tail = tail[1:]
+        yield head
+        # Each unit is serialised inside empty elements as deep as the body,
+        # to be indented like it would be in the document.
+        depth = len(list(self.body.iterancestors())) + 1
+        prefix = "".join(["%s<w>\n" % ("  " * level) for level in range(depth)])
+        suffix = "".join(["%s</w>\n" % ("  " * level) for level in reversed(range(depth))])
+        for unit in units:
+            wrapper = outer = etree.Element("w")
+            for level in range(depth - 1):
+                wrapper = etree.SubElement(wrapper, "w")
+            element = copy.deepcopy(unit.xmlelement)
+            element.tail = None
+            wrapper.append(element)
+            yield etree.tostring(outer, pretty_print=True, encoding='utf-8')[len(prefix):-len(suffix)]
+        yield tail
+
     def addtranslation(self, source, srclang, translation, translang):
         """addtranslation method for testing old unit tests"""
         unit = self.addsourceunit(source)
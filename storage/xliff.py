@@ -676,3 +676,24 @@ class xlifffile(lisa.LISAfile):
                 xliff = poxliff.PoXliffFile.parsestring(storestring)
         return xliff
     parsestring = classmethod(parsestring)
+
+    def iterparse(self, input):
+        """Parses the given file or xml string, yielding the units one at a
+        time (see L{lisa.LISAfile.iterparse}).
+
+        Like L{parsestring}, files converted from PO are parsed as
+        L{poxliff.PoXliffFile}s, in which case the units belong to a new
+        store instead of this one."""
+        units = super(xlifffile, self).iterparse(input)
+        first = True
+        for unit in units:
+            if first and ("gettext-domain-header" in (unit.getrestype() or "") \
+                    or self.getdatatype() == "po") \
+                    and self.__class__.__name__.lower() != "poxlifffile":
+                units.close()
+                from translate.storage import poxliff
+                for unit in poxliff.PoXliffFile().iterparse(input):
+                    yield unit
+                return
+            first = False
+            yield unit
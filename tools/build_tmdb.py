@@ -22,17 +22,23 @@
 
 import sys
 import os
+import time
 from optparse import OptionParser
 from translate.storage import factory
 from translate.storage import tmdb
 
 
 class Builder:
-    def __init__(self, tmdbfile, source_lang, target_lang, filenames):
+    def __init__(self, tmdbfile, source_lang, target_lang, filenames, bulk=False, stream=False):
         self.tmdb = tmdb.TMDB(tmdbfile)
         self.source_lang = source_lang
         self.target_lang = target_lang
+        self.bulk = bulk
+        self.stream = stream
+        self.bulkfiles = []
+        self.count = 0
 
+        start = time.time()
         for filename in filenames:
             if not os.path.exists(filename):
                 print >> sys.stderr, "cannot process %s: does not exist" % filename
@@ -41,9 +47,26 @@ class Builder:
                 self.handledir(filename)
             else:
                 self.handlefile(filename)
+        if self.bulk:
+            self.count = self.tmdb.add_list(self.bulkunits(), self.source_lang, self.target_lang, bulk=True)
         self.tmdb.connection.commit()
+        seconds = time.time() - start
+        print "Units added: %d in %.1f seconds (%.0f units/second)" % (self.count, seconds, self.count / max(seconds, 0.001))
+        self.tmdb.build_index()
 
     def handlefile(self, filename):
+        if self.bulk:
+            # the files are read while the units are imported
+            self.bulkfiles.append(filename)
+            return
+        if self.stream:
+            try:
+                self.count += self.tmdb.add_units(factory.iterunits(filename), self.source_lang, self.target_lang, commit=False)
+            except Exception, e:
+                print >> sys.stderr, str(e)
+                return
+            print "File added:", filename
+            return
         try:
             store = factory.getobject(filename)
         except Exception, e:
@@ -51,11 +74,29 @@ class Builder:
             return
         # do something useful with the store and db
         try:
-            self.tmdb.add_store(store, self.source_lang, self.target_lang, commit=False)
+            self.count += self.tmdb.add_store(store, self.source_lang, self.target_lang, commit=False)
         except Exception, e:
             print e
         print "File added:", filename
 
+    def bulkunits(self):
+        """yields the units of all the files as dictionaries for L{TMDB.add_list}"""
+        for filename in self.bulkfiles:
+            # a file that can't be read is reported and skipped, keeping
+            # the units that were read from it before the error
+            try:
+                if self.stream:
+                    units = factory.iterunits(filename)
+                else:
+                    units = factory.getobject(filename).units
+                for unit in units:
+                    if unit.istranslatable() and unit.istranslated():
+                        yield tmdb.unit2dict(unit, self.source_lang, self.target_lang)
+            except Exception, e:
+                print >> sys.stderr, "cannot process %s: %s" % (filename, e)
+                continue
+            print "File added:", filename
+
     def handlefiles(self, dirname, filenames):
         for filename in filenames:
             pathname = os.path.join(dirname, filename)
@@ -91,6 +132,14 @@ def main():
         "-t", "--import-target-lang", dest="target_lang",
         help="target language of translation files"
     )
+    parser.add_option(
+        "-b", "--bulk", dest="bulk", action="store_true", default=False,
+        help="import all files in bulk, which is much faster for big imports"
+    )
+    parser.add_option(
+        "", "--stream", dest="stream", action="store_true", default=False,
+        help="read the files one unit at a time, to import big files (like TMX) in bounded memory"
+    )
     (options, args) = parser.parse_args()
 
     if not options.target_lang:
@@ -99,7 +148,7 @@ def main():
     if len(args) < 1:
         parser.error('No input file(s) specified.')
 
-    Builder(options.tmdb_file, options.source_lang, options.target_lang, args)
+    Builder(options.tmdb_file, options.source_lang, options.target_lang, args, options.bulk, options.stream)
 
 if __name__ == '__main__':
     main()
@@ -75,6 +75,18 @@ def calcstats_old(filename):
                                 stats["untranslatedsourcewords"]
     return stats
 
+def calcstats_stream(filename):
+    """Calculates the same statistics as calcstats(), but parses the file
+    one unit at a time (see L{TranslationStore.iterparse}), so that the file
+    never needs to be completely in memory. The units are classified like
+    in L{statsdb.StatsCache}, but the statistics are not cached."""
+    stats = statsdb.FileTotals.new_record()
+    for unit in factory.iterunits(filename):
+        if unit.istranslatable():
+            sourcewords, targetwords = statsdb.wordsinunit(unit)
+            stats = stats + statsdb.FileTotals.new_record(statsdb.statefordb(unit), sourcewords, targetwords)
+    return stats
+
 def calcstats(filename):
     statscache = statsdb.StatsCache()
     return statscache.filetotals(filename)
@@ -163,13 +175,16 @@ def untranslatedmessages(units):
     return filter(lambda unit: not (unit.istranslated() or unit.isfuzzy()) and unit.source, units)
 
 class summarizer:
-    def __init__(self, filenames, style=default_style, incomplete_only=False):
+    def __init__(self, filenames, style=default_style, incomplete_only=False, stream=False, tree=False):
         self.totals = {}
         self.filecount = 0
         self.longestfilename = 0
         self.style = style
         self.incomplete_only = incomplete_only
         self.complete_count = 0
+        self.stream = stream
+        self.tree = tree
+        self.dirnames = []
 
         if (self.style == style_csv):
             print "Filename, Translated Messages, Translated Source Words, Translated \
@@ -188,6 +203,8 @@ Review Messages, Review Source Words"
                 self.handledir(filename)
             else:
                 self.handlefile(filename)
+        if self.tree:
+            self.summarizetree(filter(os.path.isdir, filenames))
         if self.filecount > 1 and (self.style == style_full):
             if self.incomplete_only:
                 summarize("TOTAL (incomplete only):", self.totals, incomplete_only=True)
@@ -206,9 +223,13 @@ Review Messages, Review Source Words"
 
     def handlefile(self, filename):
         try:
-            stats = calcstats(filename)
+            if self.stream:
+                stats = calcstats_stream(filename)
+            else:
+                stats = calcstats(filename)
             self.updatetotals(stats)
-            self.complete_count += summarize(filename, stats, self.style, self.longestfilename, self.incomplete_only)
+            if not self.tree:
+                self.complete_count += summarize(filename, stats, self.style, self.longestfilename, self.incomplete_only)
             self.filecount += 1
         except: # This happens if we have a broken file.
             print >> sys.stderr, sys.exc_info()[1]
@@ -225,9 +246,23 @@ Review Messages, Review Source Words"
         path, name = os.path.split(dirname)
         if name in ["CVS", ".svn", "_darcs", ".git", ".hg", ".bzr"]:
             return
+        if self.tree:
+            self.dirnames.append(dirname)
         entries = os.listdir(dirname)
         self.handlefiles(dirname, entries)
 
+    def summarizetree(self, topdirs):
+        """Print the totals of every directory, as kept by the statistics
+        cache for all the files in the directory and its subdirectories."""
+        statscache = statsdb.StatsCache()
+        for dirname in topdirs:
+            statscache.removemissingfiles(dirname)
+        if (self.style == style_short_strings or self.style == style_short_words):
+            self.longestfilename = max([0] + [len(dirname) for dirname in self.dirnames])
+        for dirname in self.dirnames:
+            stats = statscache.dirtotals(dirname)
+            self.complete_count += summarize(dirname, stats, self.style, self.longestfilename, self.incomplete_only)
+
 def main():
     parser = OptionParser(usage="usage: %prog [options] po-files")
     parser.add_option("--incomplete", action="store_const", const = True, dest = "incomplete_only",
@@ -243,6 +278,10 @@ def main():
                       help="statistics of strings in short format - one line per file")
     parser.add_option("--short-words", action="store_const", const = style_csv, dest = "style_short_words",
                       help="statistics of words in short format - one line per file")
+    parser.add_option("--stream", action="store_true", dest="stream", default=False,
+                      help="count one unit at a time without using the statistics cache")
+    parser.add_option("--tree", action="store_true", dest="tree", default=False,
+                      help="statistics of every directory instead of every file")
 
     (options, args) = parser.parse_args()
 
@@ -257,6 +296,8 @@ def main():
        (options.style_short_strings and options.style_short_words):
         parser.error("options --full, --csv, --short-strings and --short-words are mutually exclusive")
         sys.exit(2)
+    if options.tree and options.stream:
+        parser.error("option --tree uses the statistics cache and can't be used with --stream")
 
     style = default_style   # default output style
     if options.style_csv:
@@ -274,7 +315,7 @@ def main():
     except Exception:
         pass
 
-    summarizer(args, style, options.incomplete_only)
+    summarizer(args, style, options.incomplete_only, options.stream, options.tree)
 
 if __name__ == '__main__':
     main()
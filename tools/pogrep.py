@@ -35,6 +35,7 @@ from translate.misc.multistring import multistring
 from translate.lang import data
 import re
 import locale
+import itertools
 
 
 class GrepMatch(object):
@@ -214,6 +215,24 @@ class GrepFilter:
             thenewfile.updateheader(add=True, **thefile.parseheader())
         return thenewfile
 
+    def filterstream(self, thefile, inputfile, outputfile):
+        """runs filters on the units of inputfile while it is parsed into
+        thefile (see L{pofile.iterparse}), writing the matching units to
+        outputfile as they are found. Returns whether any units matched."""
+        matching = itertools.ifilter(self.filterunit, thefile.iterparse(inputfile))
+        try:
+            firstunit = matching.next()
+        except StopIteration:
+            return False
+        thenewfile = type(thefile)()
+        thenewfile.setsourcelanguage(thefile.sourcelanguage)
+        thenewfile.settargetlanguage(thefile.targetlanguage)
+        if isinstance(thenewfile, poheader):
+            thenewfile.updateheader(add=True, **thefile.parseheader())
+        for output in thenewfile.iterstr(itertools.chain([firstunit], matching)):
+            outputfile.write(output)
+        return True
+
     def getmatches(self, units):
         if not self.searchstring:
             return [], []
@@ -306,8 +325,12 @@ class GrepOptionParser(optrecurse.RecursiveOptionParser):
         self.usepsyco(options)
         self.recursiveprocess(options)
 
-def rungrep(inputfile, outputfile, templatefile, checkfilter):
+def rungrep(inputfile, outputfile, templatefile, checkfilter, stream=False):
     """reads in inputfile, filters using checkfilter, writes to outputfile"""
+    if stream:
+        storeclass = factory.getclass(inputfile)
+        if hasattr(storeclass, "iterstr"):
+            return checkfilter.filterstream(storeclass(), inputfile, outputfile)
     fromfile = factory.getobject(inputfile)
     tofile = checkfilter.filterfile(fromfile)
     if tofile.isempty():
@@ -334,8 +357,12 @@ def cmdlineparser():
     parser.add_option("", "--accelerator", dest="accelchar",
         action="store", type="choice", choices=["&", "_", "~"],
         metavar="ACCELERATOR", help="ignores the given accelerator when matching")
+    parser.add_option("", "--stream", dest="stream",
+        action="store_true", default=False,
+        help="process PO files one unit at a time instead of loading them completely")
     parser.set_usage()
     parser.passthrough.append('checkfilter')
+    parser.passthrough.append('stream')
     parser.description = __doc__
     return parser
 
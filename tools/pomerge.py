@@ -29,33 +29,31 @@ usage instructions
 """
 
 import sys
+import itertools
 from translate.storage import factory
 from translate.storage.poheader import poheader
 
-def mergestores(store1, store2, mergeblanks, mergecomments):
-    """Take any new translations in store2 and write them into store1."""
-
+def matchunits(store2, findlocation, findsource, mergeblanks, mergecomments):
+    """Finds the units of the template that the units of store2 should be
+    merged into, using the given functions to find a template unit by
+    location or by source. Yields (templateunit, unit2, comments) for every
+    merge, in order, and reports the units of store2 that were not found."""
     for unit2 in store2.units:
         if unit2.isheader():
-            if isinstance(store1, poheader):
-                store1.mergeheaders(store2)
             # Skip header units
             continue
         # there may be more than one entity due to msguniq merge
         entities = unit2.getlocations()
         if len(entities) == 0:
             source = unit2.source
-            unit1 = store1.findunit(source)
+            unit1 = findsource(source)
             if unit1 is None:
                 sys.stderr.write(str(unit2) + "\n")
             else:
-                # finally set the new definition in unit1
-                unit1.merge(unit2, overwrite=True)
+                yield unit1, unit2, True
         for entity in entities:
-            unit1 = None
-            if store1.locationindex.has_key(entity):
-                # now we need to replace the definition of entity with msgstr
-                unit1 = store1.locationindex[entity] # find the other po
+            # now we need to replace the definition of entity with msgstr
+            unit1 = findlocation(entity) # find the other po
             # check if this is a duplicate in store2...
             if store2.locationindex.has_key(entity):
                 if store2.locationindex[entity] is None:
@@ -63,7 +61,7 @@ def mergestores(store1, store2, mergeblanks, mergecomments):
             # if locationindex was not unique, use the source index
             if unit1 is None:
                 source = unit2.source
-                unit1 = store1.findunit(source)
+                unit1 = findsource(source)
             # check if we found a matching po element
             if unit1 is None:
                 print >> sys.stderr, "# the following po element was not found"
@@ -73,10 +71,86 @@ def mergestores(store1, store2, mergeblanks, mergecomments):
                     target = unit2.target
                     if len(target.strip()) == 0:
                         continue
-                # finally set the new definition in unit1
-                unit1.merge(unit2, overwrite=True, comments=mergecomments)
+                yield unit1, unit2, mergecomments
+
+def hasheader(store):
+    for unit in store.units:
+        if unit.isheader():
+            return True
+    return False
+
+def mergestores(store1, store2, mergeblanks, mergecomments):
+    """Take any new translations in store2 and write them into store1."""
+    if isinstance(store1, poheader) and hasheader(store2):
+        store1.mergeheaders(store2)
+    for unit1, unit2, comments in matchunits(store2, store1.locationindex.get, store1.findunit, mergeblanks, mergecomments):
+        # finally set the new definition in unit1
+        unit1.merge(unit2, overwrite=True, comments=comments)
     return store1
 
+def indextemplate(units):
+    """Indexes the template units by location and source, like
+    L{TranslationStore.makeindex}, but only keeping the position of each
+    unit instead of the unit itself."""
+    locationindex = {}
+    sourceindex = {}
+    for position, unit in enumerate(units):
+        if not unit.istranslatable():
+            continue
+        if unit.hasplural():
+            sources = unit.source.strings
+        else:
+            sources = [unit.source]
+        for source in sources:
+            if not source in sourceindex:
+                sourceindex[source] = position
+        for location in unit.getlocations():
+            if location in locationindex:
+                # if sources aren't unique, don't use them
+                locationindex[location] = None
+            else:
+                locationindex[location] = position
+    return locationindex, sourceindex
+
+def mergestream(templateclass, templatefile, store2, outputfile, mergeblanks, mergecomments):
+    """Merges the translations in store2 into the template while it is
+    parsed, writing the merged units to outputfile as they are done, so that
+    the template never needs to be completely in memory.
+
+    The template is parsed twice: first to index the positions of its units,
+    then to merge them. Returns whether there were any units to write."""
+    locationindex, sourceindex = indextemplate(templateclass().iterparse(templatefile))
+    merges = {}
+    for position, unit2, comments in matchunits(store2, locationindex.get, sourceindex.get, mergeblanks, mergecomments):
+        merges.setdefault(position, []).append((unit2, comments))
+
+    def mergedunits(units):
+        for position, unit1 in units:
+            for unit2, comments in merges.get(position, []):
+                # finally set the new definition in unit1
+                unit1.merge(unit2, overwrite=True, comments=comments)
+            yield unit1
+
+    templatefile.seek(0)
+    store1 = templateclass()
+    units = enumerate(store1.iterparse(templatefile))
+    # leave the header in store1 (see pofile.iterparse), and only write
+    # anything if the template has a translatable unit
+    pending = []
+    for position, unit1 in units:
+        if unit1.istranslatable():
+            pending.append((position, unit1))
+            break
+        if not (store1.units and unit1 is store1.units[0]):
+            pending.append((position, unit1))
+    else:
+        return False
+    if isinstance(store1, poheader) and hasheader(store2):
+        store1.mergeheaders(store2)
+    for output in store1.iterstr(mergedunits(itertools.chain(pending, units))):
+        outputfile.write(output)
+    return True
+
 def str2bool(option):
     """Convert a string value to boolean
 
@@ -93,7 +167,7 @@ def str2bool(option):
     else:
         raise ValueError("invalid boolean value: %r" % option)
 
-def mergestore(inputfile, outputfile, templatefile, mergeblanks="no", mergecomments="yes"):
+def mergestore(inputfile, outputfile, templatefile, mergeblanks="no", mergecomments="yes", stream=False):
     try:
         mergecomments = str2bool(mergecomments)
     except ValueError:
@@ -103,6 +177,11 @@ def mergestore(inputfile, outputfile, templatefile, mergeblanks="no", mergecomme
     except ValueError:
         raise ValueError("invalid mergeblanks value: %r" % mergeblanks)
     inputstore = factory.getobject(inputfile)
+    if stream and templatefile is not None:
+        templateclass = factory.getclass(templatefile)
+        if hasattr(templateclass, "iterstr"):
+            inputstore.makeindex()
+            return int(mergestream(templateclass, templatefile, inputstore, outputfile, mergeblanks, mergecomments))
     if templatefile is None:
         # just merge nothing
         templatestore = type(inputstore)()
@@ -134,6 +213,9 @@ def main():
     parser.passthrough.append("mergeblanks")
     parser.add_option(mergecommentsoption)
     parser.passthrough.append("mergecomments")
+    parser.add_option("", "--stream", dest="stream", action="store_true", default=False,
+        help="merge into PO templates one unit at a time, without loading the whole template")
+    parser.passthrough.append("stream")
     parser.run()
 
 
@@ -22,6 +22,8 @@
 See: http://translate.sourceforge.net/wiki/toolkit/poterminology for examples and
 usage instructions
 """
+import copy
+import itertools
 import os
 import re
 import sys
@@ -39,7 +41,7 @@ def create_termunit(term, unit, targets, locations, sourcenotes, transnotes, fil
         termunit.merge(unit, overwrite=False, comments=False)
     if len(targets.keys()) > 1:
         txt = '; '.join(["%s {%s}" % (target, ', '.join(files))
-                         for target, files in targets.iteritems()])
+                         for target, files in sorted(targets.iteritems())])
         if termunit.target.find('};') < 0:
             termunit.target = txt
             termunit.markfuzzy()
@@ -48,17 +50,91 @@ def create_termunit(term, unit, targets, locations, sourcenotes, transnotes, fil
             termunit.addnote(txt, "translator")
     for location in locations:
         termunit.addlocation(location)
-    for sourcenote in sourcenotes:
+    for sourcenote in sorted(sourcenotes):
         termunit.addnote(sourcenote, "developer")
-    for transnote in transnotes:
+    for transnote in sorted(transnotes):
         termunit.addnote(transnote, "translator")
-    for filename, count in filecounts.iteritems():
+    for filename, count in sorted(filecounts.iteritems()):
         termunit.addnote("(poterminology) %s (%d)\n" % (filename, count), 'translator')
     return termunit
 
+class TermCounts(object):
+    """The aggregated occurrences of a term, as used by
+    L{TerminologyExtractor.extract_terms}.
+
+    Only the details that end up in the terminology are kept: the number of
+    occurrences, the distinct sources, the occurrences per file, at most
+    maxlocations distinct locations and the units that consist of the term
+    only. Counts of different input files can be combined with L{merge}."""
+    __slots__ = ("count", "sources", "filecounts", "locations", "maxlocations",
+                 "morelocations", "fullmsg", "targets", "sourcenotes",
+                 "transnotes", "bestunit", "besttarget")
+
+    def __init__(self, maxlocations=None):
+        self.count = 0
+        self.sources = set()
+        self.filecounts = {}
+        # location -> the order in which it was seen
+        self.locations = {}
+        self.maxlocations = maxlocations
+        self.morelocations = False
+        self.fullmsg = False
+        self.targets = {}
+        self.sourcenotes = set()
+        self.transnotes = set()
+        self.bestunit = None
+        self.besttarget = None
+
+    def addlocation(self, location):
+        """adds a location, unless maxlocations have been seen already"""
+        if location in self.locations:
+            return
+        if self.maxlocations is None or len(self.locations) < self.maxlocations:
+            self.locations[location] = len(self.locations)
+        else:
+            self.morelocations = True
+
+    def foldplural(self):
+        """forgets the full message units, for counts that are folded into
+        the counts of the singular form of the term"""
+        self.fullmsg = False
+        self.targets = {}
+        self.sourcenotes = set()
+        self.transnotes = set()
+        self.bestunit = None
+        self.besttarget = None
+        return self
+
+    def merge(self, other):
+        """adds the counts of other, which were counted after these"""
+        self.count += other.count
+        self.sources.update(other.sources)
+        for filename, count in other.filecounts.iteritems():
+            self.filecounts[filename] = self.filecounts.get(filename, 0) + count
+        # keep the locations that were seen first, as when counting serially
+        for location in sorted(other.locations, key=other.locations.get):
+            self.addlocation(location)
+        self.morelocations = self.morelocations or other.morelocations
+        if other.fullmsg:
+            self.fullmsg = True
+            for target, filenames in other.targets.iteritems():
+                self.targets.setdefault(target, []).extend(filenames)
+            self.sourcenotes.update(other.sourcenotes)
+            self.transnotes.update(other.transnotes)
+            self.bestunit = other.bestunit
+            self.besttarget = other.besttarget
+
 class TerminologyExtractor(object):
     def __init__(self, foldtitle=True, ignorecase=False, accelchars="", termlength=3,
-                 sourcelanguage="en", invert=False, stopfile=None):
+                 sourcelanguage="en", invert=False, stopfile=None, counting=False,
+                 maxlocations=100):
+        """
+        @param counting: keep a L{TermCounts} per term in the glossary
+            instead of every occurrence of the term, which bounds the memory
+            used by the size of the terminology instead of the input
+        @param maxlocations: the number of distinct locations of a term
+            to keep when counting
+        """
         self.foldtitle = foldtitle
         self.ignorecase = ignorecase
         self.accelchars = accelchars
@@ -88,8 +164,14 @@ class TerminologyExtractor(object):
         self.xmlentpat = re.compile(r"&(?:#(?:[0-9]+|x[0-9a-f]+)|[a-z_:][\w.-:]*);",
                                flags=re.UNICODE|re.IGNORECASE)
 
+        # handles line numbers of locations
+        self.locpat = re.compile(r":[0-9]+$")
+
+        self.counting = counting
+        self.maxlocations = maxlocations
         self.units = 0
         self.glossary = {}
+        self._countedunit = None
 
     def parse_stopword_file(self):
 
@@ -151,7 +233,7 @@ class TerminologyExtractor(object):
         if (len(words) > skips + 1 and
             'skip' not in self.stopword(words[0]) and
             'skip' not in self.stopword(words[-1])):
-            self.glossary.setdefault(' '.join(words), []).append(translation)
+            self.addterm(' '.join(words), translation)
         if partials:
             part = list(words)
             while len(part) > 2:
@@ -160,7 +242,72 @@ class TerminologyExtractor(object):
                 if (len(part) > skips + 1 and
                     'skip' not in self.stopword(part[0]) and
                     'skip' not in self.stopword(part[-1])):
-                    self.glossary.setdefault(' '.join(part), []).append(translation)
+                    self.addterm(' '.join(part), translation)
+
+    def addterm(self, term, translation):
+        """adds an occurrence of term in the glossary"""
+        if self.counting:
+            counts = self.glossary.get(term)
+            if counts is None:
+                counts = self.glossary[term] = TermCounts(self.maxlocations)
+            self.countoccurrence(term, counts, translation)
+        else:
+            self.glossary.setdefault(term, []).append(translation)
+
+    def foldplural(self, plural):
+        """returns the glossary entry of a plural term to be used for its
+        singular form"""
+        if self.counting:
+            return plural.foldplural()
+        return plural
+
+    def countoccurrence(self, term, counts, translation):
+        """adds an occurrence of term to its L{TermCounts}"""
+        source, target, unit, filename = translation
+        if unit is not self._countedunit:
+            self._countedunit = unit
+            self._unitdetails = (self.clean(unit.source).lower(),
+                                 unit.source.strip().lower(),
+                                 [self.locpat.sub("", loc) for loc in unit.getlocations()])
+        cleansource, stripsource, locations = self._unitdetails
+        counts.count += 1
+        counts.sources.add(source)
+        counts.filecounts[filename] = counts.filecounts.get(filename, 0) + 1
+        #FIXME: why reclean source and target?!
+        if term.lower() == cleansource:
+            counts.fullmsg = True
+            target = self.clean(unit.target)
+            if self.ignorecase or (self.foldtitle and target.istitle()):
+                target = target.lower()
+            if target != "":
+                counts.targets.setdefault(target, []).append(filename)
+            if term.lower() == stripsource:
+                counts.sourcenotes.add(unit.getnotes("source code"))
+                counts.transnotes.add(unit.getnotes("translator"))
+            # keep a copy, so that the store of the unit can be freed
+            counts.bestunit = copy.copy(unit)
+            counts.bestunit._store = None
+            counts.besttarget = target
+        #FIXME: figure out why we did a merge to begin with
+        #termunit.merge(unit, overwrite=False, comments=False)
+        for location in locations:
+            counts.addlocation(location)
+
+    def mergecounts(self, glossary, units):
+        """merges the glossary of a counting extractor that processed later
+        input files, folding plurals like L{processunits}"""
+        self.units += units
+        for term, counts in glossary.iteritems():
+            if ' ' not in term:
+                if len(term) > 3 and term[-1] == 's' and term[0:-1] in self.glossary:
+                    term = term[0:-1]
+                    counts.foldplural()
+                elif len(term) > 2 and term + 's' in self.glossary:
+                    self.glossary[term] = self.glossary.pop(term + 's').foldplural()
+            if term in self.glossary:
+                self.glossary[term].merge(counts)
+            else:
+                self.glossary[term] = counts
 
     def processunits(self, units, fullinputpath):
         sourcelang = lang_factory.getlanguage(self.sourcelanguage)
@@ -200,8 +347,8 @@ class TerminologyExtractor(object):
                         if len(word) > 3 and word[-1] == 's' and word[0:-1] in self.glossary:
                             root = word[0:-1]
                         elif len(root) > 2 and root + 's' in self.glossary:
-                            self.glossary[root] = self.glossary.pop(root + 's')
-                        self.glossary.setdefault(root, []).append(translation)
+                            self.glossary[root] = self.foldplural(self.glossary.pop(root + 's'))
+                        self.addterm(root, translation)
                     if self.termlength > 1:
                         if 'phrase' in ignore:
                             # add trailing phrases in previous words
@@ -232,41 +379,26 @@ class TerminologyExtractor(object):
 
     def extract_terms(self, create_termunit=create_termunit, inputmin=1, fullmsgmin=1, substrmin=2, locmin=2):
         terms = {}
-        locre = re.compile(r":[0-9]+$")
         print >> sys.stderr, ("%d terms from %d units" %
                               (len(self.glossary), self.units))
-        for term, translations in self.glossary.iteritems():
-            if len(translations) <= 1:
+        for term, counts in self.glossary.iteritems():
+            if not self.counting:
+                if len(counts) <= 1:
+                    continue
+                translations, counts = counts, TermCounts()
+                for translation in translations:
+                    self.countoccurrence(term, counts, translation)
+            elif counts.count <= 1:
                 continue
-            filecounts = {}
-            sources = set()
-            locations = set()
-            sourcenotes = set()
-            transnotes = set()
-            targets = {}
-            fullmsg = False
-            bestunit = None
-            for source, target, unit, filename in translations:
-                sources.add(source)
-                filecounts[filename] = filecounts.setdefault(filename, 0) + 1
-                #FIXME: why reclean source and target?!
-                if term.lower() == self.clean(unit.source).lower():
-                    fullmsg = True
-                    target = self.clean(unit.target)
-                    if self.ignorecase or (self.foldtitle and target.istitle()):
-                        target = target.lower()
-                    unit.target = target
-                    if target != "":
-                        targets.setdefault(target, []).append(filename)
-                    if term.lower() == unit.source.strip().lower():
-                        sourcenotes.add(unit.getnotes("source code"))
-                        transnotes.add(unit.getnotes("translator"))
-                    unit.source = term
-                    bestunit = unit
-                #FIXME: figure out why we did a merge to begin with
-                #termunit.merge(unit, overwrite=False, comments=False)
-                for loc in unit.getlocations():
-                    locations.add(locre.sub("", loc))
+            sources = counts.sources
+            filecounts = counts.filecounts
+            locations = counts.locations
+            targets = counts.targets
+            fullmsg = counts.fullmsg
+            bestunit = counts.bestunit
+            if bestunit is not None:
+                bestunit.target = counts.besttarget
+                bestunit.source = term
 
             numsources = len(sources)
             numfiles = len(filecounts)
@@ -280,12 +412,19 @@ class TerminologyExtractor(object):
                 continue
 
             locmax = 2 * locmin
-            if numlocs > locmax:
-                locations = list(locations)[0:locmax]
+            locations = sorted(locations)
+            if counts.morelocations:
+                # more locations were seen than kept, so only a lower bound is known
+                shown = min(numlocs, locmax)
+                locations = locations[0:locmax]
+                locations.append("(poterminology) at least %d more locations"
+                                     % (numlocs + 1 - shown))
+            elif numlocs > locmax:
+                locations = locations[0:locmax]
                 locations.append("(poterminology) %d more locations"
                                      % (numlocs - locmax))
 
-            termunit = create_termunit(term, bestunit, targets, locations, sourcenotes, transnotes, filecounts)
+            termunit = create_termunit(term, bestunit, targets, locations, counts.sourcenotes, counts.transnotes, filecounts)
             terms[term] = ((10 * numfiles) + numsources, termunit)
         return terms
 
@@ -327,6 +466,21 @@ class TerminologyExtractor(object):
         return termitems
 
 
+# The parser of a parallelcount() run, for use in the worker processes
+_countparser = None
+_countoptions = None
+
+def _initcountworker(parser, options):
+    global _countparser, _countoptions
+    _countparser, _countoptions = parser, options
+
+def _countfile(fullinputpath):
+    extractor = _countparser.extractor
+    extractor.glossary = {}
+    extractor.units = 0
+    success = _countparser.tryprocessinput(_countoptions, fullinputpath)
+    return success, extractor.glossary, extractor.units
+
 class TerminologyOptionParser(optrecurse.RecursiveOptionParser):
     """a specialized Option Parser for the terminology tool..."""
 
@@ -393,7 +547,9 @@ class TerminologyOptionParser(optrecurse.RecursiveOptionParser):
         self.extractor = TerminologyExtractor(foldtitle=options.foldtitle, ignorecase=options.ignorecase,
                                               accelchars=options.accelchars, termlength=options.termlength,
                                               sourcelanguage=options.sourcelanguage,
-                                              invert=options.invert, stopfile=options.stopfile)
+                                              invert=options.invert, stopfile=options.stopfile,
+                                              counting=options.counting or options.jobs > 1,
+                                              maxlocations=max(100, 2 * options.locmin + 1))
         self.recursiveprocess(options)
 
     def recursiveprocess(self, options):
@@ -413,21 +569,46 @@ class TerminologyOptionParser(optrecurse.RecursiveOptionParser):
             options.output = os.path.join(options.output,"pootle-terminology.pot")
 
         self.initprogressbar(inputfiles, options)
-        for inputpath in inputfiles:
-            self.files += 1
-            fullinputpath = self.getfullinputpath(options, inputpath)
-            success = True
-            try:
-                self.processfile(None, options, fullinputpath)
-            except Exception, error:
-                if isinstance(error, KeyboardInterrupt):
-                    raise
-                self.warning("Error processing: input %s" % (fullinputpath), options, sys.exc_info())
-                success = False
-            self.reportprogress(inputpath, success)
+        if self.extractor.counting and options.jobs > 1 and len(inputfiles) > 1 and hasattr(os, "fork"):
+            self.parallelcount(options, inputfiles)
+        else:
+            for inputpath in inputfiles:
+                self.files += 1
+                fullinputpath = self.getfullinputpath(options, inputpath)
+                success = self.tryprocessinput(options, fullinputpath)
+                self.reportprogress(inputpath, success)
         del self.progressbar
         self.outputterminology(options)
 
+    def parallelcount(self, options, inputfiles):
+        """count the terms of the input files in options.jobs worker processes
+
+        The counts of the files are merged in the order of the input files,
+        which gives the same terminology as processing them serially."""
+        import multiprocessing
+        fullinputpaths = [self.getfullinputpath(options, inputpath) for inputpath in inputfiles]
+        pool = multiprocessing.Pool(options.jobs, _initcountworker, (self, options))
+        try:
+            results = pool.imap(_countfile, fullinputpaths)
+            for inputpath, (success, glossary, units) in itertools.izip(inputfiles, results):
+                self.files += 1
+                self.extractor.mergecounts(glossary, units)
+                self.reportprogress(inputpath, success)
+        finally:
+            pool.close()
+            pool.join()
+
+    def tryprocessinput(self, options, fullinputpath):
+        """process an individual file, returning whether it succeeded"""
+        try:
+            self.processfile(None, options, fullinputpath)
+            return True
+        except Exception, error:
+            if isinstance(error, KeyboardInterrupt):
+                raise
+            self.warning("Error processing: input %s" % (fullinputpath), options, sys.exc_info())
+            return False
+
     def processfile(self, fileprocessor, options, fullinputpath):
         """process an individual file"""
         inputfile = self.openinputfile(options, fullinputpath)
@@ -494,6 +675,9 @@ def main():
 
     parser.add_option("", "--source-language", dest="sourcelanguage", default="en",
         help="the source language code (default 'en')", metavar="LANG")
+    parser.add_option("", "--counting", dest="counting",
+        action="store_true", default=False,
+        help="keep per-term counts instead of every occurrence, to use less memory (implied by --jobs)")
     parser.add_option("-v", "--invert", dest="invert",
         action="store_true", default=False, help="invert the source and target languages for terminology")
     parser.set_usage()
@@ -42,14 +42,14 @@ def memory(tmfiles, max_candidates=1, min_similarity=75, max_length=1000):
     return tmmatcher
 
 
-def pretranslate_file(input_file, output_file, template_file, tm=None, min_similarity=75, fuzzymatching=True):
+def pretranslate_file(input_file, output_file, template_file, tm=None, min_similarity=75, fuzzymatching=True, jobs=1):
     """Pretranslate any factory supported file with old translations and translation memory."""
     input_store = factory.getobject(input_file)
     template_store = None
     if template_file is not None:
         template_store = factory.getobject(template_file)
 
-    output = pretranslate_store(input_store, template_store, tm, min_similarity, fuzzymatching)
+    output = pretranslate_store(input_store, template_store, tm, min_similarity, fuzzymatching, jobs)
     output_file.write(str(output))
     return 1
 
@@ -87,8 +87,64 @@ def match_fuzzy(input_unit, matchers):
             return fuzzycandidates[0]
 
 
-def pretranslate_unit(input_unit, template_store, matchers=None, mark_reused=False) :
-    """Pretranslate a unit or return unchanged if no translation was found."""
+# The matchers used by the worker processes of match_fuzzy_units()
+workermatchers = None
+
+def _init_fuzzy_worker(matchers):
+    global workermatchers
+    workermatchers = matchers
+
+def _match_fuzzy_source(source):
+    for matcher in workermatchers:
+        fuzzycandidates = matcher.matches(source)
+        if fuzzycandidates:
+            return fuzzycandidates[0]
+
+
+def match_fuzzy_units(input_units, template_store, matchers, jobs):
+    """Fuzzy match the units that can't be pretranslated from the template
+    in jobs worker processes.
+
+    The matchers are built once in this process and shared with the workers
+    (copy-on-write where the platform forks).
+
+    @return: a dictionary mapping the source text of each unit to its fuzzy
+    match (or None), for use with pretranslate_unit()
+    """
+    import multiprocessing
+
+    sources = []
+    known = set()
+    for input_unit in input_units:
+        if not input_unit.istranslatable():
+            continue
+        if template_store:
+            matching_unit = match_template_id(input_unit, template_store)
+            if matching_unit and matching_unit.gettargetlen() > 0:
+                continue
+        # Matching only considers the (first) source string
+        source = unicode(input_unit.source)
+        if source not in known:
+            known.add(source)
+            sources.append(source)
+    if not sources:
+        return {}
+    pool = multiprocessing.Pool(jobs, _init_fuzzy_worker, (matchers,))
+    try:
+        chunksize = max(1, min(100, len(sources) // (jobs * 4)))
+        fuzzymatches = pool.map(_match_fuzzy_source, sources, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(sources, fuzzymatches))
+
+
+def pretranslate_unit(input_unit, template_store, matchers=None, mark_reused=False, fuzzymatches=None) :
+    """Pretranslate a unit or return unchanged if no translation was found.
+
+    @param fuzzymatches: Optional precalculated fuzzy matches as returned by
+    match_fuzzy_units(), used instead of querying the matchers
+    """
 
     matching_unit = None
     #do template matching
@@ -99,7 +155,10 @@ def pretranslate_unit(input_unit, template_store, matchers=None, mark_reused=Fal
         input_unit.merge(matching_unit, authoritative=True)
     elif matchers:
         #do fuzzy matching
-        matching_unit = match_fuzzy(input_unit, matchers)
+        if fuzzymatches is not None:
+            matching_unit = fuzzymatches.get(unicode(input_unit.source))
+        else:
+            matching_unit = match_fuzzy(input_unit, matchers)
         if matching_unit and matching_unit.gettargetlen() > 0:
             #FIXME: should we dispatch here instead of this crude type check
             if isinstance(input_unit, xliff.xliffunit):
@@ -124,8 +183,10 @@ def prepare_template_pofile(template_store):
         if unit.isobsolete():
             unit.resurrect()
 
-def pretranslate_store(input_store, template_store, tm=None, min_similarity=75, fuzzymatching=True):
-    """Do the actual pretranslation of a whole store."""
+def pretranslate_store(input_store, template_store, tm=None, min_similarity=75, fuzzymatching=True, jobs=1):
+    """Do the actual pretranslation of a whole store.
+
+    If jobs is more than 1, fuzzy matching is done in that many processes."""
     #preperation
     matchers = []
     #prepare template
@@ -151,10 +212,14 @@ def pretranslate_store(input_store, template_store, tm=None, min_similarity=75,
         matcher.addpercentage = False
         matchers.append(matcher)
 
+    fuzzymatches = None
+    if matchers and jobs > 1:
+        fuzzymatches = match_fuzzy_units(input_store.units, template_store, matchers, jobs)
+
     #main loop
     for input_unit in input_store.units:
         if  input_unit.istranslatable():
-            input_unit = pretranslate_unit(input_unit, template_store, matchers)
+            input_unit = pretranslate_unit(input_unit, template_store, matchers, fuzzymatches=fuzzymatches)
 
     return input_store
 
@@ -177,6 +242,8 @@ def main(argv=None):
     parser.add_option("--nofuzzymatching", dest="fuzzymatching", action="store_false",
         default=True, help="Disable fuzzy matching")
     parser.passthrough.append("fuzzymatching")
+    # fuzzy matching is done in parallel within each file, see --jobs
+    parser.passthrough.append("jobs")
     parser.run(argv)
 
 
@@ -3,6 +3,12 @@
 
 from translate.storage import po
 from translate.storage import statsdb
+from translate.tools import pocount
+from translate.misc import wStringIO
+import os
+import shutil
+import sys
+import tempfile
 
 class TestPOCount:
     def count(self, source, expectedsource, target=None, expectedtarget=None):
@@ -72,6 +78,51 @@ class TestPOCount:
 
     # Counting strings
     #  We need to check how we count strings also and if we call it translated or untranslated
+    def test_stream(self):
+        """checks that counting one unit at a time gives the same statistics"""
+        posource = 'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n' \
+                   'msgid "One two"\nmsgstr "Een twee"\n\n' \
+                   '#, fuzzy\nmsgid "Three"\nmsgstr "Drie"\n\n' \
+                   '#, fuzzy\nmsgid "Seven eight"\nmsgstr ""\n\n' \
+                   '# (review) check\nmsgid "Four five six"\nmsgstr ""\n\n' \
+                   '#~ msgid "Obsolete"\n#~ msgstr "Verouderd"\n'
+        dirname = tempfile.mkdtemp()
+        filename = os.path.join(dirname, "test.po")
+        defaultfile = statsdb.StatsCache.defaultfile
+        try:
+            statsdb.StatsCache.defaultfile = os.path.join(dirname, "stats.db")
+            open(filename, "w").write(posource)
+            stats = pocount.calcstats_stream(filename)
+            assert dict(stats) == dict(pocount.calcstats(filename))
+            assert (stats["total"], stats["translated"], stats["fuzzy"], stats["untranslated"]) == (4, 1, 1, 2)
+            assert stats["fuzzysourcewords"] == 1
+            assert stats["untranslatedsourcewords"] == 5
+        finally:
+            statsdb.StatsCache.defaultfile = defaultfile
+            shutil.rmtree(dirname)
+
+    def test_tree(self):
+        """checks that --tree gives the totals of every directory"""
+        posource = 'msgid "One two"\nmsgstr "Een twee"\n\nmsgid "Three"\nmsgstr ""\n'
+        dirname = tempfile.mkdtemp()
+        subdirname = os.path.join(dirname, "sub")
+        defaultfile = statsdb.StatsCache.defaultfile
+        stdout = sys.stdout
+        try:
+            statsdb.StatsCache.defaultfile = os.path.join(dirname, "stats.db")
+            os.mkdir(subdirname)
+            for filename in (os.path.join(dirname, "a.po"), os.path.join(subdirname, "b.po"), os.path.join(subdirname, "c.po")):
+                open(filename, "w").write(posource)
+            sys.stdout = wStringIO.StringIO()
+            pocount.summarizer([dirname], pocount.style_csv, tree=True)
+            lines = sys.stdout.getvalue().splitlines()[1:]
+        finally:
+            sys.stdout = stdout
+            statsdb.StatsCache.defaultfile = defaultfile
+            shutil.rmtree(dirname)
+        assert lines == ["%s,  3, 6, 6, 0, 0, 3, 3, 6, 9" % dirname,
+                         "%s,  2, 4, 4, 0, 0, 2, 2, 4, 6" % subdirname]
+
     # ie an all spaces msgid should be translated if there are spaces in the msgstr
    
     # Make sure we don't count obsolete messages
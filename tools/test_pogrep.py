@@ -32,6 +32,32 @@ class TestPOGrep:
         poresult = self.pogrep(posource, "rest", ["--search=msgid"])
         assert headerless_len(po.pofile(poresult).units) == 0
 
+    def pogrep_stream(self, posource, searchstring, cmdlineoptions=None):
+        """helper that passes po source through a filter one unit at a time"""
+        if cmdlineoptions is None:
+            cmdlineoptions = []
+        options, args = pogrep.cmdlineparser().parse_args(["xxx.po"] + cmdlineoptions)
+        grepfilter = pogrep.GrepFilter(searchstring, options.searchparts, options.ignorecase, options.useregexp, options.invertmatch, options.accelchar)
+        inputfile = wStringIO.StringIO(posource)
+        inputfile.name = "xxx.po"
+        outputfile = wStringIO.StringIO()
+        assert pogrep.rungrep(inputfile, outputfile, None, grepfilter, stream=True) == bool(outputfile.getvalue())
+        return outputfile.getvalue()
+
+    def test_stream(self):
+        """checks that streaming gives the same results as loading the file"""
+        posource = 'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n' \
+                   '#: test.c\nmsgid "test"\nmsgstr "rest"\n\n' \
+                   '#: other.c\nmsgid "other"\nmsgstr "ander"\n\n' \
+                   '#: test.c\nmsgid "tests"\nmsgstr "rests"\n'
+        for searchstring, options in [("test", []), ("rest", ["--search=msgid"]), ("test.c", ["--search=locations"]), ("st", ["-v"])]:
+            streamresult = self.pogrep_stream(posource, searchstring, options)
+            poresult = self.pogrep(posource, searchstring, options)
+            if headerless_len(po.pofile(poresult).units) == 0:
+                assert streamresult == ""
+            else:
+                assert streamresult == poresult
+
     def test_simplegrep_msgstr(self):
         """grep for a string in the target"""
         posource = '#: test.c\nmsgid "test"\nmsgstr "rest"\n'
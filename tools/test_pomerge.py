@@ -8,6 +8,8 @@ from translate.storage import xliff
 from translate.misc import wStringIO
 
 class TestPOMerge:
+    stream = False
+
     xliffskeleton = '''<?xml version="1.0" ?>
 <xliff version="1.1" xmlns="urn:oasis:names:tc:xliff:document:1.1">
   <file original="filename.po" source-language="en-US" datatype="po">
@@ -22,7 +24,7 @@ class TestPOMerge:
         templatefile = wStringIO.StringIO(templatesource)
         inputfile = wStringIO.StringIO(inputsource)
         outputfile = wStringIO.StringIO()
-        assert pomerge.mergestore(inputfile, outputfile, templatefile)
+        assert pomerge.mergestore(inputfile, outputfile, templatefile, stream=self.stream)
         outputpostring = outputfile.getvalue()
         outputpofile = po.pofile(outputpostring)
         return outputpofile
@@ -365,3 +367,30 @@ msgstr "Dimpled Ring"
         pofile = self.mergestore(templatepo, mergepo)
         print "Expected:\n%s\n---\nMerged:\n%s\n---" % (expectedpo, str(pofile))
         assert str(pofile) == expectedpo
+
+    def test_stream_same_output(self):
+        """checks that merging into a streamed template gives the same output"""
+        templatepo = 'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n' \
+                     '#: a.c:1\nmsgid "One"\nmsgstr ""\n\n' \
+                     '#: a.c:2 b.c:2\nmsgid "Two"\nmsgstr "Twee"\n\n' \
+                     '#: b.c:2\nmsgid "Three"\nmsgstr ""\n\n' \
+                     'msgid "Tree"\nmsgid_plural "Trees"\nmsgstr[0] ""\nmsgstr[1] ""\n\n' \
+                     '#~ msgid "Old"\n#~ msgstr "Oud"\n'
+        inputpo = '# translator comment\n#: a.c:1\nmsgid "One"\nmsgstr "Een"\n\n' \
+                  '#: b.c:2\nmsgid "Three"\nmsgstr "Drie"\n\n' \
+                  '#: c.c:5\nmsgid "Tree"\nmsgid_plural "Trees"\nmsgstr[0] "Boom"\nmsgstr[1] "Bome"\n\n' \
+                  'msgid "Missing"\nmsgstr "Weg"\n'
+        outputs = []
+        for stream in (False, True):
+            outputfile = wStringIO.StringIO()
+            assert pomerge.mergestore(wStringIO.StringIO(inputpo), outputfile,
+                                      wStringIO.StringIO(templatepo), stream=stream)
+            outputs.append(outputfile.getvalue())
+        print outputs[0]
+        assert outputs[0] == outputs[1]
+        assert 'msgstr "Een"' in outputs[0]
+        assert 'msgstr "Drie"' in outputs[0]
+        assert 'msgstr[1] "Bome"' in outputs[0]
+
+class TestPOMergeStream(TestPOMerge):
+    stream = True
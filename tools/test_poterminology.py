@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+
+from translate.storage import po
+from translate.tools import poterminology
+
+POSOURCES = [
+    '''#: file.c:1
+msgid "File"
+msgstr "Lêer"
+
+#: file.c:2
+msgid "Open file"
+msgstr "Open lêer"
+
+#: dialog.c:10
+msgid "Save the open files"
+msgstr "Stoor die oop lêers"
+''',
+    '''#: menu.c:3
+msgid "Files"
+msgstr "Lêers"
+
+#: menu.c:4
+msgid "Open file"
+msgstr "Maak lêer oop"
+
+#: menu.c:5
+msgid "Open file"
+msgstr "Open lêer"
+
+#: view.c:7
+msgid "Save the open files. Close the window"
+msgstr ""
+''',
+    '''#: file.c:1
+msgid "File"
+msgstr "Lêer"
+
+#: window.c:2
+msgid "Close the window"
+msgstr "Maak die venster toe"
+''',
+]
+
+class TestTerminologyExtractor:
+    def termlist(self, extractor):
+        terms = extractor.extract_terms(inputmin=1, locmin=1)
+        termitems = extractor.filter_terms(terms, sortorders=["frequency", "dictionary", "length"])
+        return [(count, str(unit)) for count, unit in termitems]
+
+    def extract(self, **kwargs):
+        extractor = poterminology.TerminologyExtractor(**kwargs)
+        for number, posource in enumerate(POSOURCES):
+            extractor.processunits(po.pofile.parsestring(posource).units, "%d.po" % number)
+        return extractor
+
+    def test_counting(self):
+        """tests that counting gives the same terms as keeping every occurrence"""
+        expected = self.termlist(self.extract())
+        assert [unit for count, unit in expected if 'msgid "file"' in unit]
+        counting = self.extract(counting=True)
+        for counts in counting.glossary.itervalues():
+            assert isinstance(counts, poterminology.TermCounts)
+        assert self.termlist(counting) == expected
+
+    def test_mergecounts(self):
+        """tests that merging the counts of each file gives the same terms"""
+        expected = self.termlist(self.extract())
+        merged = poterminology.TerminologyExtractor(counting=True)
+        for number, posource in enumerate(POSOURCES):
+            extractor = poterminology.TerminologyExtractor(counting=True)
+            extractor.processunits(po.pofile.parsestring(posource).units, "%d.po" % number)
+            merged.mergecounts(extractor.glossary, extractor.units)
+        assert merged.units == 9
+        assert self.termlist(merged) == expected
+
+    def test_maxlocations(self):
+        """tests that only maxlocations locations of a term are kept"""
+        extractor = self.extract(counting=True, maxlocations=2)
+        counts = extractor.glossary["file"]
+        assert len(counts.locations) == 2
+        assert counts.morelocations
+        terms = extractor.extract_terms(inputmin=1, locmin=1)
+        assert "(poterminology) at least 1 more locations" in str(terms["file"][1])
+
+    def test_parallel(self, tmpdir):
+        """tests that counting the files in parallel gives the same
+        terminology as counting them serially"""
+        podir = tmpdir.mkdir("po")
+        for number, posource in enumerate(POSOURCES):
+            podir.join("%d.po" % number).write(posource, "wb")
+        # more locations than are kept, spread over the files
+        for number in range(4):
+            podir.join("many%d.po" % number).write("".join(['#: many%d.c:1\nmsgid "File %d"\nmsgstr ""\n\n' % (i, i)
+                                                             for i in range(number, 400, 4)]))
+        def run(*args):
+            output = str(tmpdir.join("terminology-%d.pot" % len(args)))
+            argv = sys.argv
+            sys.argv = ["poterminology", "--locs-needed=1", "-o", output] + list(args) + [str(podir)]
+            try:
+                poterminology.main()
+            finally:
+                sys.argv = argv
+            return open(output).read()
+        serial = run("--counting")
+        assert 'msgid "file"' in serial
+        assert "(poterminology) at least 99 more locations" in serial
+        assert run("-j", "2") == serial